@@ -1,6 +1,12 @@
 from . import (
     hash,
     digest,
+    frame,
+    manifest,
+    merkle,
+    tree,
 )
 
-from ._hash import Hash
\ No newline at end of file
+from ._hash import Hash, FrozenHash, ChecksumMismatch
+from .batch import digest_many, digest_dir
+from .cache import DigestCache
\ No newline at end of file
@@ -1,6 +1,7 @@
 from typing import Callable, NamedTuple, Concatenate
 from collections.abc import Buffer as ReadableBuffer
 from dataclasses import dataclass
+import sys
 
 type HASH_FUNC[**P] = Callable[
     Concatenate[ReadableBuffer, bool, P],
@@ -20,6 +21,15 @@ def valid_filename(filename: object):
     
     return filename
 
+class ChecksumMismatch(ValueError):
+    """
+    Raised when a computed checksum does not match the expected one.
+    """
+    def __init__(self, expected: 'Hash', actual: 'Hash'):
+        self.expected = expected
+        self.actual = actual
+        super().__init__(f"Checksum mismatch: expected {expected}, got {actual}")
+
 @dataclass
 class Hash:
     method: str
@@ -57,6 +67,9 @@ class Hash:
     def equals(self, other: object, filename_eq: bool = True) -> bool:
         if isinstance(other, str):
             return self == Hash.from_str(other)
+
+        if isinstance(other, FrozenHash):
+            other = other.to_hash()
         
         if not isinstance(other, Hash):
             return False
@@ -70,4 +83,66 @@ class Hash:
         """
         Strict equality comparison.
         """
-        return self.equals(other, filename_eq=True)
\ No newline at end of file
+        return self.equals(other, filename_eq=True)
+
+@dataclass(frozen=True, slots=True)
+class FrozenHash:
+    """
+    Immutable, hashable and compact counterpart of `Hash`.
+
+    The digest is stored as raw bytes (half the size of its hex string) and
+    method names are interned, so every `FrozenHash` with the same method
+    shares one string. Instances can be used as dict keys and set members,
+    e.g. to deduplicate the entries of large manifests.
+    """
+    method: str
+    digest: bytes
+    filename: None|str = None
+
+    def __post_init__(self):
+        object.__setattr__(self, 'method', sys.intern(self.method))
+        object.__setattr__(self, 'filename', valid_filename(self.filename))
+
+    @property
+    def hexdigest(self) -> str:
+        return self.digest.hex()
+
+    def to_str(self, include_filename: bool = True):
+        hash_part = f"{self.method}:{self.hexdigest}"
+
+        if (self.filename is None) or (not include_filename):
+            return hash_part
+
+        return f"{self.filename}@{hash_part}"
+
+    def __str__(self): return self.to_str()
+
+    def __repr__(self):
+        return f'<FrozenHash object {self.method}:{self.hexdigest} @ {hex(id(self))}>'
+
+    @classmethod
+    def from_str(cls, s: str):
+        filename, _, hash_part = s.rpartition('@')
+        method, colon, hexdigest = hash_part.partition(':')
+        if not (colon and method and hexdigest) or len(hexdigest) % 2:
+            raise ValueError(f"Invalid hash: '{s}'")
+        return cls(method=method, digest=bytes.fromhex(hexdigest), filename=filename or None)
+
+    @classmethod
+    def from_hash(cls, h: Hash):
+        return cls(method=h.method, digest=bytes.fromhex(h.hexdigest), filename=h.filename)
+
+    def to_hash(self) -> Hash:
+        return Hash(method=self.method, hexdigest=self.hexdigest, filename=self.filename)
+
+    def equals(self, other: object, filename_eq: bool = True) -> bool:
+        if isinstance(other, (str, Hash)):
+            return self.to_hash().equals(other, filename_eq=filename_eq)
+
+        if not isinstance(other, FrozenHash):
+            return False
+
+        if filename_eq:
+            return self == other
+        else:
+            return self.method == other.method and self.digest == other.digest
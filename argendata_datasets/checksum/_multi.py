@@ -0,0 +1,32 @@
+from typing import Iterable
+from collections.abc import Buffer as ReadableBuffer
+from ._hash import Hash
+from ._hashlib import get_hash_method
+
+class MultiHasher:
+    """
+    Updates one hash object per method with the same data, so several
+    checksums can be computed from a single read of the input.
+    """
+    def __init__(self, methods: Iterable[str]):
+        self.hashobjs = {
+            method: get_hash_method(method)()
+            for method in dict.fromkeys(methods)
+        }
+
+        if not self.hashobjs:
+            raise ValueError("At least one hash method is required.")
+
+    @property
+    def methods(self) -> list[str]:
+        return list(self.hashobjs)
+
+    def update(self, data: ReadableBuffer):
+        for hashobj in self.hashobjs.values():
+            hashobj.update(data)
+
+    def results(self, filename: None|str = None) -> dict[str, Hash]:
+        return {
+            method: Hash(method=method, hexdigest=hashobj.hexdigest(), filename=filename)
+            for method, hashobj in self.hashobjs.items()
+        }
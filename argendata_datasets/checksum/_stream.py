@@ -0,0 +1,70 @@
+import mmap as _mmap
+import pathlib
+from typing import BinaryIO, Iterator
+
+DEFAULT_BUFFER_SIZE = 1 << 20 # 1MiB
+
+def valid_buffer_size(buffer_size: object) -> int:
+    if not isinstance(buffer_size, int):
+        T = type(buffer_size)
+        raise TypeError(f"Buffer size must be of type 'int', got '{T.__name__}'.")
+
+    if buffer_size <= 0:
+        raise ValueError(f"Buffer size must be positive, got {buffer_size}.")
+
+    return buffer_size
+
+def iter_chunks(stream: BinaryIO, buffer_size: int = DEFAULT_BUFFER_SIZE) -> Iterator[memoryview]:
+    """
+    Yields the contents of `stream` in chunks of at most `buffer_size` bytes.
+
+    Streams that support `readinto` are read into a single reusable buffer, so
+    the memory used does not depend on the length of the stream. Each chunk is
+    only valid until the next one is requested.
+    """
+    buffer_size = valid_buffer_size(buffer_size)
+    readinto = getattr(stream, 'readinto', None)
+
+    if readinto is None:
+        while chunk := stream.read(buffer_size):
+            yield memoryview(chunk)
+        return
+
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    while n := readinto(view):
+        yield view[:n]
+
+def iter_mmap_chunks(path: str|pathlib.Path, buffer_size: int = DEFAULT_BUFFER_SIZE) -> Iterator[memoryview]:
+    """
+    Yields the contents of the file at `path` in chunks of at most
+    `buffer_size` bytes, backed by a read-only memory map instead of a heap
+    buffer. Each chunk is released as soon as the next one is requested, and
+    its pages are dropped from the mapping when `buffer_size` is a multiple of
+    the page size, so resident memory stays bounded as well.
+    """
+    buffer_size = valid_buffer_size(buffer_size)
+
+    with open(path, 'rb') as f:
+        size = pathlib.Path(path).stat().st_size
+        if size == 0:
+            return
+
+        with _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ) as m:
+            can_advise = hasattr(m, 'madvise')
+            if can_advise and hasattr(_mmap, 'MADV_SEQUENTIAL'):
+                m.madvise(_mmap.MADV_SEQUENTIAL)
+
+            drop_pages = (
+                can_advise
+                and hasattr(_mmap, 'MADV_DONTNEED')
+                and buffer_size % _mmap.PAGESIZE == 0
+            )
+
+            with memoryview(m) as view:
+                for offset in range(0, size, buffer_size):
+                    with view[offset:offset + buffer_size] as chunk:
+                        yield chunk
+
+                    if drop_pages:
+                        m.madvise(_mmap.MADV_DONTNEED, offset, min(buffer_size, size - offset))
@@ -0,0 +1,122 @@
+"""
+Functions for computing the checksums of many files concurrently.
+
+Files are hashed on a thread pool: `hashlib` releases the GIL while hashing
+large buffers and file reads release it while waiting on the disk, so
+throughput scales with the available cores and disks. Results are yielded as
+soon as they are ready, in completion order.
+
+Usage:
+
+>>> from argendata_datasets import checksum
+>>> for h in checksum.digest_many(['a.parquet', 'b.parquet'], method='sha1'):
+...     print(h)
+>>> hashes = list(checksum.digest_dir('data/', pattern='**/*.parquet'))
+"""
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
+from ._hash import Hash
+from ._stream import DEFAULT_BUFFER_SIZE
+from . import digest
+import itertools
+import os
+import pathlib
+
+if TYPE_CHECKING:
+    from .cache import DigestCache
+
+PathLike = str | pathlib.Path
+
+def default_workers() -> int:
+    return min(32, (os.cpu_count() or 1) + 4)
+
+def map_unordered[T, R](
+    func: Callable[[T], R],
+    items: Iterable[T],
+    workers: None|int = None,
+) -> Iterator[tuple[T, R|BaseException]]:
+    """
+    Applies `func` to every item on a thread pool and yields `(item, result)`
+    pairs in completion order. Exceptions raised by `func` are yielded in
+    place of the result, so one failing item does not stop the others.
+
+    At most a few items per worker are in flight at any time, so `items` may
+    be a lazy iterator over an arbitrarily large collection.
+    """
+    workers = workers or default_workers()
+    items = iter(items)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {
+            executor.submit(func, item): item
+            for item in itertools.islice(items, 2 * workers)
+        }
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                yield item, (future.result() if error is None else error)
+
+            for item in itertools.islice(items, len(done)):
+                pending[executor.submit(func, item)] = item
+
+def digest_many(
+    paths: Iterable[PathLike],
+    method: str = 'sha1',
+    workers: None|int = None,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    cache: 'None|DigestCache' = None,
+    on_error: None|Callable[[PathLike, Exception], object] = None,
+) -> Iterator[Hash]:
+    """
+    Computes the checksum of every path in `paths` and yields the resulting
+    `Hash` objects in completion order.
+
+    Args:
+        - paths: The files to hash.
+        - method: A `hashlib` algorithm name.
+        - workers: Number of threads, defaults to `cpu_count() + 4` (max 32).
+        - buffer_size: Read buffer size per file, see `checksum.digest`.
+        - cache: A `DigestCache` used to skip unchanged files.
+        - on_error: Called with the path and the exception of every file that
+          cannot be hashed, e.g. because it was removed, and the other files
+          are still hashed. Without it, the first error is raised.
+    """
+    f = getattr(digest, method)
+
+    def digest_one(path: PathLike) -> Hash:
+        return f(path, buffer_size=buffer_size, cache=cache)
+
+    for path, result in map_unordered(digest_one, paths, workers):
+        if isinstance(result, Exception) and on_error is not None:
+            on_error(path, result)
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            yield result
+
+def digest_dir(
+    root: PathLike,
+    pattern: str = '**/*',
+    method: str = 'sha1',
+    workers: None|int = None,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    cache: 'None|DigestCache' = None,
+    on_error: None|Callable[[PathLike, Exception], object] = None,
+) -> Iterator[Hash]:
+    """
+    Computes the checksum of every file under `root` matching the glob
+    `pattern`. The filenames of the resulting `Hash` objects are POSIX paths
+    relative to `root`, so they can be written to a manifest as is. See
+    `digest_many` for `on_error`.
+    """
+    root = pathlib.Path(root)
+    paths = (path for path in root.glob(pattern) if path.is_file())
+
+    for result in digest_many(paths, method, workers, buffer_size, cache, on_error):
+        filename = pathlib.Path(result.filename).relative_to(root).as_posix()
+        yield Hash(method=result.method, hexdigest=result.hexdigest, filename=filename)
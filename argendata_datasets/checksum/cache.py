@@ -0,0 +1,220 @@
+"""
+Persistent checksum cache keyed by file metadata.
+
+A `DigestCache` stores the checksum of every file it has seen together with
+its size, modification time and inode. As long as `stat()` reports the same
+values, the cached `Hash` is returned without reading the file, so verifying
+an unchanged tree costs one `stat()` and one index lookup per file.
+
+The cache is a SQLite database in WAL mode, which makes it safe to share
+between threads and processes. Its size is bounded by `max_entries`, evicting
+the least recently used entries.
+
+Usage:
+
+>>> from argendata_datasets.checksum import digest, DigestCache
+>>> cache = DigestCache()
+>>> digest.sha1('file.parquet', cache=cache) # reads the file
+>>> digest.sha1('file.parquet', cache=cache) # only stats the file
+>>> cache.hits, cache.misses
+(1, 1)
+"""
+
+from ._hash import Hash
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+
+PathLike = str | pathlib.Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS digests (
+    path TEXT NOT NULL,
+    method TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    hexdigest TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (path, method)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS digests_last_used ON digests (last_used);
+"""
+
+def default_path() -> pathlib.Path:
+    base = os.environ.get('XDG_CACHE_HOME') or pathlib.Path.home() / '.cache'
+    return pathlib.Path(base) / 'argendata_datasets' / 'checksum.sqlite3'
+
+def stat_key(st: os.stat_result) -> tuple[int, int, int]:
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+class DigestCache:
+    """
+    Args:
+        - path: Location of the database, defaults to
+          `$XDG_CACHE_HOME/argendata_datasets/checksum.sqlite3`.
+        - max_entries: Maximum number of cached checksums. Eviction runs every
+          `evict_every` insertions, so the bound can be exceeded by that many
+          entries per process in between.
+        - touch_interval: Minimum number of seconds between updates of the
+          last-used time of an entry, to avoid a write on every hit.
+        - timeout: Seconds to wait for a lock held by another process.
+    """
+    hits: int
+    misses: int
+
+    def __init__(
+        self,
+        path: None|PathLike = None,
+        max_entries: int = 1_000_000,
+        evict_every: int = 256,
+        touch_interval: float = 60.0,
+        timeout: float = 30.0,
+    ):
+        self.path = default_path() if path is None else pathlib.Path(path)
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.touch_interval = touch_interval
+        self.timeout = timeout
+
+        self.hits = 0
+        self.misses = 0
+        self._inserts = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            return connection
+
+        connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+
+        self._local.connection = connection
+        with self._lock:
+            self._connections.append(connection)
+        return connection
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, path: PathLike, method: str) -> tuple[None|Hash, os.stat_result]:
+        """
+        Returns the cached `Hash` of `path` if its stat data is unchanged,
+        together with the `stat()` result to pass to `store` on a miss.
+        """
+        st = os.stat(path)
+        key = str(pathlib.Path(path).resolve())
+
+        connection = self._connect()
+        row = connection.execute(
+            'SELECT size, mtime_ns, inode, hexdigest, last_used FROM digests '
+            'WHERE path = ? AND method = ?',
+            (key, method),
+        ).fetchone()
+
+        if row is None or tuple(row[:3]) != stat_key(st):
+            self._count(hit=False)
+            return None, st
+
+        now = time.time()
+        if now - row[4] >= self.touch_interval:
+            with connection:
+                connection.execute(
+                    'UPDATE digests SET last_used = ? WHERE path = ? AND method = ?',
+                    (now, key, method),
+                )
+
+        self._count(hit=True)
+        return Hash(method=method, hexdigest=row[3], filename=str(path)), st
+
+    def store(self, path: PathLike, st: os.stat_result, result: Hash) -> bool:
+        """
+        Stores `result` as the checksum of `path`, as it was when `st` was
+        taken. Nothing is stored if the file changed since then, since the
+        checksum may belong to neither version. Returns whether it was stored.
+        """
+        if stat_key(os.stat(path)) != stat_key(st):
+            return False
+
+        key = str(pathlib.Path(path).resolve())
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO digests '
+                '(path, method, size, mtime_ns, inode, hexdigest, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, result.method, *stat_key(st), result.hexdigest, time.time()),
+            )
+
+        with self._lock:
+            self._inserts += 1
+            should_evict = self._inserts % self.evict_every == 0
+
+        if should_evict:
+            self.evict()
+
+        return True
+
+    def evict(self) -> int:
+        """
+        Removes the least recently used entries above `max_entries`. Returns
+        the number of entries removed.
+        """
+        connection = self._connect()
+        with connection:
+            excess = len(self) - self.max_entries
+            if excess <= 0:
+                return 0
+
+            connection.execute(
+                'DELETE FROM digests WHERE (path, method) IN ('
+                'SELECT path, method FROM digests ORDER BY last_used LIMIT ?)',
+                (excess,),
+            )
+        return excess
+
+    def invalidate(self, path: None|PathLike = None, method: None|str = None) -> int:
+        """
+        Removes the entries of `path` (all methods unless `method` is given),
+        or every entry if `path` is None. Returns the number of entries removed.
+        """
+        clauses, params = [], []
+        if path is not None:
+            clauses.append('path = ?')
+            params.append(str(pathlib.Path(path).resolve()))
+        if method is not None:
+            clauses.append('method = ?')
+            params.append(method)
+
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        connection = self._connect()
+        with connection:
+            return connection.execute(f'DELETE FROM digests {where}', params).rowcount
+
+    def __len__(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM digests').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
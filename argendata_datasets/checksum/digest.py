@@ -1,18 +1,37 @@
 """
 Functions for loading files and buffers and computing their checksums.
 
+Files and streams are read in chunks of `buffer_size` bytes (1MiB by default),
+so memory usage does not grow with the size of the input. Passing
+`buffer_size=None` reads the whole input at once, and `mmap=True` hashes
+files through a read-only memory map instead of a heap buffer. Passing a
+`DigestCache` as `cache` skips reading files whose stat data is unchanged;
+it is not used when arguments for the hash constructor are given.
+
+`digest.multi` computes several checksums of the same input in a single pass.
+
 Usage:
 
 >>> from argendata_datasets.checksum import digest
 >>> digest.sha1('file.txt')
 >>> digest.sha1(io.BytesIO(b'hello'))
+>>> digest.sha256('file.parquet', buffer_size=4 << 20)
+>>> digest.sha256('file.parquet', mmap=True)
+>>> digest.sha1('file.parquet', cache=DigestCache())
+>>> digest.multi('file.parquet', ['sha1', 'sha256', 'md5'])
 """
 
 from typing import Callable, Concatenate, cast
 from ._hash import Hash
 from ._hashlib import get_hash_method
+from ._multi import MultiHasher
+from ._stream import DEFAULT_BUFFER_SIZE, iter_chunks, iter_mmap_chunks
+import functools
 import pathlib
-from typing import BinaryIO
+from typing import TYPE_CHECKING, BinaryIO, Iterable
+
+if TYPE_CHECKING:
+    from .cache import DigestCache
 
 PathLike = str | pathlib.Path
 
@@ -21,12 +40,51 @@ type DIGEST_FUNC[**P] = Callable[
     Hash
 ]
 
+def _feed(hashobj, x: PathLike|BinaryIO, buffer_size: None|int, mmap: bool):
+    """
+    Feeds the contents of a path or stream into `hashobj`, which can be any
+    object with an `update` method.
+    """
+    if not isinstance(x, PathLike):
+        # BinaryIO
+        if mmap:
+            raise ValueError("mmap=True requires a path, not a stream.")
+
+        if buffer_size is None:
+            hashobj.update(x.read())
+        else:
+            for chunk in iter_chunks(x, buffer_size):
+                hashobj.update(chunk)
+
+    elif mmap:
+        for chunk in iter_mmap_chunks(x, buffer_size or DEFAULT_BUFFER_SIZE):
+            hashobj.update(chunk)
+
+    elif buffer_size is None:
+        hashobj.update(pathlib.Path(x).read_bytes())
+
+    else:
+        with open(x, 'rb', buffering=0) as stream:
+            for chunk in iter_chunks(stream, buffer_size):
+                hashobj.update(chunk)
+
+    return hashobj
+
 def _wrap(name: str, f: Callable):
-    def wrapped(x: PathLike|BinaryIO, *args, **kwargs):
+    def wrapped(
+        x: PathLike|BinaryIO,
+        *args,
+        buffer_size: None|int = DEFAULT_BUFFER_SIZE,
+        mmap: bool = False,
+        cache: 'None|DigestCache' = None,
+        **kwargs
+    ):
         if not isinstance(x, PathLike):
             # BinaryIO
-            value = x.read()
-            result = f(value, *args, **kwargs)
+            if cache is not None:
+                raise ValueError("cache requires a path, not a stream.")
+
+            result = _feed(f(b'', *args, **kwargs), x, buffer_size, mmap)
             return Hash(
                 method = name,
                 hexdigest = result.hexdigest(),
@@ -34,16 +92,84 @@ def _wrap(name: str, f: Callable):
             )
         else:
             x = pathlib.Path(x)
-            result = f(x.read_bytes(), *args, **kwargs)
-            return Hash(
+
+            # Constructor arguments (e.g. `digest_size` or `key` of blake2b)
+            # change the digest but not the method name the cache is keyed
+            # by, so such digests are never cached.
+            if args or kwargs:
+                cache = None
+
+            if cache is not None:
+                cached, st = cache.lookup(x, name)
+                if cached is not None:
+                    return cached
+
+            result = _feed(f(b'', *args, **kwargs), x, buffer_size, mmap)
+            result = Hash(
                 method = name,
                 hexdigest = result.hexdigest(),
                 filename = str(x),
             )
-        
-        
+
+            if cache is not None:
+                cache.store(x, st, result)
+
+            return result
+
+
     return wrapped
 
+def multi(
+    x: PathLike|BinaryIO,
+    methods: Iterable[str],
+    buffer_size: None|int = DEFAULT_BUFFER_SIZE,
+    mmap: bool = False,
+    cache: 'None|DigestCache' = None,
+) -> dict[str, Hash]:
+    """
+    Computes the checksum of `x` with every method in `methods` while reading
+    it only once. Returns a `Hash` per method, keyed by method name.
+
+    With a `cache`, only the methods that are not cached are computed.
+
+    >>> digest.multi('file.parquet', ['sha1', 'sha256', 'md5'])
+    {'sha1': <Hash object sha1:...>, 'sha256': <Hash object ...>, 'md5': ...}
+    """
+    methods = list(dict.fromkeys(methods))
+
+    if not isinstance(x, PathLike):
+        if cache is not None:
+            raise ValueError("cache requires a path, not a stream.")
+
+        return _feed(MultiHasher(methods), x, buffer_size, mmap).results()
+
+    x = pathlib.Path(x)
+    results, stats = {}, {}
+
+    if cache is not None:
+        for method in methods:
+            results[method], stats[method] = cache.lookup(x, method)
+
+    missing = [method for method in methods if results.get(method) is None]
+    if missing:
+        computed = _feed(MultiHasher(missing), x, buffer_size, mmap).results(filename=str(x))
+        for method, result in computed.items():
+            if cache is not None:
+                cache.store(x, stats[method], result)
+            results[method] = result
+
+    return {method: results[method] for method in methods}
+
 def __getattr__(name: str):
+    from . import merkle, tree
+    leaf_size = tree.parse_method(name)
+    if leaf_size is not None:
+        return functools.partial(tree.digest, leaf_size=leaf_size)
+
+    merkle_params = merkle.parse_method(name)
+    if merkle_params is not None:
+        method, chunk_size = merkle_params
+        return functools.partial(merkle.digest, method=method, chunk_size=chunk_size)
+
     f = get_hash_method(name)
-    return cast(DIGEST_FUNC, _wrap(name, f))
\ No newline at end of file
+    return cast(DIGEST_FUNC, _wrap(name, f))
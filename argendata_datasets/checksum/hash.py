@@ -6,11 +6,15 @@ Usage:
 >>> from argendata_datasets.checksum import hash
 >>> hash.sha1(b'hello')
 >>> hash.sha1('hello'.encode('utf-8'))
+>>> hash.multi(b'hello', ['sha1', 'sha256', 'md5'])
 """
 
-from typing import Callable, cast
+from typing import Callable, Iterable, cast
+from collections.abc import Buffer as ReadableBuffer
 from ._hashlib import get_hash_method
 from ._hash import Hash, HASH_FUNC
+from ._multi import MultiHasher
+import functools
 
 def _wrap(name: str, f: Callable):
     def wrapped(*args, **kwargs):
@@ -18,6 +22,25 @@ def _wrap(name: str, f: Callable):
         return Hash(method = name, hexdigest=result.hexdigest())
     return wrapped
 
+def multi(data: ReadableBuffer, methods: Iterable[str]) -> dict[str, Hash]:
+    """
+    Computes the checksum of `data` with every method in `methods`.
+    Returns a `Hash` per method, keyed by method name.
+    """
+    hasher = MultiHasher(methods)
+    hasher.update(data)
+    return hasher.results()
+
 def __getattr__(name: str):
+    from . import merkle, tree
+    leaf_size = tree.parse_method(name)
+    if leaf_size is not None:
+        return functools.partial(tree.hash, leaf_size=leaf_size)
+
+    merkle_params = merkle.parse_method(name)
+    if merkle_params is not None:
+        method, chunk_size = merkle_params
+        return functools.partial(merkle.hash, method=method, chunk_size=chunk_size)
+
     f = get_hash_method(name)
     return cast(HASH_FUNC, _wrap(name, f))
\ No newline at end of file
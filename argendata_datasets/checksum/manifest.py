@@ -0,0 +1,224 @@
+"""
+Reading, writing and verifying checksum manifests.
+
+A manifest is a text file with one `Hash` per line, in the `Hash.to_str`
+format (`filename@method:hexdigest`). Blank lines and lines starting with '#'
+are ignored. Filenames are resolved relative to a root directory, which
+defaults to the directory containing the manifest.
+
+Usage:
+
+>>> from argendata_datasets import checksum
+>>> checksum.manifest.write(checksum.digest_dir('data/'), 'data/SHA1SUMS')
+>>> result = checksum.manifest.verify('data/SHA1SUMS')
+>>> result.passed
+True
+
+Large manifests can be parsed and serialized as whole polars columns with
+`read_frame`, `parse_column` and `serialize_column`, which store digests as
+raw bytes and methods as categoricals:
+
+>>> df = checksum.manifest.read_frame('data/SHA1SUMS')
+>>> df.columns
+['filename', 'method', 'digest']
+"""
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, Iterator
+from ._hash import Hash, FrozenHash
+from ._stream import DEFAULT_BUFFER_SIZE
+from .batch import map_unordered
+from . import digest
+import pathlib
+
+if TYPE_CHECKING:
+    import polars as pl
+    from .cache import DigestCache
+
+PathLike = str | pathlib.Path
+
+@dataclass
+class Verification:
+    ok: list[Hash] = field(default_factory=list)
+    mismatched: list[tuple[Hash, Hash]] = field(default_factory=list)
+    missing: list[Hash] = field(default_factory=list)
+    errors: list[tuple[Hash, BaseException]] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return not (self.mismatched or self.missing or self.errors)
+
+def parse(lines: Iterable[str]) -> Iterator[Hash]:
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        yield Hash.from_str(line)
+
+def read(path: PathLike) -> Iterator[Hash]:
+    with pathlib.Path(path).open('r', encoding='utf-8') as f:
+        yield from parse(f)
+
+def read_frozen(path: PathLike) -> Iterator[FrozenHash]:
+    with pathlib.Path(path).open('r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            yield FrozenHash.from_str(line)
+
+def parse_column(column: 'pl.Series') -> 'pl.DataFrame':
+    """
+    Parses a string column of `Hash.to_str` entries into a frame with columns
+    `filename` (nullable string), `method` (categorical) and `digest`
+    (binary).
+
+    Entries are validated against `utils.product.patterns.HASH_NON_CAPTURING`
+    and then split with plain string operations, which is several times faster
+    than extracting the capture groups of `patterns.HASH`.
+    """
+    import polars as pl
+    from argendata_datasets.utils.product import patterns
+
+    entry = pl.col('entry')
+    at = entry.str.find('@', literal=True)
+
+    df = pl.DataFrame({'entry': column}).select(
+        valid = (
+            entry.str.contains(f'^{patterns.HASH_NON_CAPTURING}$')
+            & (entry.str.count_matches('@', literal=True) <= 1)
+        ),
+        filename = pl.when(at.is_not_null()).then(entry.str.slice(0, at)),
+        hash_part = (
+            pl.when(at.is_null()).then(entry).otherwise(entry.str.slice(at + 1))
+            .str.split_exact(':', 1)
+            .struct.rename_fields(['method', 'hexdigest'])
+        ),
+    ).unnest('hash_part').with_columns(
+        # The pattern accepts odd-length digests, which are not whole bytes.
+        valid = pl.col('valid') & (pl.col('hexdigest').str.len_bytes() % 2 == 0),
+    )
+
+    invalid = df.height - df['valid'].sum()
+    if invalid > 0:
+        raise ValueError(f"Invalid manifest entries: {invalid}")
+
+    return df.select(
+        pl.col('filename'),
+        pl.col('method').cast(pl.Categorical),
+        pl.col('hexdigest').str.decode('hex').alias('digest'),
+    )
+
+def serialize_column(df: 'pl.DataFrame') -> 'pl.Series':
+    """
+    Inverse of `parse_column`: formats a frame with `filename`, `method` and
+    `digest` columns as a string column of `Hash.to_str` entries.
+    """
+    import polars as pl
+
+    hash_part = pl.concat_str(
+        pl.col('method').cast(pl.String),
+        pl.lit(':'),
+        pl.col('digest').bin.encode('hex'),
+    )
+
+    return df.select(
+        pl.when(pl.col('filename').is_null())
+        .then(hash_part)
+        .otherwise(pl.concat_str(pl.col('filename'), pl.lit('@'), hash_part))
+        .alias('hash')
+    ).to_series()
+
+def read_frame(path: PathLike) -> 'pl.DataFrame':
+    """
+    Reads the manifest at `path` into a frame, see `parse_column`.
+    """
+    import polars as pl
+
+    lines = pl.read_csv(
+        path,
+        has_header=False,
+        new_columns=['line'],
+        separator='\x1f',
+        quote_char=None,
+        schema_overrides={'line': pl.String},
+    ).to_series().str.strip_chars()
+
+    lines = lines.filter(~lines.str.starts_with('#') & (lines.str.len_bytes() > 0))
+    return parse_column(lines)
+
+def write_frame(df: 'pl.DataFrame', to: PathLike, sort: bool = True) -> pathlib.Path:
+    """
+    Writes a frame with `filename`, `method` and `digest` columns as a
+    manifest, sorted by filename unless `sort=False`.
+    """
+    import polars as pl
+    to = pathlib.Path(to)
+
+    if df['filename'].null_count() > 0:
+        raise ValueError("Manifest entries must have a filename")
+
+    if sort:
+        df = df.sort(pl.col('filename'), pl.col('method').cast(pl.String))
+
+    serialize_column(df).to_frame().write_csv(to, include_header=False, quote_style='never')
+    return to
+
+def write(hashes: Iterable[Hash], to: PathLike, sort: bool = True) -> pathlib.Path:
+    """
+    Writes `hashes` to the manifest at `to`, one per line. Entries are sorted
+    by filename unless `sort=False`, so that manifests of the same files can
+    be diffed regardless of the order they were hashed in.
+    """
+    to = pathlib.Path(to)
+
+    if sort:
+        hashes = sorted(hashes, key=lambda h: (h.filename or '', h.method))
+
+    with to.open('w', encoding='utf-8') as f:
+        for h in hashes:
+            if h.filename is None:
+                raise ValueError(f"Manifest entries must have a filename: '{h}'")
+            f.write(h.to_str() + '\n')
+
+    return to
+
+def verify(
+    path: PathLike,
+    root: None|PathLike = None,
+    workers: None|int = None,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    cache: 'None|DigestCache' = None,
+) -> Verification:
+    """
+    Recomputes the checksum of every entry in the manifest at `path`,
+    concurrently, and compares it with the recorded one. With a `cache`,
+    unchanged files are checked with a single `stat()`.
+
+    Entries that cannot be checked, because they have no filename or their
+    file cannot be read, are reported in `Verification.errors`.
+    """
+    path = pathlib.Path(path)
+    root = path.parent if root is None else pathlib.Path(root)
+
+    def digest_entry(expected: Hash) -> Hash:
+        if expected.filename is None:
+            raise ValueError(f"Manifest entry without a filename: '{expected}'")
+        f = getattr(digest, expected.method)
+        return f(root / expected.filename, buffer_size=buffer_size, cache=cache)
+
+    result = Verification()
+    for expected, actual in map_unordered(digest_entry, read(path), workers):
+        if isinstance(actual, FileNotFoundError):
+            result.missing.append(expected)
+        elif isinstance(actual, Exception):
+            result.errors.append((expected, actual))
+        elif isinstance(actual, BaseException):
+            raise actual
+        elif expected.equals(actual, filename_eq=False):
+            result.ok.append(expected)
+        else:
+            actual = Hash(method=actual.method, hexdigest=actual.hexdigest, filename=expected.filename)
+            result.mismatched.append((expected, actual))
+
+    return result
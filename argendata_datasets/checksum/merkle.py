@@ -0,0 +1,314 @@
+"""
+Chunk-level Merkle index for partial verification and incremental re-hashing.
+
+A `MerkleIndex` stores the hash of every `chunk_size` bytes of a file and the
+Merkle root over those hashes. Leaves are `H(0x00 || chunk)` and inner nodes
+are `H(0x01 || left || right)`; an odd node at the end of a level is promoted
+to the next one. The root is an ordinary `Hash` with method
+`merkle_<method>_<chunk_size>`, so it can be stored in manifests and
+products, and `checksum.digest` and `checksum.hash` resolve that method
+name as well.
+
+Once the index itself is trusted (its root matches a known `Hash`), any byte
+range or parquet row group of the file can be verified by reading only the
+chunks that overlap it, and a file that was appended to or partially
+rewritten can be re-indexed by hashing only the affected chunks.
+
+Usage:
+
+>>> from argendata_datasets.checksum import merkle
+>>> index = merkle.build('file.parquet', method='sha256')
+>>> root = index.root
+>>> root
+<Hash object merkle_sha256_1048576:...>
+>>> index.save(merkle.sidecar_path('file.parquet'))
+>>> index = merkle.MerkleIndex.load(merkle.sidecar_path('file.parquet'))
+>>> index.verify_range('file.parquet', 0, 4096, expected=root)
+True
+>>> index.verify_row_group('file.parquet', 0, expected=root)
+True
+>>> index, rehashed = index.update('file.parquet') # after an append
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator
+from collections.abc import Buffer as ReadableBuffer
+from ._hash import Hash
+from ._hashlib import get_hash_method
+import json
+import os
+import pathlib
+import re
+
+if TYPE_CHECKING:
+    from .cache import DigestCache
+
+PathLike = str | pathlib.Path
+
+DEFAULT_CHUNK_SIZE = 1 << 20 # 1MiB
+METHOD_PATTERN = re.compile(r'^merkle_([a-zA-Z0-9_]+)_(\d+)$')
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+def method_name(method: str, chunk_size: int) -> str:
+    return f'merkle_{method}_{chunk_size}'
+
+def parse_method(name: str) -> None|tuple[str, int]:
+    """
+    Returns the `(method, chunk_size)` encoded in a Merkle method name, or None
+    if `name` is not a Merkle method.
+    """
+    match = METHOD_PATTERN.match(name)
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2))
+
+def sidecar_path(path: PathLike) -> pathlib.Path:
+    path = pathlib.Path(path)
+    return path.with_name(path.name + '.merkle.json')
+
+def leaf_digest(method: str, chunk: bytes) -> bytes:
+    hashobj = get_hash_method(method)(LEAF_PREFIX)
+    hashobj.update(chunk)
+    return hashobj.digest()
+
+def root_digest(method: str, leaves: list[bytes]) -> bytes:
+    f = get_hash_method(method)
+    level = leaves or [leaf_digest(method, b'')]
+
+    while len(level) > 1:
+        pairs = [level[i:i + 2] for i in range(0, len(level), 2)]
+        level = [
+            f(NODE_PREFIX + pair[0] + pair[1]).digest() if len(pair) == 2 else pair[0]
+            for pair in pairs
+        ]
+
+    return level[0]
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    parts, remaining = [], size
+    while remaining > 0:
+        part = stream.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b''.join(parts)
+
+def _iter_chunks(stream: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    while chunk := _read_exact(stream, chunk_size):
+        yield chunk
+
+def _chunk_range(start: int, end: int, chunk_size: int) -> range:
+    return range(start // chunk_size, -(-end // chunk_size))
+
+@dataclass
+class MerkleIndex:
+    method: str
+    chunk_size: int
+    size: int
+    leaves: list[bytes]
+
+    @property
+    def root(self) -> Hash:
+        return Hash(
+            method=method_name(self.method, self.chunk_size),
+            hexdigest=root_digest(self.method, self.leaves).hex(),
+        )
+
+    def _check_root(self, expected: None|Hash|str):
+        if expected is None:
+            return
+
+        if isinstance(expected, str):
+            expected = Hash.from_str(expected)
+
+        if not self.root.equals(expected, filename_eq=False):
+            raise ValueError(f"Merkle index root {self.root} does not match {expected}")
+
+    def verify_range(
+        self,
+        path: PathLike,
+        start: int,
+        end: int,
+        expected: None|Hash|str = None,
+    ) -> bool:
+        """
+        Checks that bytes `[start, end)` of the file at `path` match the index,
+        reading only the chunks that overlap the range.
+
+        The index is only as trustworthy as its root: pass the known root
+        `Hash` as `expected` to check it first (a `ValueError` is raised if it
+        does not match).
+        """
+        self._check_root(expected)
+
+        if not (0 <= start <= end <= self.size):
+            raise ValueError(f"Range [{start}, {end}) is outside of the indexed file (size {self.size})")
+
+        with open(path, 'rb') as f:
+            for i in _chunk_range(start, end, self.chunk_size):
+                f.seek(i * self.chunk_size)
+                chunk = _read_exact(f, self.chunk_size)
+                if leaf_digest(self.method, chunk) != self.leaves[i]:
+                    return False
+
+        return True
+
+    def verify_row_group(self, path: PathLike, row_group: int, expected: None|Hash|str = None) -> bool:
+        """
+        Checks that the parquet row group with index `row_group` matches the
+        index. The footer, which locates the row group, is verified too.
+        """
+        from argendata_datasets.utils import parquet
+
+        with open(path, 'rb') as f:
+            metadata = parquet.read_metadata(f)
+
+        footer_end = metadata.footer_offset + metadata.footer_length
+        if not self.verify_range(path, metadata.footer_offset, footer_end, expected):
+            return False
+
+        group = metadata.row_groups[row_group]
+        return self.verify_range(path, group.offset, group.offset + group.length)
+
+    def update(self, path: PathLike, dirty: Iterable[tuple[int, int]] = ()) -> tuple['MerkleIndex', list[int]]:
+        """
+        Re-indexes the file at `path` after it changed, hashing only the chunks
+        that may differ: those overlapping the `dirty` byte ranges, the last
+        chunk of the previous and the new version if it is partial, and every
+        chunk past the previous end of the file. Chunks outside of those are assumed to be
+        unchanged, as is the case for appends.
+
+        Only the size of the file is compared, not its modification time or
+        inode, so a file rewritten in place with the same size is not
+        detected: pass the rewritten ranges as `dirty`, or `build` it again.
+
+        Returns the new index and the indices of the chunks that were hashed.
+        """
+        size = os.stat(path).st_size
+        count = -(-size // self.chunk_size)
+        leaves = self.leaves[:count]
+
+        stale = set()
+        for start, end in dirty:
+            stale.update(_chunk_range(max(0, start), min(end, size), self.chunk_size))
+
+        if size != self.size and self.size % self.chunk_size:
+            stale.add(self.size // self.chunk_size)
+
+        if size < self.size and size % self.chunk_size:
+            stale.add(size // self.chunk_size)
+
+        stale.update(range(len(leaves), count))
+        stale = sorted(i for i in stale if i < count)
+
+        leaves.extend([b''] * (count - len(leaves)))
+        with open(path, 'rb') as f:
+            for i in stale:
+                f.seek(i * self.chunk_size)
+                leaves[i] = leaf_digest(self.method, _read_exact(f, self.chunk_size))
+
+        index = MerkleIndex(method=self.method, chunk_size=self.chunk_size, size=size, leaves=leaves)
+        return index, stale
+
+    def save(self, to: PathLike) -> pathlib.Path:
+        to = pathlib.Path(to)
+        to.write_text(json.dumps({
+            "root": str(self.root),
+            "method": self.method,
+            "chunk_size": self.chunk_size,
+            "size": self.size,
+            "leaves": [leaf.hex() for leaf in self.leaves],
+        }))
+        return to
+
+    @classmethod
+    def load(cls, path: PathLike) -> 'MerkleIndex':
+        data = json.loads(pathlib.Path(path).read_text())
+        index = cls(
+            method=data['method'],
+            chunk_size=data['chunk_size'],
+            size=data['size'],
+            leaves=[bytes.fromhex(leaf) for leaf in data['leaves']],
+        )
+        index._check_root(data['root'])
+        return index
+
+def build(
+    x: PathLike|BinaryIO,
+    method: str = 'sha256',
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> MerkleIndex:
+    """
+    Reads `x` once and builds its Merkle index.
+    """
+    if chunk_size <= 0:
+        raise ValueError(f"Chunk size must be positive, got {chunk_size}.")
+
+    get_hash_method(method)
+
+    if isinstance(x, PathLike):
+        with open(x, 'rb') as f:
+            return build(f, method, chunk_size)
+
+    size, leaves = 0, []
+    for chunk in _iter_chunks(x, chunk_size):
+        size += len(chunk)
+        leaves.append(leaf_digest(method, chunk))
+
+    return MerkleIndex(method=method, chunk_size=chunk_size, size=size, leaves=leaves)
+
+def hash(
+    data: ReadableBuffer,
+    method: str = 'sha256',
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Hash:
+    """
+    Computes the Merkle root of an in-memory buffer, like `hash.<algo>()`.
+    """
+    if chunk_size <= 0:
+        raise ValueError(f"Chunk size must be positive, got {chunk_size}.")
+
+    with memoryview(data) as base, base.cast('B') as view:
+        leaves = [
+            leaf_digest(method, view[start:start + chunk_size])
+            for start in range(0, len(view), chunk_size)
+        ]
+        size = len(view)
+
+    return MerkleIndex(method=method, chunk_size=chunk_size, size=size, leaves=leaves).root
+
+def digest(
+    x: PathLike|BinaryIO,
+    method: str = 'sha256',
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: 'None|DigestCache' = None,
+    buffer_size: None|int = None,
+    mmap: bool = False,
+) -> Hash:
+    """
+    Computes the Merkle root of `x` as a `Hash`, like `digest.<algo>()`.
+
+    `buffer_size` and `mmap` are accepted for compatibility with
+    `digest.<algo>()` and are ignored, since chunks are the unit of reading.
+    """
+    name = method_name(method, chunk_size)
+
+    if not isinstance(x, PathLike):
+        if cache is not None:
+            raise ValueError("cache requires a path, not a stream.")
+        return build(x, method, chunk_size).root
+
+    if cache is not None:
+        cached, st = cache.lookup(x, name)
+        if cached is not None:
+            return cached
+
+    root = build(x, method, chunk_size).root
+    result = Hash(method=root.method, hexdigest=root.hexdigest, filename=str(x))
+
+    if cache is not None:
+        cache.store(x, st, result)
+
+    return result
@@ -1,2 +1,6 @@
 from . import clean
-from . import raw
\ No newline at end of file
+from . import raw
+from .session import Session
+from .cache import DownloadCache
+from .bulk import Progress
+from .index import Index
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+Concurrent fetching of many static files.
+
+`clean.get_many`, `raw.get_many` and `raw.download_many` (and their `a*`
+asyncio counterparts) run the single-file functions for many filenames at
+once, with at most `workers` requests in flight over a shared `Session`.
+Results are yielded in completion order as `(filename, result)` pairs; a
+file that fails yields its exception in place of the result, so one failure
+does not stop the others.
+
+A `Progress` counts finished files and bytes received across all requests,
+both decoded and on the wire, and calls `callback` after each file.
+
+Usage:
+
+>>> from argendata_datasets.datasource.static import clean, Progress
+>>> index = clean.get_index(hostname)
+>>> progress = Progress(callback=print)
+>>> for filename, df in clean.get_many(index['path_clean'], hostname, workers=16, progress=progress):
+...     if isinstance(df, Exception):
+...         print(f'{filename} failed: {df}')
+>>> progress.bytes_per_second
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterable, Iterator
+from argendata_datasets.checksum.batch import map_unordered
+from .session import Session
+import asyncio
+import contextlib
+import contextvars
+import functools
+import pathlib
+import threading
+import time
+
+DEFAULT_WORKERS = 8
+
+class Progress:
+    """
+    Thread-safe counters of a bulk fetch.
+
+    Args:
+        - total: Number of files expected, if known. Set by the bulk
+          functions when `filenames` has a length.
+        - callback: Called with the `Progress` after each file finishes.
+    """
+    def __init__(self, total: None|int = None, callback: None|Callable[['Progress'], None] = None):
+        self.total = total
+        self.callback = callback
+        self.files = 0
+        self.failed = 0
+        self.bytes = 0
+        self.wire_bytes = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_bytes(self, n: int, wire_bytes: None|int = None):
+        """
+        Adds `n` bytes of content, of which `wire_bytes` were received (fewer
+        than `n` for compressed responses, `n` by default).
+        """
+        with self._lock:
+            self.bytes += n
+            self.wire_bytes += n if wire_bytes is None else wire_bytes
+
+    def done(self, filename: str, error: None|BaseException = None):
+        with self._lock:
+            self.files += 1
+            if error is not None:
+                self.failed += 1
+
+        if self.callback is not None:
+            self.callback(self)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def compression_ratio(self) -> float:
+        """
+        Bytes received over bytes of content: below 1 when responses were
+        compressed.
+        """
+        return self.wire_bytes / self.bytes if self.bytes else 1.0
+
+    def __repr__(self) -> str:
+        total = '?' if self.total is None else self.total
+        return (
+            f'<Progress {self.files}/{total} files ({self.failed} failed), '
+            f'{self.bytes / 2**20:.1f} MiB at {self.bytes_per_second / 2**20:.1f} MiB/s>'
+        )
+
+def _prepare(filenames: Iterable[str], progress: None|Progress) -> Iterable[str]:
+    if progress is not None and progress.total is None and hasattr(filenames, '__len__'):
+        progress.total = len(filenames)
+    return filenames
+
+@contextlib.contextmanager
+def _session(session: None|Session, workers: int):
+    # Without a session, one is shared by the whole batch so connections are
+    # reused across files.
+    if session is not None:
+        yield session
+        return
+
+    with Session(max_connections_per_host=workers) as session:
+        yield session
+
+def into_directory[R](func: Callable[..., R], directory: str|pathlib.Path) -> Callable[..., R]:
+    """
+    Adapts a `download_by_filename` function to download each file into
+    `directory`, under its path relative to the static root, so files with
+    the same name in different folders do not overwrite each other.
+
+    Raises `ValueError` for filenames outside the directory, and for a
+    filename downloaded twice.
+    """
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    claimed: set[pathlib.Path] = set()
+    lock = threading.Lock()
+
+    def download(filename: str, **kwargs) -> R:
+        relative = pathlib.PurePosixPath(filename)
+        if relative.is_absolute() or '..' in relative.parts:
+            raise ValueError(f"'{filename}' is not a path inside '{directory}'")
+
+        to = directory.joinpath(*relative.parts)
+        with lock:
+            if to in claimed:
+                raise ValueError(f"'{filename}' is downloaded to '{to}' more than once")
+            claimed.add(to)
+
+        to.parent.mkdir(parents=True, exist_ok=True)
+        return func(filename, to=to, **kwargs)
+
+    return download
+
+def fetch_many[R](
+    func: Callable[..., R],
+    filenames: Iterable[str],
+    workers: int = DEFAULT_WORKERS,
+    session: None|Session = None,
+    progress: None|Progress = None,
+    **kwargs,
+) -> Iterator[tuple[str, R|BaseException]]:
+    """
+    Calls `func(filename, session=session, progress=progress, **kwargs)` for
+    every filename on a pool of `workers` threads and yields
+    `(filename, result)` pairs in completion order.
+    """
+    filenames = _prepare(filenames, progress)
+
+    with _session(session, workers) as session:
+        def fetch(filename: str) -> R:
+            return func(filename, session=session, progress=progress, **kwargs)
+
+        for filename, result in map_unordered(fetch, filenames, workers):
+            if progress is not None:
+                progress.done(filename, result if isinstance(result, BaseException) else None)
+            yield filename, result
+
+async def afetch_many[R](
+    func: Callable[..., R],
+    filenames: Iterable[str],
+    workers: int = DEFAULT_WORKERS,
+    session: None|Session = None,
+    progress: None|Progress = None,
+    **kwargs,
+) -> AsyncIterator[tuple[str, R|BaseException]]:
+    """
+    Like `fetch_many`, as an async generator for use inside an event loop.
+    Requests run on a pool of `workers` threads, so the loop is never
+    blocked on the network.
+
+    If the generator is closed early, queued requests are cancelled and it
+    waits for those already running before closing the session.
+    """
+    filenames = _prepare(filenames, progress)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    with _session(session, workers) as session:
+        async def fetch(filename: str) -> tuple[str, R|BaseException]:
+            call = functools.partial(
+                contextvars.copy_context().run, func, filename, session=session, progress=progress, **kwargs
+            )
+            try:
+                result = await loop.run_in_executor(executor, call)
+            except asyncio.CancelledError:
+                raise
+            except BaseException as error:
+                # Like `fetch_many`, which yields whatever the thread raised.
+                result = error
+
+            if progress is not None:
+                progress.done(filename, result if isinstance(result, BaseException) else None)
+            return filename, result
+
+        tasks = [asyncio.ensure_future(fetch(filename)) for filename in filenames]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            await loop.run_in_executor(None, functools.partial(executor.shutdown, wait=True, cancel_futures=True))
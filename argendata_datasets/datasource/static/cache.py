@@ -0,0 +1,307 @@
+"""
+On-disk cache for static datasource downloads.
+
+Every file fetched through a `DownloadCache` is stored on disk with the
+`ETag` and `Last-Modified` headers of its response. Later requests for the
+same URL are revalidated with a conditional GET (`If-None-Match`,
+`If-Modified-Since`); on a 304 the cached copy is served without
+transferring the file again. In offline mode the cached copy is served
+without contacting the server at all.
+
+The cache is bounded by `max_bytes`, evicting the least recently used files.
+Its index is a SQLite database in WAL mode and fetches, evictions and reads
+of the same URL are serialized with a file lock, so several processes can
+share one cache directory. Files locked by a fetch are not evicted.
+
+Usage:
+
+>>> from argendata_datasets.datasource.static import DownloadCache, clean
+>>> cache = DownloadCache(max_bytes=20 << 30)
+>>> df = clean.get_by_filename('weo_imf.parquet', hostname, cache=cache)
+>>> df = clean.get_by_filename('weo_imf.parquet', hostname, cache=cache) # 304
+>>> offline = DownloadCache(offline=True)
+>>> df = clean.get_by_filename('weo_imf.parquet', hostname, cache=offline)
+"""
+
+from typing import TYPE_CHECKING, BinaryIO, Iterator
+import contextlib
+import hashlib
+import os
+import pathlib
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.request
+
+if TYPE_CHECKING:
+    from .session import Session
+
+PathLike = str | pathlib.Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER NOT NULL,
+    fetched REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+COPY_CHUNK_SIZE = 1 << 20 # 1MiB
+
+def default_directory() -> pathlib.Path:
+    base = os.environ.get('XDG_CACHE_HOME') or pathlib.Path.home() / '.cache'
+    return pathlib.Path(base) / 'argendata_datasets' / 'static'
+
+@contextlib.contextmanager
+def file_lock(path: pathlib.Path, blocking: bool = True) -> Iterator[bool]:
+    """
+    Exclusive lock across processes on `path`, where `fcntl` is available.
+    Yields whether the lock was acquired, which is always the case when
+    `blocking`.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield True
+        return
+
+    with open(path, 'a+b') as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class NotCached(FileNotFoundError):
+    """
+    Raised in offline mode when the requested URL is not in the cache.
+    """
+
+class DownloadCache:
+    """
+    Args:
+        - directory: Where files and the index are stored, defaults to
+          `$XDG_CACHE_HOME/argendata_datasets/static`.
+        - max_bytes: Budget for the cached files. The least recently used
+          files are evicted after each download to stay under it.
+        - offline: Serve only from the cache, without contacting the server.
+          Raises `NotCached` for files that are not cached.
+        - timeout: Seconds to wait for a lock held by another process.
+    """
+    hits: int
+    misses: int
+    revalidated: int
+
+    def __init__(
+        self,
+        directory: None|PathLike = None,
+        max_bytes: int = 10 << 30, # 10GiB
+        offline: bool = False,
+        timeout: float = 30.0,
+    ):
+        self.directory = default_directory() if directory is None else pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.timeout = timeout
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        for subdirectory in ('data', 'locks', 'tmp'):
+            (self.directory / subdirectory).mkdir(parents=True, exist_ok=True)
+
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.directory / 'index.sqlite3', timeout=self.timeout)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def path(self, url: str) -> pathlib.Path:
+        return self.directory / 'data' / self.key(url)
+
+    def _lock_path(self, url: str) -> pathlib.Path:
+        return self.directory / 'locks' / self.key(url)
+
+    def _entry(self, url: str) -> None|tuple[str|None, str|None]:
+        row = self._connect().execute(
+            'SELECT etag, last_modified FROM entries WHERE url = ?', (url,)
+        ).fetchone()
+
+        if row is None or not self.path(url).exists():
+            return None
+        return row
+
+    def _touch(self, url: str):
+        connection = self._connect()
+        with connection:
+            connection.execute('UPDATE entries SET last_used = ? WHERE url = ?', (time.time(), url))
+
+    def _store(self, url: str, response: BinaryIO) -> pathlib.Path:
+        path = self.path(url)
+        size = 0
+
+        with tempfile.NamedTemporaryFile(dir=self.directory / 'tmp', delete=False) as f:
+            try:
+                while chunk := response.read(COPY_CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                f.close()
+                os.unlink(f.name)
+                raise
+
+        os.replace(f.name, path)
+
+        now = time.time()
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO entries (url, key, etag, last_modified, size, fetched, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, self.key(url), response.headers.get('ETag'), response.headers.get('Last-Modified'), size, now, now),
+            )
+
+        self.evict(keep=url)
+        return path
+
+    @contextlib.contextmanager
+    def _fetched(self, request: urllib.request.Request, session: 'None|Session') -> Iterator[pathlib.Path]:
+        """
+        Yields the path of the cached copy of `request` while holding its
+        lock, so it is not evicted by another thread or process meanwhile.
+        """
+        from .utils import conditional_urlopen
+
+        url = request.full_url
+
+        with file_lock(self._lock_path(url)):
+            if self.offline:
+                if self._entry(url) is None:
+                    raise NotCached(f"'{url}' is not cached and the cache is offline")
+                self._count('hits')
+                self._touch(url)
+                yield self.path(url)
+                return
+
+            etag, last_modified = self._entry(url) or (None, None)
+
+            response = conditional_urlopen(request, session, etag, last_modified)
+            if response is None:
+                self._count('hits')
+                self._count('revalidated')
+                self._touch(url)
+                yield self.path(url)
+                return
+
+            with contextlib.closing(response):
+                self._count('misses')
+                path = self._store(url, response)
+            yield path
+
+    def fetch(self, request: urllib.request.Request, session: 'None|Session' = None) -> pathlib.Path:
+        """
+        Returns the path of the cached copy of `request`, downloading or
+        revalidating it first unless the cache is offline. Revalidated
+        copies count both as `hits` and as `revalidated`.
+        """
+        with self._fetched(request, session) as path:
+            return path
+
+    def open(self, request: urllib.request.Request, session: 'None|Session' = None) -> BinaryIO:
+        """
+        Like `fetch`, but returns the cached copy opened for reading. It is
+        opened before the lock is released, so it stays readable even if it
+        is evicted afterwards.
+        """
+        with self._fetched(request, session) as path:
+            return path.open('rb')
+
+    def evict(self, keep: None|str = None) -> int:
+        """
+        Removes the least recently used files until the cache is within
+        `max_bytes`. The entry of `keep` is never removed. Returns the number
+        of files removed.
+
+        Every file is removed while holding its lock. Files whose lock is
+        held, because they are being fetched or opened, are skipped instead
+        of waited for, since the caller may itself hold the lock of `keep`.
+        """
+        connection = self._connect()
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        for url, size in connection.execute('SELECT url, size FROM entries ORDER BY last_used').fetchall():
+            if total <= self.max_bytes:
+                break
+            if url == keep:
+                continue
+
+            with file_lock(self._lock_path(url), blocking=False) as locked:
+                if not locked:
+                    continue
+                with connection:
+                    deleted = connection.execute('DELETE FROM entries WHERE url = ?', (url,)).rowcount
+                self.path(url).unlink(missing_ok=True)
+
+            if deleted:
+                removed += 1
+                total -= size
+
+        return removed
+
+    def invalidate(self, url: None|str = None) -> int:
+        """
+        Removes `url` from the cache, or every entry if `url` is None.
+        Returns the number of entries removed.
+        """
+        connection = self._connect()
+        if url is None:
+            urls = [row[0] for row in connection.execute('SELECT url FROM entries')]
+        else:
+            urls = [url]
+
+        removed = 0
+        for u in urls:
+            with file_lock(self._lock_path(u)):
+                with connection:
+                    removed += connection.execute('DELETE FROM entries WHERE url = ?', (u,)).rowcount
+                self.path(u).unlink(missing_ok=True)
+
+        return removed
+
+    @property
+    def size(self) -> int:
+        return self._connect().execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
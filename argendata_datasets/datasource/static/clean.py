@@ -1,7 +1,30 @@
 import urllib.request
 import urllib.parse
+import contextlib
 import io
 import pathlib
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Iterator, overload
+from .utils import (
+    make_request,
+    urlopen,
+    HashingReader,
+    expected_checksum,
+    hash_methods,
+    check_checksum,
+)
+from . import ranges
+from .materialize import materialize as materialized, read_mapped
+from .index import Index, DEFAULT_TTL
+from . import index
+from .bulk import DEFAULT_WORKERS, fetch_many, afetch_many, into_directory
+
+if TYPE_CHECKING:
+    from argendata_datasets.checksum import Hash
+    from argendata_datasets.utils import Product
+    from .session import Session
+    from .cache import DownloadCache
+    from .bulk import Progress
+    import polars as pl
 
 def get_index(
     hostname: str,
@@ -10,22 +33,72 @@ def get_index(
     params='',
     query='',
     fragment='',
+    session: 'None|Session' = None,
+    cache: 'None|DownloadCache' = None,
+    progress: 'None|Progress' = None,
 ):
     import polars as pl
-    parts = urllib.parse.ParseResult(
+    request = make_request(
+        hostname=hostname,
         scheme=scheme,
-        netloc=hostname,
         path=path,
         params=params,
         query=query,
         fragment=fragment,
     )
 
-    url = parts.geturl()
-    request = urllib.request.Request(url)
-    response = urllib.request.urlopen(request)
+    response = urlopen(request, session, cache, progress)
     return pl.read_csv(response)
 
+def load_index(
+    hostname: str,
+    ttl: float = DEFAULT_TTL,
+    directory: None|str|pathlib.Path = None,
+    filename_column: str = 'path_clean',
+    id_column: str = 'id_fuente_clean',
+    scheme='http',
+    path='/static/etl-fuentes/fuentes_clean.csv',
+    params='',
+    query='',
+    fragment='',
+    session: 'None|Session' = None,
+) -> Index:
+    """
+    Like `get_index`, but returns a cached `Index` with O(1) lookups by
+    filename and source id. See `static.index` for how it is cached.
+
+    Args:
+        - ttl: Seconds a cached copy is used before it is revalidated.
+        - directory: Where the on-disk copies are stored, defaults to
+          `$XDG_CACHE_HOME/argendata_datasets/static/indexes`.
+        - filename_column: The column looked up by `Index.by_filename`.
+        - id_column: The column looked up by `Index.by_id`.
+    """
+    request = make_request(
+        hostname=hostname,
+        scheme=scheme,
+        path=path,
+        params=params,
+        query=query,
+        fragment=fragment,
+    )
+
+    return index.load(request, filename_column, id_column, ttl, directory, session)
+
+# With `hashes`, the result comes with the computed hashes.
+@overload
+def get_by_filename(
+    filename: str, hostname: str, scheme=..., path=..., params=..., query=..., fragment=...,
+    session: 'None|Session' = ..., cache: 'None|DownloadCache' = ..., progress: 'None|Progress' = ...,
+    hashes: tuple[()] = ..., expected: 'None|str|Hash|Product' = ..., materialize: None|str|pathlib.Path = ...,
+) -> 'pl.DataFrame': ...
+@overload
+def get_by_filename(
+    filename: str, hostname: str, scheme=..., path=..., params=..., query=..., fragment=...,
+    session: 'None|Session' = ..., cache: 'None|DownloadCache' = ..., progress: 'None|Progress' = ...,
+    *, hashes: str|Iterable[str], expected: 'None|str|Hash|Product' = ..., materialize: None = ...,
+) -> tuple['pl.DataFrame', dict[str, 'Hash']]: ...
+
 def get_by_filename(
     filename: str,
     hostname: str,
@@ -34,21 +107,199 @@ def get_by_filename(
     params='',
     query='',
     fragment='',
-):
+    session: 'None|Session' = None,
+    cache: 'None|DownloadCache' = None,
+    progress: 'None|Progress' = None,
+    hashes: str|Iterable[str] = (),
+    expected: 'None|str|Hash|Product' = None,
+    materialize: None|str|pathlib.Path = None,
+) -> 'pl.DataFrame | tuple[pl.DataFrame, dict[str, Hash]]':
+    """
+    Args:
+        - session: A `Session` whose pooled connections are used for the
+          request, instead of opening a new one.
+        - cache: A `DownloadCache` the file is served from, revalidating it
+          with the server first unless the cache is offline.
+        - progress: A `Progress` the bytes received are added to.
+        - hashes: Hash methods computed while the file is downloaded. If any
+          is given, a `(DataFrame, dict[str, Hash])` tuple is returned.
+        - expected: Checksum the file must match, as a `Hash`, a `Product` or
+          a string. Raises `checksum.ChecksumMismatch` otherwise.
+        - materialize: A directory where the dataset is stored once as an
+          Arrow IPC file, which this and other processes then read
+          memory-mapped (see `static.materialize`). Cannot be combined with
+          `cache`, `hashes` or `expected`.
+    """
     import polars as pl
     path = pathlib.Path(path) / filename
     path = str(path)
 
-    parts = urllib.parse.ParseResult(
+    request = make_request(
+        hostname=hostname,
         scheme=scheme,
-        netloc=hostname,
         path=path,
         params=params,
         query=query,
         fragment=fragment,
     )
 
-    url = parts.geturl()
-    request = urllib.request.Request(url)
-    response = urllib.request.urlopen(request)
-    return pl.read_parquet(response)
\ No newline at end of file
+    if materialize is not None:
+        if cache is not None or hashes or expected is not None:
+            raise ValueError("materialize cannot be combined with cache, hashes or expected.")
+        return read_mapped(materialized(request, materialize, session, progress))
+
+    expected = expected_checksum(expected)
+    methods = hash_methods(hashes, expected)
+
+    response = urlopen(request, session, cache, progress)
+    if not methods:
+        return pl.read_parquet(response)
+
+    reader = HashingReader(response, methods)
+    df = pl.read_parquet(reader)
+    reader.drain()
+
+    results = reader.results(filename=filename)
+    check_checksum(results, expected)
+    return (df, results) if hashes else df
+
+def scan_by_filename(
+    filename: str,
+    hostname: str,
+    scheme='http',
+    path='/static/etl-fuentes/clean',
+    params='',
+    query='',
+    fragment='',
+    session: 'None|Session' = None,
+    cache: 'None|DownloadCache' = None,
+    **kwargs,
+) -> 'pl.LazyFrame':
+    """
+    Returns a `LazyFrame` over a clean file without downloading it.
+
+    polars reads the parquet footer with a `Range` request and then fetches
+    only the column chunks of the selected columns, in the row groups whose
+    statistics can match the query's predicates, so the bytes transferred
+    scale with the query instead of the file.
+
+    >>> lf = clean.scan_by_filename('weo_imf.parquet', hostname)
+    >>> lf.filter(pl.col('iso3') == 'ARG').select('anio', 'valor').collect()
+
+    Args:
+        - session: Used for the `HEAD` request that checks whether the
+          server supports ranges, sent only for the first file of each
+          server. If it does not, the whole file is downloaded into memory
+          and scanned from there.
+        - cache: A `DownloadCache` the file is fetched into; the cached copy
+          is then scanned locally.
+
+    Other keyword arguments are passed to `pl.scan_parquet`.
+    """
+    import polars as pl
+    path = pathlib.Path(path) / filename
+    path = str(path)
+
+    request = make_request(
+        hostname=hostname,
+        scheme=scheme,
+        path=path,
+        params=params,
+        query=query,
+        fragment=fragment,
+    )
+
+    if cache is not None:
+        return pl.scan_parquet(cache.fetch(request, session), **kwargs)
+
+    if not ranges.accepts_ranges(request, session):
+        with contextlib.closing(urlopen(request, session)) as response:
+            return pl.scan_parquet(io.BytesIO(response.read()), **kwargs)
+
+    return pl.scan_parquet(request.full_url, **kwargs)
+
+def get_many(
+    filenames: Iterable[str],
+    hostname: str,
+    workers: int = DEFAULT_WORKERS,
+    session: 'None|Session' = None,
+    progress: 'None|Progress' = None,
+    **kwargs,
+) -> Iterator[tuple[str, 'pl.DataFrame|BaseException']]:
+    """
+    Fetches every file in `filenames` with `get_by_filename`, at most
+    `workers` at a time over a shared session, and yields
+    `(filename, result)` pairs in completion order. A file that fails yields
+    its exception in place of the result.
+
+    Other keyword arguments are passed to `get_by_filename`.
+    """
+    return fetch_many(
+        get_by_filename, filenames, workers, session, progress, hostname=hostname, **kwargs
+    )
+
+def aget_many(
+    filenames: Iterable[str],
+    hostname: str,
+    workers: int = DEFAULT_WORKERS,
+    session: 'None|Session' = None,
+    progress: 'None|Progress' = None,
+    **kwargs,
+) -> AsyncIterator[tuple[str, 'pl.DataFrame|BaseException']]:
+    """
+    Like `get_many`, as an async generator.
+    """
+    return afetch_many(
+        get_by_filename, filenames, workers, session, progress, hostname=hostname, **kwargs
+    )
+
+def download_by_filename(
+    filename: str,
+    hostname: str,
+    to: str|pathlib.Path,
+    path='/static/etl-fuentes/clean',
+    **kwargs,
+) -> pathlib.Path | tuple[pathlib.Path, dict[str, 'Hash']]:
+    """
+    Downloads a clean file to `to` without parsing it. Takes the same
+    arguments as `raw.download_by_filename`.
+    """
+    from . import raw
+    return raw.download_by_filename(filename, hostname, to, path=path, **kwargs)
+
+def download_many(
+    filenames: Iterable[str],
+    hostname: str,
+    to: str|pathlib.Path,
+    workers: int = DEFAULT_WORKERS,
+    session: 'None|Session' = None,
+    progress: 'None|Progress' = None,
+    **kwargs,
+) -> Iterator[tuple[str, pathlib.Path|BaseException]]:
+    """
+    Downloads every file in `filenames` into the directory `to` with
+    `download_by_filename`, at most `workers` at a time over a shared
+    session, and yields `(filename, path)` pairs in completion order. A file
+    that fails yields its exception in place of the path.
+
+    Other keyword arguments are passed to `download_by_filename`.
+    """
+    return fetch_many(
+        into_directory(download_by_filename, to), filenames, workers, session, progress, hostname=hostname, **kwargs
+    )
+
+def adownload_many(
+    filenames: Iterable[str],
+    hostname: str,
+    to: str|pathlib.Path,
+    workers: int = DEFAULT_WORKERS,
+    session: 'None|Session' = None,
+    progress: 'None|Progress' = None,
+    **kwargs,
+) -> AsyncIterator[tuple[str, pathlib.Path|BaseException]]:
+    """
+    Like `download_many`, as an async generator.
+    """
+    return afetch_many(
+        into_directory(download_by_filename, to), filenames, workers, session, progress, hostname=hostname, **kwargs
+    )
\ No newline at end of file
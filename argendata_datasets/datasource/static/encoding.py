@@ -0,0 +1,162 @@
+"""
+Content-Encoding negotiation and streaming decompression.
+
+`utils.urlopen` advertises the encodings in `accept_encoding()` on plain GET
+requests (gzip and deflate, plus zstd if the `zstandard` module is
+installed) and wraps encoded responses in a `DecodingReader`, which
+decompresses the body incrementally as it is read. Everything downstream
+(hashing, caching, parsing) sees the decoded bytes, so checksums match the
+files on the server.
+
+Requests with a `Range` header are never negotiated: ranges refer to the
+encoded bytes, so positions in the file would not line up.
+"""
+
+from typing import BinaryIO, Protocol
+import io
+import zlib
+
+READ_CHUNK_SIZE = 1 << 16 # 64KiB
+
+class Decoder(Protocol):
+    def decompress(self, data: bytes) -> bytes: ...
+    def flush(self) -> bytes: ...
+
+def _zstd_module():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+class GzipDecoder:
+    """
+    Decodes gzip streams, including several concatenated members.
+    """
+    def __init__(self):
+        self.decompressobj = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+
+    def decompress(self, data: bytes) -> bytes:
+        parts = []
+        while data:
+            parts.append(self.decompressobj.decompress(data))
+            if not self.decompressobj.eof:
+                break
+            data = self.decompressobj.unused_data
+            self.decompressobj = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        return b''.join(parts)
+
+    def flush(self) -> bytes:
+        return self.decompressobj.flush()
+
+class DeflateDecoder:
+    """
+    Decodes `deflate`, which is zlib-wrapped per the spec but sent as a raw
+    deflate stream by some servers.
+    """
+    def __init__(self):
+        self.decompressobj = None
+        self.first = b''
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.decompressobj is None:
+            self.first += data
+            if len(self.first) < 2:
+                return b''
+            data, self.first = self.first, b''
+            try:
+                self.decompressobj = zlib.decompressobj()
+                return self.decompressobj.decompress(data)
+            except zlib.error:
+                self.decompressobj = zlib.decompressobj(wbits=-zlib.MAX_WBITS)
+
+        return self.decompressobj.decompress(data)
+
+    def flush(self) -> bytes:
+        if self.decompressobj is None:
+            return zlib.decompress(self.first) if self.first else b''
+        return self.decompressobj.flush()
+
+class ZstdDecoder:
+    def __init__(self):
+        self.decompressobj = _zstd_module().ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes) -> bytes:
+        return self.decompressobj.decompress(data)
+
+    def flush(self) -> bytes:
+        return b''
+
+DECODERS = {
+    'gzip': GzipDecoder,
+    'x-gzip': GzipDecoder,
+    'deflate': DeflateDecoder,
+    'zstd': ZstdDecoder,
+}
+
+def available_encodings() -> list[str]:
+    encodings = ['gzip', 'deflate']
+    if _zstd_module() is not None:
+        encodings.insert(0, 'zstd')
+    return encodings
+
+def accept_encoding() -> str:
+    return ', '.join(available_encodings())
+
+def decoder(encoding: str) -> Decoder:
+    encoding = encoding.strip().lower()
+    if encoding not in DECODERS or (encoding == 'zstd' and _zstd_module() is None):
+        raise ValueError(f"Unsupported Content-Encoding '{encoding}'")
+    return DECODERS[encoding]()
+
+class DecodingReader(io.RawIOBase):
+    """
+    Wraps an encoded response and decompresses it as it is read.
+    `compressed` and `decompressed` count the bytes read from the response
+    and returned by the reader, and `ratio` is their quotient.
+    """
+    def __init__(self, stream: BinaryIO, encoding: str):
+        self.stream = stream
+        self.encoding = encoding
+        self.decoder = decoder(encoding)
+        self.status = getattr(stream, 'status', None)
+        self.headers = getattr(stream, 'headers', None)
+        self.compressed = 0
+        self.decompressed = 0
+        self._pending = memoryview(b'')
+        self._eof = False
+
+    @property
+    def ratio(self) -> float:
+        return self.compressed / self.decompressed if self.decompressed else 1.0
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self):
+        while not self._pending and not self._eof:
+            chunk = self.stream.read(READ_CHUNK_SIZE)
+            if chunk:
+                self.compressed += len(chunk)
+                self._pending = memoryview(self.decoder.decompress(chunk))
+            else:
+                self._eof = True
+                self._pending = memoryview(self.decoder.flush())
+
+    def readinto(self, b) -> int:
+        self._fill()
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        self.decompressed += n
+        return n
+
+    def readall(self) -> bytes:
+        chunks = []
+        while chunk := self.read(READ_CHUNK_SIZE):
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def close(self):
+        self.stream.close()
+        super().close()
@@ -0,0 +1,212 @@
+"""
+Cached, indexed copies of the datasource indexes (`fuentes_raw.csv`,
+`fuentes_clean.csv`).
+
+`raw.load_index` and `clean.load_index` return an `Index`, which looks rows
+up by filename or source id in O(1). Indexes are memoized in-process and
+stored on disk as uncompressed Arrow IPC files, so a cold start reads a
+local file instead of downloading and parsing the CSV. Once a copy
+is older than `ttl` seconds it is revalidated with the server using its
+`ETag`; the CSV is only downloaded again if it changed.
+
+Usage:
+
+>>> from argendata_datasets.datasource.static import raw
+>>> index = raw.load_index(hostname, ttl=600)
+>>> index.by_filename('fuente.xlsx')
+{'id_fuente': 1, 'path_raw': 'fuente.xlsx', ...}
+>>> index.by_id(1)['path_raw']
+'fuente.xlsx'
+"""
+
+from typing import TYPE_CHECKING, Any, Iterator
+from .cache import default_directory, file_lock
+from .utils import conditional_urlopen
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+import urllib.request
+
+if TYPE_CHECKING:
+    import polars as pl
+    from .session import Session
+
+PathLike = str | pathlib.Path
+
+DEFAULT_TTL = 300.0
+
+class Index:
+    """
+    A datasource index with O(1) lookups by `filename_column` and
+    `id_column`. The lookup tables are built on first use.
+    """
+    def __init__(
+        self,
+        df: 'pl.DataFrame',
+        filename_column: str,
+        id_column: str,
+        etag: None|str = None,
+        last_modified: None|str = None,
+        fetched: None|float = None,
+    ):
+        for column in (filename_column, id_column):
+            if column not in df.columns:
+                raise KeyError(f"Index has no column '{column}', columns are {df.columns}")
+
+        self.df = df
+        self.filename_column = filename_column
+        self.id_column = id_column
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched = time.time() if fetched is None else fetched
+        self._by_filename: None|dict[str, int] = None
+        self._by_id: None|dict[Any, int] = None
+
+    def _positions(self, column: str) -> dict[Any, int]:
+        return {value: i for i, value in enumerate(self.df[column].to_list())}
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched
+
+    def by_filename(self, filename: str) -> dict[str, Any]:
+        if self._by_filename is None:
+            self._by_filename = self._positions(self.filename_column)
+        return self.df.row(self._by_filename[filename], named=True)
+
+    def by_id(self, id: Any) -> dict[str, Any]:
+        if self._by_id is None:
+            self._by_id = self._positions(self.id_column)
+        return self.df.row(self._by_id[id], named=True)
+
+    @property
+    def filenames(self) -> list[str]:
+        return self.df[self.filename_column].to_list()
+
+    def __contains__(self, filename: str) -> bool:
+        if self._by_filename is None:
+            self._by_filename = self._positions(self.filename_column)
+        return filename in self._by_filename
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        return self.df.iter_rows(named=True)
+
+    def __len__(self) -> int:
+        return self.df.height
+
+    def __repr__(self) -> str:
+        return f'<Index {self.filename_column}/{self.id_column}: {len(self)} rows, {self.age:.0f}s old>'
+
+# Keyed by URL and directory, so loads into another directory still write it.
+_memo: dict[tuple[str, pathlib.Path], Index] = {}
+_memo_lock = threading.Lock()
+
+def _paths(directory: pathlib.Path, url: str) -> tuple[pathlib.Path, pathlib.Path]:
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return directory / f'{key}.arrow', directory / f'{key}.json'
+
+def _read_disk(
+    directory: pathlib.Path,
+    url: str,
+    filename_column: str,
+    id_column: str,
+) -> None|Index:
+    import polars as pl
+
+    data_path, meta_path = _paths(directory, url)
+    try:
+        meta = json.loads(meta_path.read_text())
+        df = pl.read_ipc(data_path)
+    except (FileNotFoundError, ValueError, pl.exceptions.PolarsError):
+        return None
+
+    # Metadata written by something else is a miss rather than a crash.
+    if not isinstance(meta, dict) or not isinstance(meta.get('fetched'), (int, float)):
+        return None
+
+    return Index(df, filename_column, id_column, meta.get('etag'), meta.get('last_modified'), meta['fetched'])
+
+def _write_meta(directory: pathlib.Path, url: str, index: Index):
+    _, meta_path = _paths(directory, url)
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+        json.dump({'url': url, 'etag': index.etag, 'last_modified': index.last_modified, 'fetched': index.fetched}, f)
+    os.replace(f.name, meta_path)
+
+def _write_disk(directory: pathlib.Path, url: str, index: Index):
+    data_path, _ = _paths(directory, url)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    index.df.write_ipc(tmp, compression='uncompressed')
+    os.replace(tmp, data_path)
+    _write_meta(directory, url, index)
+
+def load(
+    request: urllib.request.Request,
+    filename_column: str,
+    id_column: str,
+    ttl: float = DEFAULT_TTL,
+    directory: None|PathLike = None,
+    session: 'None|Session' = None,
+) -> Index:
+    """
+    Returns the `Index` of the CSV at `request`, from memory or disk if it is
+    younger than `ttl` seconds, revalidating or downloading it otherwise.
+    """
+    import polars as pl
+
+    url = request.full_url
+    directory = default_directory() / 'indexes' if directory is None else pathlib.Path(directory)
+
+    key = (url, directory.resolve())
+    with _memo_lock:
+        index = _memo.get(key)
+    if index is not None and index.age < ttl and (index.filename_column, index.id_column) == (filename_column, id_column):
+        return index
+
+    directory.mkdir(parents=True, exist_ok=True)
+    data_path, _ = _paths(directory, url)
+
+    with file_lock(data_path.with_suffix('.lock')):
+        cached = _read_disk(directory, url, filename_column, id_column)
+
+        if cached is not None and cached.age < ttl:
+            index = cached
+        else:
+            response = conditional_urlopen(
+                request,
+                session,
+                cached.etag if cached is not None else None,
+                cached.last_modified if cached is not None else None,
+            )
+
+            if response is None:
+                index = cached
+                index.fetched = time.time()
+                _write_meta(directory, url, index)
+            else:
+                df = pl.read_csv(response)
+                response.close()
+                index = Index(
+                    df,
+                    filename_column,
+                    id_column,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'),
+                )
+                _write_disk(directory, url, index)
+
+    with _memo_lock:
+        _memo[key] = index
+
+    return index
+
+def clear_memo():
+    """
+    Forgets the in-process copies of every index. On-disk copies are kept.
+    """
+    with _memo_lock:
+        _memo.clear()
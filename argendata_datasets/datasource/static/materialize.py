@@ -0,0 +1,123 @@
+"""
+Local Arrow IPC materialization of clean datasets, shared between processes.
+
+`clean.get_by_filename(..., materialize=directory)` decodes a dataset once
+into an uncompressed Arrow IPC file under `directory` and returns a frame
+that is memory-mapped from it. Every process reading the same dataset maps
+the same file, so the data lives once in the page cache instead of once per
+process heap. Mapping needs pyarrow (`pip install argendata_datasets[arrow]`);
+without it the file is read into memory, with a warning.
+
+The parquet file is revalidated with a conditional GET on every call (a 304
+when it did not change). It is downloaded and decoded again only when its
+`ETag` changes. Writers hold a file lock and replace the IPC file
+atomically, so readers that mapped an older version keep reading it
+unaffected.
+
+Usage:
+
+>>> from argendata_datasets.datasource.static import clean
+>>> df = clean.get_by_filename('weo_imf.parquet', hostname, materialize='/dev/shm/argendata')
+"""
+
+from typing import TYPE_CHECKING
+from .cache import file_lock
+from .utils import conditional_urlopen
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import urllib.request
+import warnings
+
+if TYPE_CHECKING:
+    import polars as pl
+    from .session import Session
+    from .bulk import Progress
+
+PathLike = str | pathlib.Path
+
+def paths(directory: PathLike, url: str) -> tuple[pathlib.Path, pathlib.Path]:
+    """
+    Returns the paths of the IPC file and of its metadata for `url`.
+    """
+    directory = pathlib.Path(directory)
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return directory / f'{key}.arrow', directory / f'{key}.json'
+
+def read_mapped(path: PathLike) -> 'pl.DataFrame':
+    """
+    Reads an uncompressed IPC file without copying it to the heap, through
+    `pyarrow.memory_map`. If pyarrow is not installed, warns and reads it
+    with `pl.read_ipc`, which copies it into memory.
+    """
+    import polars as pl
+
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError:
+        warnings.warn(
+            "pyarrow is not installed, so materialized datasets are read into memory "
+            "instead of memory-mapped. Install it with `pip install argendata_datasets[arrow]`.",
+            stacklevel=2,
+        )
+        return pl.read_ipc(path)
+
+    # The table's buffers keep the mapping alive after the file is closed.
+    with pa.memory_map(str(path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return pl.from_arrow(table, rechunk=False)
+
+def materialize(
+    request: urllib.request.Request,
+    directory: PathLike,
+    session: 'None|Session' = None,
+    progress: 'None|Progress' = None,
+) -> pathlib.Path:
+    """
+    Makes sure the IPC file for the parquet file at `request` is up to date
+    and returns its path.
+    """
+    import polars as pl
+    from .utils import CountingReader
+
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    data_path, meta_path = paths(directory, request.full_url)
+
+    with file_lock(data_path.with_suffix('.lock')):
+        meta = {}
+        if data_path.exists() and meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+
+        response = conditional_urlopen(request, session, meta.get('etag'), meta.get('last_modified'))
+        if response is None:
+            return data_path
+
+        try:
+            df = pl.read_parquet(response if progress is None else CountingReader(response, progress))
+        finally:
+            response.close()
+
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            df.write_ipc(tmp, compression='uncompressed')
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        os.replace(tmp, data_path)
+
+        meta = {
+            'url': request.full_url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    return data_path
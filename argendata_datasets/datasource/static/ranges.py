@@ -0,0 +1,182 @@
+"""
+HTTP `Range` requests for resumable and segmented downloads.
+
+`probe` asks the server for the size of a file, whether it advertises
+`Accept-Ranges: bytes` and its validator. `fetch_segments` splits a file into
+contiguous segments fetched in parallel, each written to its own offset of
+the destination with `os.pwrite`, so no segment waits on another and the file
+is never assembled in memory.
+
+Range requests carry the validator in an `If-Range` header, so if the file
+changes between requests the server answers with the whole new file (200)
+instead of a range of it, rather than mixing bytes of both versions.
+
+These are used by `raw.download_by_filename` (`resume=True`, `segments=N`);
+they fall back to a single sequential stream when the server does not
+support ranges.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from .utils import urlopen
+import os
+import re
+import urllib.parse
+import urllib.request
+
+if TYPE_CHECKING:
+    from .session import Session
+    from .bulk import Progress
+
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes\s+(?:(\d+)-(\d+)|\*)/(\d+|\*)$')
+DEFAULT_MIN_SEGMENT_SIZE = 16 << 20 # 16MiB
+WRITE_CHUNK_SIZE = 1 << 20 # 1MiB
+
+# Whether each `(scheme, netloc)` accepts ranges, as found by `accepts_ranges`.
+_accepts_ranges: dict[tuple[str, str], bool] = {}
+
+def with_range(
+    request: urllib.request.Request,
+    start: int,
+    end: None|int = None,
+    if_range: None|str = None,
+) -> urllib.request.Request:
+    """
+    Returns a copy of `request` for bytes `[start, end]` (inclusive, as in
+    the `Range` header), or from `start` to the end of the file. If
+    `if_range` is given, the range only applies while the file still has
+    that validator.
+    """
+    headers = dict(request.header_items())
+    headers['Range'] = f'bytes={start}-' if end is None else f'bytes={start}-{end}'
+    if if_range is not None:
+        headers['If-Range'] = if_range
+    return urllib.request.Request(request.full_url, headers=headers, method='GET')
+
+def validator(response) -> None|str:
+    """
+    Returns the value to send in `If-Range` for the version of the file in
+    `response`: its strong `ETag`, or else its `Last-Modified` date.
+    """
+    etag = response.headers.get('ETag')
+    if etag is not None and not etag.strip().startswith('W/'):
+        return etag.strip()
+    return response.headers.get('Last-Modified')
+
+def content_range(response) -> None|tuple[None|int, None|int, None|int]:
+    """
+    Parses the `Content-Range` header of a response into
+    `(start, end, size)`, with None for the parts given as `*`.
+    """
+    value = response.headers.get('Content-Range')
+    if value is None:
+        return None
+
+    match = CONTENT_RANGE_PATTERN.match(value.strip())
+    if match is None:
+        return None
+
+    start, end, size = match.groups()
+    return (
+        None if start is None else int(start),
+        None if end is None else int(end),
+        None if size == '*' else int(size),
+    )
+
+def probe(request: urllib.request.Request, session: 'None|Session' = None) -> tuple[None|int, bool, None|str]:
+    """
+    Sends a HEAD request and returns the size of the file, if known, whether
+    the server accepts byte ranges, and the file's `validator`, if any.
+    """
+    head = urllib.request.Request(request.full_url, headers=dict(request.header_items()), method='HEAD')
+    response = urlopen(head, session)
+    try:
+        response.read()
+    finally:
+        response.close()
+
+    length = response.headers.get('Content-Length')
+    accepts = response.headers.get('Accept-Ranges', '').strip().lower() == 'bytes'
+    return (int(length) if length is not None else None), accepts, validator(response)
+
+def accepts_ranges(request: urllib.request.Request, session: 'None|Session' = None) -> bool:
+    """
+    Whether the server of `request` accepts byte ranges. Only the first
+    request to each server is probed; the answer is remembered for the rest
+    of the process.
+    """
+    parts = urllib.parse.urlsplit(request.full_url)
+    key = (parts.scheme, parts.netloc)
+    if key not in _accepts_ranges:
+        _, _accepts_ranges[key], _ = probe(request, session)
+    return _accepts_ranges[key]
+
+def segment_bounds(size: int, segments: int, min_segment_size: int) -> list[tuple[int, int]]:
+    """
+    Splits `[0, size)` into at most `segments` contiguous `(start, end)`
+    ranges of at least `min_segment_size` bytes each (the last may be
+    smaller), with `end` inclusive.
+    """
+    count = max(1, min(segments, size // max(1, min_segment_size)))
+    step = -(-size // count)
+    return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+def _fetch_segment(
+    request: urllib.request.Request,
+    fd: int,
+    start: int,
+    end: int,
+    session: 'None|Session',
+    progress: 'None|Progress',
+    if_range: None|str,
+) -> int:
+    response = urlopen(with_range(request, start, end, if_range), session, progress=progress)
+    try:
+        if response.status != 206:
+            raise ValueError(f"Expected a 206 response for bytes {start}-{end}, got {response.status}")
+
+        offset = start
+        while chunk := response.read(min(WRITE_CHUNK_SIZE, end + 1 - offset)):
+            view = memoryview(chunk)
+            while view:
+                n = os.pwrite(fd, view, offset)
+                view = view[n:]
+                offset += n
+            if offset > end:
+                break
+    finally:
+        response.close()
+
+    if offset != end + 1:
+        raise ValueError(f"Segment {start}-{end} ended early at byte {offset}")
+
+    return offset - start
+
+def fetch_segments(
+    request: urllib.request.Request,
+    fd: int,
+    size: int,
+    segments: int,
+    min_segment_size: int = DEFAULT_MIN_SEGMENT_SIZE,
+    session: 'None|Session' = None,
+    progress: 'None|Progress' = None,
+    if_range: None|str = None,
+) -> int:
+    """
+    Downloads the `size` bytes of `request` into the file descriptor `fd`
+    in parallel segments and returns the number of bytes written. The file
+    is extended to `size` first, so segments can be written in any order.
+
+    Raises `ValueError` if a segment is not answered with a 206, e.g.
+    because the file no longer matches `if_range`. The file then has holes,
+    so it should be written to a temporary path and discarded on error.
+    """
+    os.ftruncate(fd, size)
+    bounds = segment_bounds(size, segments, min_segment_size)
+
+    with ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+        futures = [
+            executor.submit(_fetch_segment, request, fd, start, end, session, progress, if_range)
+            for start, end in bounds
+        ]
+        return sum(future.result() for future in futures)
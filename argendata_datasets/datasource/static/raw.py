@@ -1,8 +1,36 @@
+import urllib.error
 import urllib.request
 import urllib.parse
 import pathlib
 import io
-from .utils import make_request
+import os
+import tempfile
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Iterator, overload
+from argendata_datasets.checksum import ChecksumMismatch
+from argendata_datasets.checksum._multi import MultiHasher
+from argendata_datasets.checksum._stream import DEFAULT_BUFFER_SIZE, iter_chunks
+from .utils import (
+    make_request,
+    urlopen,
+    HashingReader,
+    expected_checksum,
+    hash_methods,
+    check_checksum,
+    READ_CHUNK_SIZE,
+)
+from .remote import RemoteFile
+from .ranges import DEFAULT_MIN_SEGMENT_SIZE
+from . import ranges
+from .index import Index, DEFAULT_TTL
+from . import index
+from .bulk import DEFAULT_WORKERS, fetch_many, afetch_many, into_directory
+
+if TYPE_CHECKING:
+    from argendata_datasets.checksum import Hash
+    from argendata_datasets.utils import Product
+    from .session import Session
+    from .cache import DownloadCache
+    from .bulk import Progress
 
 def get_index(
     hostname: str,
@@ -11,6 +39,9 @@ def get_index(
     params='',
     query='',
     fragment='',
+    session: 'None|Session' = None,
+    cache: 'None|DownloadCache' = None,
+    progress: 'None|Progress' = None,
 ):
     import polars as pl
     request = make_request(
@@ -22,9 +53,58 @@ def get_index(
         fragment=fragment,
     )
 
-    response = urllib.request.urlopen(request)
+    response = urlopen(request, session, cache, progress)
     return pl.read_csv(response)
 
+def load_index(
+    hostname: str,
+    ttl: float = DEFAULT_TTL,
+    directory: None|str|pathlib.Path = None,
+    filename_column: str = 'path_raw',
+    id_column: str = 'id_fuente',
+    scheme='http',
+    path='/static/etl-fuentes/fuentes_raw.csv',
+    params='',
+    query='',
+    fragment='',
+    session: 'None|Session' = None,
+) -> Index:
+    """
+    Like `get_index`, but returns a cached `Index` with O(1) lookups by
+    filename and source id. See `static.index` for how it is cached.
+
+    Args:
+        - ttl: Seconds a cached copy is used before it is revalidated.
+        - directory: Where the on-disk copies are stored, defaults to
+          `$XDG_CACHE_HOME/argendata_datasets/static/indexes`.
+        - filename_column: The column looked up by `Index.by_filename`.
+        - id_column: The column looked up by `Index.by_id`.
+    """
+    request = make_request(
+        hostname=hostname,
+        scheme=scheme,
+        path=path,
+        params=params,
+        query=query,
+        fragment=fragment,
+    )
+
+    return index.load(request, filename_column, id_column, ttl, directory, session)
+
+# With `hashes`, the result comes with the computed hashes.
+@overload
+def get_by_filename(
+    filename: str, hostname: str, scheme=..., path=..., params=..., query=..., fragment=...,
+    session: 'None|Session' = ..., cache: 'None|DownloadCache' = ..., progress: 'None|Progress' = ...,
+    hashes: tuple[()] = ..., expected: 'None|str|Hash|Product' = ...,
+) -> io.BytesIO: ...
+@overload
+def get_by_filename(
+    filename: str, hostname: str, scheme=..., path=..., params=..., query=..., fragment=...,
+    session: 'None|Session' = ..., cache: 'None|DownloadCache' = ..., progress: 'None|Progress' = ...,
+    *, hashes: str|Iterable[str], expected: 'None|str|Hash|Product' = ...,
+) -> tuple[io.BytesIO, dict[str, 'Hash']]: ...
+
 def get_by_filename(
     filename: str,
     hostname: str,
@@ -33,22 +113,120 @@ def get_by_filename(
     params='',
     query='',
     fragment='',
-) -> io.BytesIO:
+    session: 'None|Session' = None,
+    cache: 'None|DownloadCache' = None,
+    progress: 'None|Progress' = None,
+    hashes: str|Iterable[str] = (),
+    expected: 'None|str|Hash|Product' = None,
+) -> io.BytesIO | tuple[io.BytesIO, dict[str, 'Hash']]:
+    """
+    Args:
+        - session: A `Session` whose pooled connections are used for the
+          request, instead of opening a new one.
+        - cache: A `DownloadCache` the file is served from, revalidating it
+          with the server first unless the cache is offline.
+        - progress: A `Progress` the bytes received are added to.
+        - hashes: Hash methods computed while the file is downloaded. If any
+          is given, a `(BytesIO, dict[str, Hash])` tuple is returned.
+        - expected: Checksum the file must match, as a `Hash`, a `Product` or
+          a string. Raises `checksum.ChecksumMismatch` otherwise.
+    """
 
     path = pathlib.Path(path) / filename
     path = str(path)
 
     request = make_request(
         scheme=scheme,
-        netloc=hostname,
+        hostname=hostname,
         path=path,
         params=params,
         query=query,
         fragment=fragment,
     )
 
-    response = urllib.request.urlopen(request)
-    return io.BytesIO(response.read())
+    expected = expected_checksum(expected)
+    methods = hash_methods(hashes, expected)
+
+    response = urlopen(request, session, cache, progress)
+    if not methods:
+        return io.BytesIO(response.read())
+
+    reader = HashingReader(response, methods)
+    data = io.BytesIO(reader.read())
+
+    results = reader.results(filename=filename)
+    check_checksum(results, expected)
+    return (data, results) if hashes else data
+
+def open_by_filename(
+    filename: str,
+    hostname: str,
+    buffer_size: int = READ_CHUNK_SIZE,
+    scheme='http',
+    path='/static/etl-fuentes/raw',
+    params='',
+    query='',
+    fragment='',
+    session: 'None|Session' = None,
+    progress: 'None|Progress' = None,
+) -> io.BufferedReader:
+    """
+    Opens a raw file as a buffered binary stream that is read from the
+    network as it is consumed, instead of being loaded into memory like
+    `get_by_filename`. The stream is seekable if the server accepts byte
+    ranges (see `remote.RemoteFile`), so it can be passed to zip and
+    spreadsheet readers as well as `checksum.digest`.
+
+    Args:
+        - buffer_size: Size of the readahead buffer.
+        - session: A `Session` used for every request of the stream.
+        - progress: A `Progress` the bytes received are added to.
+    """
+    path = pathlib.Path(path) / filename
+    path = str(path)
+
+    request = make_request(
+        scheme=scheme,
+        hostname=hostname,
+        path=path,
+        params=params,
+        query=query,
+        fragment=fragment,
+    )
+
+    return io.BufferedReader(RemoteFile(request, session, progress), buffer_size=buffer_size)
+
+def iter_by_filename(
+    filename: str,
+    hostname: str,
+    chunk_size: int = READ_CHUNK_SIZE,
+    **kwargs,
+) -> Iterator[bytes]:
+    """
+    Yields the contents of a raw file in chunks of at most `chunk_size`
+    bytes as they arrive. Other keyword arguments are passed to
+    `open_by_filename`.
+    """
+    with open_by_filename(filename, hostname, buffer_size=chunk_size, **kwargs) as f:
+        while chunk := f.read1(chunk_size):
+            yield chunk
+
+@overload
+def download_by_filename(
+    filename: str, hostname: str, to: str|pathlib.Path, chunk_size: int = ...,
+    scheme=..., path=..., params=..., query=..., fragment=...,
+    session: 'None|Session' = ..., cache: 'None|DownloadCache' = ..., progress: 'None|Progress' = ...,
+    hashes: tuple[()] = ..., expected: 'None|str|Hash|Product' = ...,
+    resume: bool = ..., segments: int = ..., min_segment_size: int = ...,
+) -> pathlib.Path: ...
+@overload
+def download_by_filename(
+    filename: str, hostname: str, to: str|pathlib.Path, chunk_size: int = ...,
+    scheme=..., path=..., params=..., query=..., fragment=...,
+    session: 'None|Session' = ..., cache: 'None|DownloadCache' = ..., progress: 'None|Progress' = ...,
+    *, hashes: str|Iterable[str], expected: 'None|str|Hash|Product' = ...,
+    resume: bool = ..., segments: int = ..., min_segment_size: int = ...,
+) -> tuple[pathlib.Path, dict[str, 'Hash']]: ...
 
 def download_by_filename(
     filename: str,
@@ -60,7 +238,45 @@ def download_by_filename(
     params='',
     query='',
     fragment='',
-) -> pathlib.Path:
+    session: 'None|Session' = None,
+    cache: 'None|DownloadCache' = None,
+    progress: 'None|Progress' = None,
+    hashes: str|Iterable[str] = (),
+    expected: 'None|str|Hash|Product' = None,
+    resume: bool = False,
+    segments: int = 1,
+    min_segment_size: int = DEFAULT_MIN_SEGMENT_SIZE,
+) -> pathlib.Path | tuple[pathlib.Path, dict[str, 'Hash']]:
+    """
+    Args:
+        - session: A `Session` whose pooled connections are used for the
+          request, instead of opening a new one.
+        - cache: A `DownloadCache` the file is served from, revalidating it
+          with the server first unless the cache is offline.
+        - progress: A `Progress` the bytes received are added to.
+        - hashes: Hash methods computed on each chunk as it is written. If any
+          is given, a `(Path, dict[str, Hash])` tuple is returned.
+        - expected: Checksum the file must match, as a `Hash`, a `Product` or
+          a string. If it does not, the file is removed and
+          `checksum.ChecksumMismatch` is raised.
+        - resume: If `to` already exists, request only the bytes after its
+          current size with a `Range` header and append them. If the server
+          answers with the whole file instead, `to` is rewritten. While the
+          download is incomplete, the file's validator is kept next to `to`
+          (in `.<name>.validator`) and sent in `If-Range` when resuming, so
+          a file that changed meanwhile is downloaded whole. Pass `expected`
+          to catch a partial file from elsewhere.
+        - segments: Split files of at least `2 * min_segment_size` bytes
+          into up to this many segments downloaded in parallel, if the
+          server advertises `Accept-Ranges: bytes` and a validator.
+          Otherwise the file is downloaded as a single stream. Segments are
+          written to a temporary file that replaces `to` once all of them
+          arrived, so a failed download leaves nothing to resume from.
+
+    `resume` and `segments` are ignored when a `cache` is given, and cannot
+    be combined: a `ValueError` is raised if both are given. With either,
+    the file is requested uncompressed, since ranges refer to its bytes.
+    """
     to = pathlib.Path(to)
 
     path = pathlib.Path(path) / filename
@@ -68,20 +284,181 @@ def download_by_filename(
 
     request = make_request(
         scheme=scheme,
-        netloc=hostname,
+        hostname=hostname,
         path=path,
         params=params,
         query=query,
         fragment=fragment,
     )
 
-    response = urllib.request.urlopen(request)
-    
-    with to.open('wb') as f:
+    if resume and segments > 1:
+        raise ValueError("`resume` and `segments` cannot be combined")
+
+    expected = expected_checksum(expected)
+    methods = hash_methods(hashes, expected)
+
+    if cache is None and segments > 1:
+        size, accepts_ranges, validator = ranges.probe(request, session)
+        if accepts_ranges and validator is not None and size is not None and size >= 2 * min_segment_size:
+            fd, tmp = tempfile.mkstemp(dir=to.parent, prefix=f'.{to.name}.', suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    ranges.fetch_segments(
+                        request, f.fileno(), size, segments, min_segment_size, session, progress, validator,
+                    )
+                os.replace(tmp, to)
+            except BaseException:
+                pathlib.Path(tmp).unlink(missing_ok=True)
+                raise
+
+            hasher = MultiHasher(methods) if methods else None
+            if hasher is not None:
+                _hash_file(hasher, to)
+            return _finish(to, filename, hasher, hashes, expected)
+
+    resume = resume and cache is None
+    validator_path = to.with_name(f'.{to.name}.validator')
+    offset = to.stat().st_size if resume and to.exists() else 0
+    if offset:
+        if_range = validator_path.read_text() if validator_path.exists() else None
+        request = ranges.with_range(request, offset, if_range=if_range)
+
+    try:
+        # A resumable download must be of the uncompressed file, so that its
+        # validator and byte offsets are those later ranges refer to.
+        compression = not resume and segments <= 1
+        response = urlopen(request, session, cache, progress, compression=compression)
+    except urllib.error.HTTPError as error:
+        # 416 for a range starting at the end of the file: it is complete.
+        if not offset or error.code != 416 or ranges.content_range(error) != (None, None, offset):
+            raise
+        validator_path.unlink(missing_ok=True)
+        hasher = MultiHasher(methods) if methods else None
+        if hasher is not None:
+            _hash_file(hasher, to)
+        return _finish(to, filename, hasher, hashes, expected)
+
+    append = offset > 0 and response.status == 206
+    if append and ranges.content_range(response)[:1] != (offset,):
+        response.close()
+        raise ValueError(f"Expected a response starting at byte {offset}, got {response.headers.get('Content-Range')}")
+
+    if resume:
+        # Kept until the download completes, for the next resume to check.
+        validator = ranges.validator(response)
+        if validator is not None:
+            validator_path.write_text(validator)
+        else:
+            validator_path.unlink(missing_ok=True)
+
+    reader = HashingReader(response, methods) if methods else response
+    if append and methods:
+        _hash_file(reader.hasher, to)
+
+    with to.open('ab' if append else 'wb') as f:
         while True:
-            chunk = response.read(chunk_size)
+            chunk = reader.read(chunk_size)
             if not chunk:
                 break
             f.write(chunk)
 
-    return to
\ No newline at end of file
+    if resume:
+        validator_path.unlink(missing_ok=True)
+
+    return _finish(to, filename, reader.hasher if methods else None, hashes, expected)
+
+def _hash_file(hasher: MultiHasher, path: pathlib.Path):
+    with path.open('rb') as f:
+        for chunk in iter_chunks(f, DEFAULT_BUFFER_SIZE):
+            hasher.update(chunk)
+
+def _finish(
+    to: pathlib.Path,
+    filename: str,
+    hasher: None|MultiHasher,
+    hashes: str|Iterable[str],
+    expected: 'None|Hash',
+) -> pathlib.Path | tuple[pathlib.Path, dict[str, 'Hash']]:
+    if hasher is None:
+        return to
+
+    results = hasher.results(filename=filename)
+    try:
+        check_checksum(results, expected)
+    except ChecksumMismatch:
+        to.unlink()
+        raise
+
+    return (to, results) if hashes else to
+
+def get_many(
+    filenames: Iterable[str],
+    hostname: str,
+    workers: int = DEFAULT_WORKERS,
+    session: 'None|Session' = None,
+    progress: 'None|Progress' = None,
+    **kwargs,
+) -> Iterator[tuple[str, io.BytesIO|BaseException]]:
+    """
+    Fetches every file in `filenames` with `get_by_filename`, at most
+    `workers` at a time over a shared session, and yields
+    `(filename, result)` pairs in completion order. A file that fails yields
+    its exception in place of the result.
+
+    Other keyword arguments are passed to `get_by_filename`.
+    """
+    return fetch_many(
+        get_by_filename, filenames, workers, session, progress, hostname=hostname, **kwargs
+    )
+
+def aget_many(
+    filenames: Iterable[str],
+    hostname: str,
+    workers: int = DEFAULT_WORKERS,
+    session: 'None|Session' = None,
+    progress: 'None|Progress' = None,
+    **kwargs,
+) -> AsyncIterator[tuple[str, io.BytesIO|BaseException]]:
+    """
+    Like `get_many`, as an async generator.
+    """
+    return afetch_many(
+        get_by_filename, filenames, workers, session, progress, hostname=hostname, **kwargs
+    )
+
+def download_many(
+    filenames: Iterable[str],
+    hostname: str,
+    to: str|pathlib.Path,
+    workers: int = DEFAULT_WORKERS,
+    session: 'None|Session' = None,
+    progress: 'None|Progress' = None,
+    **kwargs,
+) -> Iterator[tuple[str, pathlib.Path|BaseException]]:
+    """
+    Downloads every file in `filenames` into the directory `to` with
+    `download_by_filename`, at most `workers` at a time over a shared
+    session, and yields `(filename, path)` pairs in completion order. A file
+    that fails yields its exception in place of the path.
+
+    Other keyword arguments are passed to `download_by_filename`.
+    """
+    return fetch_many(
+        into_directory(download_by_filename, to), filenames, workers, session, progress, hostname=hostname, **kwargs
+    )
+
+def adownload_many(
+    filenames: Iterable[str],
+    hostname: str,
+    to: str|pathlib.Path,
+    workers: int = DEFAULT_WORKERS,
+    session: 'None|Session' = None,
+    progress: 'None|Progress' = None,
+    **kwargs,
+) -> AsyncIterator[tuple[str, pathlib.Path|BaseException]]:
+    """
+    Like `download_many`, as an async generator.
+    """
+    return afetch_many(
+        into_directory(download_by_filename, to), filenames, workers, session, progress, hostname=hostname, **kwargs
+    )
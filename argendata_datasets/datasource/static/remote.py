@@ -0,0 +1,155 @@
+"""
+Streaming, seekable file objects over HTTP.
+
+A `RemoteFile` reads the response body as it is consumed instead of loading
+it into memory. If the server accepts byte ranges, seeking closes the
+current response and the next read continues with a `Range` request from
+the new position, so zip readers (which read the central directory at the
+end of the file first) and other random-access consumers work with bounded
+memory. Short forward seeks are served by skipping bytes of the current
+response instead.
+
+Range requests carry the validator of the first response in `If-Range`, so
+if the file changes while it is open the next range request fails with
+`OSError` instead of returning bytes of the new version.
+
+`raw.open_by_filename` wraps it in an `io.BufferedReader`, whose buffer is
+the readahead.
+
+Usage:
+
+>>> from argendata_datasets.datasource.static import raw
+>>> with raw.open_by_filename('fuente.zip', hostname) as f:
+...     names = zipfile.ZipFile(f).namelist()
+>>> for chunk in raw.iter_by_filename('fuente.csv', hostname):
+...     ...
+"""
+
+from typing import TYPE_CHECKING
+from .utils import urlopen
+from . import ranges
+import io
+import os
+import urllib.request
+
+if TYPE_CHECKING:
+    from .session import Session
+    from .bulk import Progress
+
+# Forward seeks up to this many bytes read and discard the bytes in between
+# rather than starting a new request.
+SKIP_THRESHOLD = 1 << 18 # 256KiB
+SKIP_CHUNK_SIZE = 1 << 16 # 64KiB
+
+class RemoteFile(io.RawIOBase):
+    """
+    Args:
+        - request: The request for the whole file. It is sent right away, so
+          HTTP errors are raised by the constructor.
+        - session: A `Session` used for every request.
+        - progress: A `Progress` the bytes received are added to.
+    """
+    def __init__(
+        self,
+        request: urllib.request.Request,
+        session: 'None|Session' = None,
+        progress: 'None|Progress' = None,
+    ):
+        self.request = request
+        self.session = session
+        self.progress = progress
+        self.name = request.full_url
+
+        # Compressed responses cannot be seeked into, so none is accepted.
+        self._response = urlopen(request, session, progress=progress, compression=False)
+        length = self._response.headers.get('Content-Length')
+        self.size: None|int = int(length) if length is not None else None
+        self.accepts_ranges = self._response.headers.get('Accept-Ranges', '').strip().lower() == 'bytes'
+        self.validator = ranges.validator(self._response)
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return self.accepts_ranges and self.size is not None
+
+    def tell(self) -> int:
+        return self._position
+
+    def _open(self):
+        request = ranges.with_range(self.request, self._position, if_range=self.validator)
+        response = urlopen(request, self.session, progress=self.progress, compression=False)
+
+        if response.status == 200:
+            response.close()
+            if self.validator is not None:
+                raise OSError(f"{self.name}: the file changed since it was opened")
+            raise OSError(f"{self.name}: the server did not honor a range from byte {self._position}")
+        if response.status != 206 or ranges.content_range(response)[:1] != (self._position,):
+            response.close()
+            raise OSError(f"{self.name}: the server did not honor a range from byte {self._position}")
+
+        self._response = response
+
+    def _skip(self, n: int):
+        while n > 0:
+            chunk = self._response.read(min(n, SKIP_CHUNK_SIZE))
+            if not chunk:
+                break
+            n -= len(chunk)
+            self._position += len(chunk)
+
+    def readinto(self, b) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        if self.size is not None and self._position >= self.size:
+            return 0
+
+        if self._response is None:
+            self._open()
+
+        n = self._response.readinto(b)
+        self._position += n
+        return n
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self._position + offset
+        elif whence == os.SEEK_END:
+            if self.size is None:
+                raise io.UnsupportedOperation(f"{self.name}: size is unknown")
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+
+        delta = position - self._position
+        if delta == 0:
+            return position
+
+        if not self.seekable():
+            raise io.UnsupportedOperation(f"{self.name}: the server does not accept ranges")
+
+        if self._response is not None and 0 < delta <= SKIP_THRESHOLD:
+            self._skip(delta)
+        else:
+            self._close_response()
+            self._position = position
+
+        return self._position
+
+    def _close_response(self):
+        response, self._response = self._response, None
+        if response is not None:
+            response.close()
+
+    def close(self):
+        if not self.closed:
+            self._close_response()
+        super().close()
@@ -0,0 +1,219 @@
+"""
+Reusable HTTP session for the static datasource.
+
+A `Session` keeps a bounded pool of persistent `http.client` connections per
+host, so consecutive requests reuse the same TCP (and TLS) connection
+instead of paying the connection setup every time. Sessions are thread-safe
+and can be shared by every call to the static datasource functions.
+
+Usage:
+
+>>> from argendata_datasets.datasource.static import Session, clean
+>>> with Session(max_connections_per_host=8) as session:
+...     index = clean.get_index(hostname, session=session)
+...     df = clean.get_by_filename('weo_imf.parquet', hostname, session=session)
+"""
+
+import http.client
+import io
+import ssl
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import weakref
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 10
+
+# Errors raised when an idle keep-alive connection was closed by the server.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+)
+
+class HostPool:
+    """
+    Connections to a single `(scheme, netloc)`. At most `max_connections`
+    connections are in use at once; further requests wait for one to be
+    released.
+    """
+    def __init__(self, scheme: str, netloc: str, max_connections: int, timeout: float, context: None|ssl.SSLContext):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.timeout = timeout
+        self.context = context
+        self.idle: list[http.client.HTTPConnection] = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_connections)
+
+    def connect(self) -> http.client.HTTPConnection:
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.netloc, timeout=self.timeout, context=self.context)
+        return http.client.HTTPConnection(self.netloc, timeout=self.timeout)
+
+    def acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        """
+        Returns a connection and whether it was reused from the idle pool.
+        """
+        self.slots.acquire()
+        with self.lock:
+            if self.idle:
+                return self.idle.pop(), True
+        return self.connect(), False
+
+    def release(self, connection: http.client.HTTPConnection, reusable: bool):
+        if reusable:
+            with self.lock:
+                self.idle.append(connection)
+        else:
+            connection.close()
+        self.slots.release()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            connection.close()
+
+class PooledResponse(io.RawIOBase):
+    """
+    Binary file-like response that returns its connection to the pool once
+    the body has been read to the end. Closing it before that discards the
+    connection, since the unread part of the body would corrupt the next
+    response. A response that is garbage collected without being closed
+    discards its connection too, so it does not keep a slot of the pool.
+    """
+    def __init__(self, url: str, response: http.client.HTTPResponse, pool: HostPool, connection: http.client.HTTPConnection):
+        self.url = url
+        self.response = response
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self._pool = pool
+        self._connection = connection
+        # Must not reference self, or the response would never be collected.
+        self._finalizer = weakref.finalize(self, HostPool.release, pool, connection, False)
+
+    def getheader(self, name: str, default=None):
+        return self.response.getheader(name, default)
+
+    def geturl(self) -> str:
+        return self.url
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._connection is None:
+            return 0
+
+        n = self.response.readinto(b)
+        if n == 0 or self.response.isclosed():
+            self._release(reusable=not self.response.will_close)
+        return n
+
+    def _release(self, reusable: bool):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self._finalizer.detach()
+            self._pool.release(connection, reusable=reusable and self.response.isclosed())
+
+    def close(self):
+        if self._connection is not None:
+            self.response.close()
+            self._release(reusable=False)
+        super().close()
+
+class Session:
+    """
+    Args:
+        - max_connections_per_host: Maximum number of connections to a host,
+          both in use and idle. Requests over the limit wait for a connection
+          to be released.
+        - timeout: Socket timeout in seconds.
+        - context: SSL context for https connections.
+    """
+    def __init__(
+        self,
+        max_connections_per_host: int = 8,
+        timeout: float = 60.0,
+        context: None|ssl.SSLContext = None,
+    ):
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self.context = context
+        self._pools: dict[tuple[str, str], HostPool] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, scheme: str, netloc: str) -> HostPool:
+        key = (scheme, netloc)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = HostPool(scheme, netloc, self.max_connections_per_host, self.timeout, self.context)
+                self._pools[key] = pool
+            return pool
+
+    def _send(self, pool: HostPool, request: urllib.request.Request, url: str) -> PooledResponse:
+        headers = dict(request.header_items())
+
+        while True:
+            connection, reused = pool.acquire()
+            try:
+                connection.request(request.get_method(), request.selector, body=request.data, headers=headers)
+                response = connection.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                pool.release(connection, reusable=False)
+                if reused:
+                    # The server closed an idle connection: retry on a new one.
+                    continue
+                raise
+            except BaseException:
+                pool.release(connection, reusable=False)
+                raise
+
+            return PooledResponse(url, response, pool, connection)
+
+    def urlopen(self, request: urllib.request.Request) -> PooledResponse:
+        """
+        Sends `request` on a pooled connection and returns the response.
+        Redirects are followed and error statuses raise
+        `urllib.error.HTTPError`, like `urllib.request.urlopen`.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            url = request.full_url
+            parts = urllib.parse.urlsplit(url)
+            if parts.scheme not in ('http', 'https'):
+                raise ValueError(f"Unsupported scheme '{parts.scheme}': {url}")
+
+            response = self._send(self._pool(parts.scheme, parts.netloc), request, url)
+
+            if response.status in REDIRECT_CODES and response.getheader('Location'):
+                location = urllib.parse.urljoin(url, response.getheader('Location'))
+                response.read()
+                response.close()
+                method = 'GET' if response.status == 303 else request.get_method()
+                request = urllib.request.Request(location, headers=dict(request.header_items()), method=method)
+                continue
+
+            if response.status >= 400:
+                # Read the error body so the connection goes back to the pool.
+                body = io.BytesIO(response.read())
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, body)
+
+            return response
+
+        raise urllib.error.HTTPError(url, response.status, "Too many redirects", response.headers, None)
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
@@ -1,6 +1,20 @@
+from typing import TYPE_CHECKING, BinaryIO, Iterable
+from argendata_datasets.checksum import Hash, ChecksumMismatch
+from argendata_datasets.checksum._multi import MultiHasher
+from .encoding import DecodingReader, accept_encoding
+import io
+import urllib.error
 import urllib.request
 import urllib.parse
 
+if TYPE_CHECKING:
+    from argendata_datasets.utils import Product
+    from .session import Session
+    from .cache import DownloadCache
+    from .bulk import Progress
+
+READ_CHUNK_SIZE = 1 << 20 # 1MiB
+
 def make_request(
     hostname: str,
     scheme: str,
@@ -21,4 +35,203 @@ def make_request(
     )
 
     url = parts.geturl()
-    return urllib.request.Request(url, method=method)
\ No newline at end of file
+    return urllib.request.Request(url, method=method)
+
+def urlopen(
+    request: urllib.request.Request,
+    session: 'None|Session' = None,
+    cache: 'None|DownloadCache' = None,
+    progress: 'None|Progress' = None,
+    compression: bool = True,
+):
+    """
+    Opens `request` on a pooled connection of `session`, or with
+    `urllib.request.urlopen` if no session is given. If a `cache` is given,
+    the cached copy of the file is opened instead, fetching it first if
+    needed. If a `progress` is given, the bytes read from the response are
+    added to it.
+
+    Unless `compression` is False, plain GET requests accept compressed
+    responses, which are decompressed as they are read (see
+    `static.encoding`).
+    """
+    if cache is not None:
+        response = cache.open(request, session)
+    else:
+        if compression and request.get_method() == 'GET' and not request.has_header('Range'):
+            request = _with_accept_encoding(request)
+
+        response = urllib.request.urlopen(request) if session is None else session.urlopen(request)
+
+        content_encoding = response.headers.get('Content-Encoding', 'identity').strip().lower()
+        if content_encoding != 'identity':
+            response = DecodingReader(response, content_encoding)
+
+    if progress is not None:
+        return CountingReader(response, progress)
+    return response
+
+def _with_accept_encoding(request: urllib.request.Request) -> urllib.request.Request:
+    if request.has_header('Accept-encoding'):
+        return request
+    headers = dict(request.header_items())
+    headers['Accept-Encoding'] = accept_encoding()
+    return urllib.request.Request(request.full_url, data=request.data, headers=headers, method=request.get_method())
+
+def conditional_urlopen(
+    request: urllib.request.Request,
+    session: 'None|Session' = None,
+    etag: None|str = None,
+    last_modified: None|str = None,
+):
+    """
+    Opens `request` with `If-None-Match` / `If-Modified-Since` headers for a
+    copy with the given validators. Returns None if the server answers 304
+    Not Modified, the response otherwise.
+    """
+    conditional = urllib.request.Request(
+        request.full_url,
+        headers=dict(request.header_items()),
+        method=request.get_method(),
+    )
+    if etag:
+        conditional.add_header('If-None-Match', etag)
+    if last_modified:
+        conditional.add_header('If-Modified-Since', last_modified)
+
+    try:
+        response = urlopen(conditional, session)
+    except urllib.error.HTTPError as error:
+        if error.code != 304 or not (etag or last_modified):
+            raise
+        response = error
+
+    if response.status == 304 and (etag or last_modified):
+        # Read the (empty) body so a pooled connection is reused.
+        response.read()
+        response.close()
+        return None
+
+    return response
+
+class CountingReader(io.RawIOBase):
+    """
+    Wraps a binary stream and adds the size of every chunk read through it to
+    a `Progress`, along with the bytes received on the wire for compressed
+    responses.
+    """
+    def __init__(self, stream: BinaryIO, progress: 'Progress'):
+        self.stream = stream
+        self.progress = progress
+        self.status = getattr(stream, 'status', None)
+        self.headers = getattr(stream, 'headers', None)
+        self._compressed = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self.stream.readinto(b)
+        if not n:
+            return n
+
+        if isinstance(self.stream, DecodingReader):
+            wire_bytes = self.stream.compressed - self._compressed
+            self._compressed = self.stream.compressed
+            self.progress.add_bytes(n, wire_bytes)
+        else:
+            self.progress.add_bytes(n)
+        return n
+
+    def readall(self) -> bytes:
+        chunks = []
+        while chunk := self.read(READ_CHUNK_SIZE):
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+class HashingReader(io.RawIOBase):
+    """
+    Wraps a binary stream and updates one hash object per method with every
+    chunk read through it, so a download is hashed as it arrives instead of
+    being read back afterwards.
+    """
+    def __init__(self, stream: BinaryIO, methods: Iterable[str]):
+        self.stream = stream
+        self.hasher = MultiHasher(methods)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self.stream.readinto(b)
+        if n:
+            with memoryview(b) as view:
+                self.hasher.update(view[:n])
+        return n
+
+    def readall(self) -> bytes:
+        chunks = []
+        while chunk := self.read(READ_CHUNK_SIZE):
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def drain(self, chunk_size: int = READ_CHUNK_SIZE):
+        """
+        Reads the rest of the stream, so that the hashes cover all of it.
+        """
+        while self.read(chunk_size):
+            pass
+
+    def results(self, filename: None|str = None) -> dict[str, Hash]:
+        return self.hasher.results(filename=filename)
+
+def expected_checksum(expected: 'None|str|Hash|Product') -> None|Hash:
+    """
+    Returns the `Hash` of an expected checksum given as a `Hash`, a `Product`
+    or a string in either format.
+    """
+    from argendata_datasets.utils import Product
+
+    if expected is None or isinstance(expected, Hash):
+        return expected
+
+    if isinstance(expected, str):
+        expected = Product.from_str(expected)
+
+    if isinstance(expected, Product):
+        return expected.checksum
+
+    T = type(expected)
+    raise TypeError(f"Expected checksum must be a Hash, Product or str, got '{T.__name__}'.")
+
+def hash_methods(hashes: str|Iterable[str], expected: None|Hash) -> list[str]:
+    """
+    Returns the methods to compute while downloading. Only `hashlib`
+    algorithms can be computed on the stream; tree, Merkle and frame hashes
+    must be computed on the downloaded file or frame with `checksum`.
+    """
+    import hashlib
+
+    methods = [hashes] if isinstance(hashes, str) else list(hashes)
+    if expected is not None:
+        methods.append(expected.method)
+
+    for method in methods:
+        if method not in hashlib.algorithms_available:
+            raise ValueError(
+                f"'{method}' cannot be computed while downloading, only hashlib "
+                f"algorithms can; compute it on the result with `checksum` instead."
+            )
+    return list(dict.fromkeys(methods))
+
+def check_checksum(results: dict[str, Hash], expected: None|Hash):
+    if expected is None:
+        return
+
+    actual = results[expected.method]
+    if not actual.equals(expected, filename_eq=False):
+        raise ChecksumMismatch(expected=expected, actual=actual)
@@ -1,2 +1,3 @@
 from .analyzer import *
-from .dataset_registrations import *
\ No newline at end of file
+from .dataset_registrations import *
+from .analysis import *
\ No newline at end of file
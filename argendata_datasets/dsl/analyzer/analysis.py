@@ -0,0 +1,142 @@
+"""
+Single-pass analysis of a script's dataset usage.
+
+`analyze` visits the tree once and collects what `get_datasets` and
+`get_dataset_registrations` find in separate walks:
+
+- the `Datasets.X.method(version=...)` requests;
+- the `symbol = Datasets.RnCm.register(filename=...)` registrations at the
+  top level of the script;
+- the calls on a registered symbol (`symbol.save(...)`), in source order.
+
+Symbols are looked up in a dict, so the cost is linear in the size of the
+script regardless of how many datasets it registers.
+
+Usage:
+
+>>> analysis = analyze(pathlib.Path('script.py').read_text())
+>>> analysis.requests
+{Request(name='R1C0', method='get', version='latest')}
+>>> [symbol['registration'].name for symbol in analysis.symbols()]
+['R1C1']
+"""
+
+from dataclasses import dataclass, field
+from .analyzer import Request
+from .dataset_registrations import Constant, Name, DatasetRegister, DatasetSave, Symbol
+import ast
+import re
+
+DATASET_NAME = re.compile(r"^R\d+C\d+$")
+
+@dataclass(frozen=True)
+class Analysis:
+    requests: frozenset[Request] = frozenset()
+    registrations: dict[str, DatasetRegister] = field(default_factory=dict)
+    saves: tuple[DatasetSave, ...] = ()
+
+    @property
+    def produces(self) -> set[str]:
+        """
+        Names of the datasets the script registers.
+        """
+        return {registration.name for registration in self.registrations.values()}
+
+    @property
+    def consumes(self) -> set[str]:
+        """
+        Names of the datasets the script requests.
+        """
+        return {request.name for request in self.requests}
+
+    def symbols(self) -> list[Symbol]:
+        """
+        Pairs every save with its registration, like `get_dataset_registrations`.
+        """
+        return [
+            {
+                "symbol": save.symbol,
+                "save": save,
+                "registration": self.registrations[save.symbol],
+            }
+            for save in self.saves
+        ]
+
+def dataset_call(node: ast.Call) -> None|tuple[str, str]:
+    """
+    Returns `(name, method)` for `Datasets.NAME.method(...)` calls.
+    """
+    func = node.func
+    if not isinstance(func, ast.Attribute) or not isinstance(func.value, ast.Attribute):
+        return None
+    if not isinstance(func.value.value, ast.Name) or func.value.value.id != 'Datasets':
+        return None
+    return func.value.attr, func.attr
+
+def keyword(node: ast.Call, name: str) -> None|ast.expr:
+    return next((kw.value for kw in node.keywords if kw.arg == name), None)
+
+class Analyzer(ast.NodeVisitor):
+    def __init__(self):
+        self.requests: set[Request] = set()
+        self.registrations: dict[str, DatasetRegister] = {}
+        # Calls on any plain name; those on a registered symbol are the saves.
+        self.calls: list[tuple[str, ast.Call]] = []
+
+    def visit_Module(self, node: ast.Module):
+        for stmt_index, statement in enumerate(node.body):
+            if isinstance(statement, ast.Assign):
+                self.register(statement, stmt_index)
+            self.visit(statement)
+
+    def register(self, assignment: ast.Assign, stmt_index: int):
+        target, value = assignment.targets[0], assignment.value
+        if not isinstance(target, ast.Name) or not isinstance(value, ast.Call):
+            return
+
+        call = dataset_call(value)
+        if call is None or call[1] != 'register' or not DATASET_NAME.match(call[0]):
+            return
+
+        filename = keyword(value, 'filename')
+        if isinstance(filename, ast.Constant):
+            filename = Constant(value=filename.value)
+        elif isinstance(filename, ast.Name):
+            filename = Name(id=filename.id)
+        else:
+            return
+
+        self.registrations[target.id] = DatasetRegister(
+            symbol=target.id, name=call[0], filename=filename, stmt_index=stmt_index,
+        )
+
+    def visit_Call(self, node: ast.Call):
+        call = dataset_call(node)
+        if call is not None and call[1] != 'register':
+            version = keyword(node, 'version')
+            version = version.value if isinstance(version, ast.Constant) else None
+            self.requests.add(Request(name=call[0], method=call[1], version=version))
+        elif isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name):
+            self.calls.append((node.func.value.id, node))
+
+        self.generic_visit(node)
+
+    def result(self) -> Analysis:
+        return Analysis(
+            requests=frozenset(self.requests),
+            registrations=self.registrations,
+            saves=tuple(
+                DatasetSave(symbol=symbol, node=node)
+                for symbol, node in self.calls
+                if symbol in self.registrations
+            ),
+        )
+
+def analyze(source: str|ast.Module) -> Analysis:
+    """
+    Analyzes a script, given as source text or as an already parsed tree.
+    """
+    tree = ast.parse(source.strip()) if isinstance(source, str) else source
+    analyzer = Analyzer()
+    analyzer.visit(tree)
+    return analyzer.result()
@@ -0,0 +1,418 @@
+"""
+Batch analysis of a directory of ETL scripts.
+
+`analyze_dir` runs `analyzer.analyze` on every script under a directory, on a
+process pool so that parsing scales with the available cores. With an
+`AnalysisCache`, results are stored by the content `Hash` of each script and
+only scripts whose contents changed are parsed again; a `DigestCache` also
+skips reading scripts whose stat data is unchanged.
+
+Results are plain `ScriptAnalysis` records, and `manifest` turns them into a
+JSON document with the datasets each script uses and produces, and the
+consumers and producers of each dataset.
+
+Usage:
+
+>>> from argendata_datasets.dsl.batch import analyze_dir, write_manifest, AnalysisCache
+>>> with AnalysisCache() as cache:
+...     scripts = analyze_dir('etl/', cache=cache)
+>>> write_manifest(scripts, 'datasets.json')
+
+Or from the command line:
+
+    python -m argendata_datasets.dsl.batch etl/ -o datasets.json
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Iterable
+from argendata_datasets.checksum import Hash, digest_many
+from argendata_datasets.checksum import hash as hashing
+from .analyzer import Request, DatasetRegister, Constant, Name, analyze
+import ast
+import json
+import multiprocessing
+import os
+import pathlib
+import sqlite3
+import time
+
+if TYPE_CHECKING:
+    from argendata_datasets.checksum import DigestCache
+
+PathLike = str | pathlib.Path
+
+# Part of the cache key; bump it when the summary of a script changes, so
+# that results of older versions are not reused.
+ANALYSIS_VERSION = 1
+MANIFEST_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    key TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS analyses_last_used ON analyses (last_used);
+"""
+
+def default_path() -> pathlib.Path:
+    base = os.environ.get('XDG_CACHE_HOME') or pathlib.Path.home() / '.cache'
+    return pathlib.Path(base) / 'argendata_datasets' / 'analysis.sqlite3'
+
+@dataclass
+class ScriptAnalysis:
+    """
+    What a script requests, registers and saves, without the syntax tree.
+    `error` is set, and everything else empty, if the script cannot be read
+    or parsed; the checksum of an unreadable script has an empty hexdigest.
+    """
+    path: str
+    checksum: Hash
+    requests: list[Request] = field(default_factory=list)
+    registrations: list[DatasetRegister] = field(default_factory=list)
+    saves: list[str] = field(default_factory=list)
+    error: None|str = None
+
+    @property
+    def consumes(self) -> set[str]:
+        return {request.name for request in self.requests}
+
+    @property
+    def produces(self) -> set[str]:
+        return {registration.name for registration in self.registrations}
+
+def _error_summary(e: Exception) -> dict[str, Any]:
+    return {'requests': [], 'registrations': [], 'saves': [], 'error': f'{type(e).__name__}: {e}'}
+
+def summarize(source: bytes) -> dict[str, Any]:
+    """
+    Analyzes the source of a script into a JSON-serializable summary.
+    """
+    try:
+        analysis = analyze(ast.parse(source))
+    except (SyntaxError, ValueError) as e:
+        return _error_summary(e)
+
+    return {
+        'requests': sorted(
+            ({'name': r.name, 'method': r.method, 'version': r.version} for r in analysis.requests),
+            key=lambda r: (r['name'], r['method'], str(r['version'])),
+        ),
+        'registrations': [
+            {
+                'symbol': r.symbol,
+                'name': r.name,
+                'filename': {'constant': r.filename.value} if isinstance(r.filename, Constant) else {'name': r.filename.id},
+                'stmt_index': r.stmt_index,
+            }
+            for r in analysis.registrations.values()
+        ],
+        'saves': [save.symbol for save in analysis.saves],
+        'error': None,
+    }
+
+def _analyze_file(path: str, method: str) -> tuple[str, dict[str, Any]]:
+    # Runs in the pool. The summary is keyed by the hash of the bytes it was
+    # computed from, in case the file changed since it was hashed. A file
+    # removed since then has an empty hexdigest, and its summary is not cached.
+    try:
+        source = pathlib.Path(path).read_bytes()
+    except OSError as e:
+        return '', _error_summary(e)
+    return getattr(hashing, method)(source).hexdigest, summarize(source)
+
+def from_summary(path: str, checksum: Hash, summary: dict[str, Any]) -> ScriptAnalysis:
+    return ScriptAnalysis(
+        path=path,
+        checksum=checksum,
+        requests=[Request(**r) for r in summary['requests']],
+        registrations=[
+            DatasetRegister(
+                symbol=r['symbol'],
+                name=r['name'],
+                filename=Constant(value=r['filename']['constant']) if 'constant' in r['filename'] else Name(id=r['filename']['name']),
+                stmt_index=r['stmt_index'],
+            )
+            for r in summary['registrations']
+        ],
+        saves=summary['saves'],
+        error=summary['error'],
+    )
+
+class AnalysisCache:
+    """
+    Script summaries keyed by the content hash of the script, in a SQLite
+    database. Entries are shared between directories and checkouts, since
+    identical scripts have identical summaries.
+
+    Args:
+        - path: Location of the database, defaults to
+          `$XDG_CACHE_HOME/argendata_datasets/analysis.sqlite3`.
+        - max_entries: Maximum number of summaries kept by `evict`, the least
+          recently used are removed first.
+        - timeout: Seconds to wait for a lock held by another process.
+    """
+    hits: int
+    misses: int
+
+    def __init__(self, path: None|PathLike = None, max_entries: int = 100_000, timeout: float = 30.0):
+        self.path = default_path() if path is None else pathlib.Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=timeout)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    @staticmethod
+    def key(checksum: Hash) -> str:
+        return f'{ANALYSIS_VERSION}:{checksum.to_str(include_filename=False)}'
+
+    def get_many(self, checksums: Iterable[Hash]) -> dict[str, dict[str, Any]]:
+        """
+        Returns the cached summaries of `checksums`, keyed by `key(checksum)`.
+        """
+        keys = list(dict.fromkeys(map(self.key, checksums)))
+        found = {}
+        # Below SQLite's default limit of host parameters per statement.
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            rows = self.connection.execute(
+                f'SELECT key, summary FROM analyses WHERE key IN ({", ".join("?" * len(batch))})',
+                batch,
+            )
+            found.update((key, json.loads(summary)) for key, summary in rows)
+
+        with self.connection:
+            self.connection.executemany(
+                'UPDATE analyses SET last_used = ? WHERE key = ?',
+                ((time.time(), key) for key in found),
+            )
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries: Iterable[tuple[Hash, dict[str, Any]]]):
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO analyses (key, summary, last_used) VALUES (?, ?, ?)',
+                ((self.key(checksum), json.dumps(summary), now) for checksum, summary in entries),
+            )
+
+    def evict(self) -> int:
+        """
+        Removes the least recently used entries above `max_entries`. Returns
+        the number of entries removed.
+        """
+        with self.connection:
+            excess = len(self) - self.max_entries
+            if excess <= 0:
+                return 0
+            self.connection.execute(
+                'DELETE FROM analyses WHERE key IN (SELECT key FROM analyses ORDER BY last_used LIMIT ?)',
+                (excess,),
+            )
+        return excess
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM analyses').fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+def analyze_files(
+    paths: Iterable[PathLike],
+    root: None|PathLike = None,
+    workers: None|int = None,
+    cache: None|AnalysisCache = None,
+    digest_cache: 'None|DigestCache' = None,
+    method: str = 'sha1',
+) -> list[ScriptAnalysis]:
+    """
+    Analyzes the scripts at `paths` and returns their analyses sorted by
+    path. Paths are reported relative to `root`, if given. Scripts that
+    cannot be read, e.g. because they were removed, get an analysis with
+    `error` set instead of failing the whole batch.
+
+    Args:
+        - workers: Size of the process pool, defaults to the number of CPUs.
+          Scripts are parsed in this process if there are few to parse.
+        - cache: An `AnalysisCache` summaries are read from and stored in.
+        - digest_cache: A `DigestCache` for the script hashes.
+        - method: Hash method the scripts are keyed by.
+    """
+    paths = [pathlib.Path(path) for path in paths]
+    summaries = {}
+
+    def unreadable(path: PathLike, e: Exception):
+        summaries[pathlib.Path(path)] = _error_summary(e)
+
+    checksums = {
+        pathlib.Path(h.filename): h
+        for h in digest_many(paths, method, cache=digest_cache, on_error=unreadable)
+    }
+
+    if cache is not None:
+        cached = cache.get_many(checksums.values())
+        for path, checksum in checksums.items():
+            if cache.key(checksum) in cached:
+                summaries[path] = cached[cache.key(checksum)]
+
+    for path in paths:
+        if path not in checksums:
+            checksums[path] = Hash(method=method, hexdigest='', filename=str(path))
+
+    missing = [path for path in paths if path not in summaries]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(missing) < 2 * workers:
+        results = [_analyze_file(str(path), method) for path in missing]
+    else:
+        # Not forked: hashing already started threads in this process.
+        context = multiprocessing.get_context('forkserver')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            chunksize = max(1, len(missing) // (4 * workers))
+            results = list(executor.map(_analyze_file, map(str, missing), [method] * len(missing), chunksize=chunksize))
+
+    for path, (hexdigest, summary) in zip(missing, results):
+        checksums[path] = Hash(method=method, hexdigest=hexdigest, filename=str(path))
+        summaries[path] = summary
+
+    read = [path for path in missing if checksums[path].hexdigest]
+    if cache is not None and read:
+        cache.put_many((checksums[path], summaries[path]) for path in read)
+        cache.evict()
+
+    analyses = []
+    for path in paths:
+        name = path.as_posix() if root is None else path.relative_to(root).as_posix()
+        checksum = Hash(method=method, hexdigest=checksums[path].hexdigest, filename=name)
+        analyses.append(from_summary(name, checksum, summaries[path]))
+
+    return sorted(analyses, key=lambda analysis: analysis.path)
+
+def analyze_dir(
+    root: PathLike,
+    pattern: str = '**/*.py',
+    workers: None|int = None,
+    cache: None|AnalysisCache = None,
+    digest_cache: 'None|DigestCache' = None,
+    method: str = 'sha1',
+) -> list[ScriptAnalysis]:
+    """
+    Analyzes every script under `root` matching the glob `pattern`, with
+    paths relative to `root`. See `analyze_files` for the arguments.
+    """
+    root = pathlib.Path(root)
+    paths = [path for path in root.glob(pattern) if path.is_file()]
+    return analyze_files(paths, root, workers, cache, digest_cache, method)
+
+def manifest(analyses: Iterable[ScriptAnalysis]) -> dict[str, Any]:
+    """
+    Returns the datasets used and produced by every script, and the scripts
+    using and producing every dataset, as a JSON-serializable dict:
+
+    ```
+    {
+        "version": 1,
+        "scripts": {
+            "a.py": {
+                "checksum": "sha1:...",
+                "uses": [{"name": "R1C0", "method": "get", "version": "latest"}],
+                "produces": [{"name": "R2C0", "symbol": "df", "filename": "out.csv"}],
+                "error": null
+            }
+        },
+        "datasets": {
+            "R1C0": {"consumers": ["a.py"], "producers": []},
+            "R2C0": {"consumers": [], "producers": ["a.py"]}
+        }
+    }
+    ```
+
+    Filenames given as a variable are reported as `{"name": "VARIABLE"}`.
+    """
+    scripts, datasets = {}, {}
+
+    def dataset(name: str) -> dict[str, list[str]]:
+        return datasets.setdefault(name, {'consumers': [], 'producers': []})
+
+    for analysis in sorted(analyses, key=lambda analysis: analysis.path):
+        scripts[analysis.path] = {
+            'checksum': analysis.checksum.to_str(include_filename=False),
+            'uses': [
+                {'name': r.name, 'method': r.method, 'version': r.version}
+                for r in sorted(analysis.requests, key=lambda r: (r.name, r.method, str(r.version)))
+            ],
+            'produces': [
+                {
+                    'name': r.name,
+                    'symbol': r.symbol,
+                    'filename': r.filename.value if isinstance(r.filename, Constant) else {'name': r.filename.id},
+                }
+                for r in analysis.registrations
+            ],
+            'error': analysis.error,
+        }
+        for name in sorted(analysis.consumes):
+            dataset(name)['consumers'].append(analysis.path)
+        for name in sorted(analysis.produces):
+            dataset(name)['producers'].append(analysis.path)
+
+    return {
+        'version': MANIFEST_VERSION,
+        'scripts': scripts,
+        'datasets': dict(sorted(datasets.items())),
+    }
+
+def write_manifest(analyses: Iterable[ScriptAnalysis], to: PathLike) -> pathlib.Path:
+    """
+    Writes `manifest(analyses)` to `to` as JSON.
+    """
+    to = pathlib.Path(to)
+    to.write_text(json.dumps(manifest(analyses), indent=2) + '\n')
+    return to
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('root', help="Directory with the scripts.")
+    parser.add_argument('--pattern', default='**/*.py')
+    parser.add_argument('-o', '--output', help="Where to write the manifest. Defaults to stdout.")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache', default=None, help="Path of the analysis cache.")
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else AnalysisCache(args.cache)
+    try:
+        analyses = analyze_dir(args.root, args.pattern, args.workers, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    if args.output is None:
+        json.dump(manifest(analyses), sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        write_manifest(analyses, args.output)
+
+    errors = [analysis for analysis in analyses if analysis.error is not None]
+    for analysis in errors:
+        print(f"{analysis.path}: {analysis.error}", file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
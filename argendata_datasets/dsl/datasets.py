@@ -1,6 +1,14 @@
-from typing import TYPE_CHECKING, Callable
+from typing import TYPE_CHECKING, Callable, Iterator
 from .singleton import Singleton
+import contextlib
+import contextvars
 import pathlib
+import runpy
+import threading
+import time
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
 
 class Dataset: ...
 
@@ -22,9 +30,12 @@ class DatasetProxy:
         by: None|DatasetGetter = None
     ) -> str:
         uri = f'{self.name}' + ('' if not version else f'@{version}')
-        Client().uses(uri)
+        self.client.uses(uri)
 
         if by:
+            future = self.client._take_prefetched(by, uri)
+            if future is not None and future.exception() is None:
+                return future.result()
             return by(uri=uri)
 
         return uri
@@ -36,7 +47,7 @@ class DatasetProxy:
         by: None|DatasetDownloader = None,
     ) -> pathlib.Path:
         uri = f'{self.name}' + ('' if not version else f'@{version}')
-        Client().uses(uri)
+        self.client.uses(uri)
 
         to = pathlib.Path(to) if isinstance(to, str) else to
 
@@ -53,7 +64,7 @@ class DatasetProxy:
             **extra
         })
 
-        self.client._produced.append({
+        self.client.produces({
             "name": self.name,
             "filename": filename,
             **extra
@@ -62,8 +73,8 @@ class DatasetProxy:
         print(f"Registered dataset {self.name} with filename {filename} and metadata {extra}")
         return self
     
-    def _get_registrations_metadata_stack(self) -> dict:
-        return self.client._produced
+    def _get_registrations_metadata_stack(self) -> list[dict]:
+        return self.client.produced
 
     def save(self, /, obj, func=None, **kwargs):
         if func is None:
@@ -85,26 +96,134 @@ class MetadataClient(metaclass=Singleton):
         return MetadataClient()
 
 
+class ClientSession:
+    """
+    The datasets used and produced by one script. See `Client.session`.
+    """
+    def __init__(self):
+        self._used = set()
+        self._produced = list()
+        self._lock = threading.Lock()
+
+    @property
+    def used(self) -> frozenset[str]:
+        with self._lock:
+            return frozenset(self._used)
+
+    @property
+    def produced(self) -> list[dict]:
+        # The live list, as before sessions: callers may clear it.
+        with self._lock:
+            return self._produced
+
+    def uses(self, uri: str):
+        with self._lock:
+            self._used.add(uri)
+
+    def produces(self, registration: dict):
+        with self._lock:
+            self._produced.append(registration)
+
+_session: contextvars.ContextVar[None|ClientSession] = contextvars.ContextVar('session', default=None)
+
 class Client(metaclass=Singleton):
-    _used: set[str]
-    _produced: list[dict]
+    """
+    Records the datasets used and produced by the running script.
+
+    Records go to the session of the current context if there is one (see
+    `session`), so scripts run concurrently in threads or asyncio tasks of
+    the same process are recorded separately. Outside of any session they
+    go to a process-wide default session.
+    """
+    # Prefetched results by getter and URI, with the time they expire at.
+    _prefetched: dict[tuple[DatasetGetter, str], tuple[float, 'Future']]
     metadata: MetadataClient
 
     def __init__(self):
-        self._used = set()
-        self._produced = list()
+        self._default = ClientSession()
+        self._prefetched = dict()
+        self._prefetched_lock = threading.Lock()
         self.metadata = MetadataClient()
 
+    @property
+    def current(self) -> ClientSession:
+        session = _session.get()
+        return self._default if session is None else session
+
+    @contextlib.contextmanager
+    def session(self) -> Iterator[ClientSession]:
+        """
+        Records the datasets used and produced in the current thread or
+        asyncio task, until the block exits, in a new `ClientSession`.
+        Tasks created inside the block inherit the session.
+
+        >>> with Datasets.session() as session:
+        ...     runpy.run_path('etl/script.py')
+        >>> session.used, session.produced
+        """
+        session = ClientSession()
+        token = _session.set(session)
+        try:
+            yield session
+        finally:
+            _session.reset(token)
+
+    def run(self, path: str|pathlib.Path, **init_globals) -> ClientSession:
+        """
+        Runs the script at `path` in this process, in its own session, and
+        returns the session. Safe to call from several threads at once.
+        """
+        with self.session() as session:
+            runpy.run_path(str(path), init_globals=init_globals, run_name='__main__')
+        return session
+
     @property
     def used(self) -> frozenset[str]:
-        return frozenset(self._used)
+        return self.current.used
 
     @property
     def produced(self) -> list[dict]:
-        return self._produced
+        return self.current.produced
 
     def uses(self, uri: str):
-        self._used.add(uri)
+        self.current.uses(uri)
+
+    def produces(self, registration: dict):
+        self.current.produces(registration)
+
+    def prefetched(self, by: DatasetGetter, futures: dict[str, 'Future'], ttl: None|float = None):
+        """
+        Keeps the results of `by` for the given URIs (see `dsl.prefetch`)
+        until they are taken by the first `get` with the same `by`, for at
+        most `ttl` seconds if given, or until `clear_prefetched`.
+        """
+        expires = float('inf') if ttl is None else time.monotonic() + ttl
+        with self._prefetched_lock:
+            self._expire_prefetched()
+            for uri, future in futures.items():
+                self._prefetched[(by, uri)] = (expires, future)
+
+    def clear_prefetched(self, by: None|DatasetGetter = None) -> int:
+        """
+        Drops the prefetched results of `by`, or of every getter, that were
+        not taken. Returns the number dropped.
+        """
+        with self._prefetched_lock:
+            keys = [key for key in self._prefetched if by is None or key[0] == by]
+            for key in keys:
+                del self._prefetched[key]
+        return len(keys)
+
+    def _expire_prefetched(self):
+        now = time.monotonic()
+        for key in [key for key, (expires, _) in self._prefetched.items() if expires <= now]:
+            del self._prefetched[key]
+
+    def _take_prefetched(self, by: DatasetGetter, uri: str) -> 'None|Future':
+        with self._prefetched_lock:
+            self._expire_prefetched()
+            _, future = self._prefetched.pop((by, uri), (None, None))
+            return future
 
     def __getattr__(self, name: str): 
         return DatasetProxy(name, self)
@@ -165,13 +284,24 @@ if TYPE_CHECKING:
             """
             ...
     class Client(type):
-        used: set[str]
-        metadata: MetadataClient
+        used: frozenset[str]
+        """
+        The unique datasets used in the current session.
         """
-        The list of unique datasets that have been used.
+        produced: list[dict]
         """
+        The registrations made in the current session.
+        """
+        current: ClientSession
+        """
+        The session of the current context, or the process-wide default.
+        """
+        metadata: MetadataClient
 
         def __init__(self): ...
+        def session(self) -> contextlib.AbstractContextManager[ClientSession]: ...
+        def run(self, path: str|pathlib.Path, **init_globals) -> ClientSession: ...
+        def clear_prefetched(self, by: None|DatasetGetter = None) -> int: ...
         def __getattr__(self, name: str) -> type[DatasetProxy]: ...
 
     class MetadataClient(type):
@@ -0,0 +1,98 @@
+"""
+Prefetching of the datasets used by scripts, before they run.
+
+The analyzer lists every `Datasets.X.get(version=...)` call of a script
+without running it. `prefetch` does that for a batch of scripts,
+dedupes the resulting URIs and calls the getter for all of them
+concurrently, so that:
+
+- the storage behind the getter (e.g. a `DownloadCache`) is warm when the
+  scripts start, even in other processes;
+- in this process, the first `Datasets.X.get(version=..., by=getter)` of
+  each URI returns the prefetched result instead of fetching it again.
+
+Usage:
+
+>>> from argendata_datasets.dsl.prefetch import prefetch
+>>> results = prefetch(['scripts/a.py', 'scripts/b.py'], by=fetch_dataset, workers=16)
+>>> failed = {uri: error for uri, error in results.items() if isinstance(error, Exception)}
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Iterable
+from .analyzer import Request, get_datasets
+from .datasets import Client, DatasetGetter, Datasets
+import pathlib
+
+PathLike = str | pathlib.Path
+
+DEFAULT_WORKERS = 8
+DEFAULT_TTL = 15 * 60
+# Only `get` takes prefetched results: `download` calls its downloader with
+# a destination the getter knows nothing about.
+PREFETCHED_METHODS = ('get',)
+
+def uri(request: Request) -> str:
+    """
+    The URI a request resolves to, as built by `DatasetProxy`.
+    """
+    return f'{request.name}' + ('' if not request.version else f'@{request.version}')
+
+def collect_requests(sources: Iterable[str]) -> set[Request]:
+    """
+    Returns the `get` requests of every script source, deduped.
+    """
+    return {
+        request
+        for source in sources
+        for request in get_datasets(source)
+        if request.method in PREFETCHED_METHODS
+    }
+
+def collect_uris(scripts: Iterable[PathLike]) -> list[str]:
+    """
+    Returns the sorted, unique URIs requested by the scripts at `scripts`.
+    """
+    requests = collect_requests(pathlib.Path(script).read_text() for script in scripts)
+    return sorted({uri(request) for request in requests})
+
+def prefetch(
+    scripts: Iterable[PathLike],
+    by: DatasetGetter,
+    workers: int = DEFAULT_WORKERS,
+    wait: bool = True,
+    client: None|Client = None,
+    ttl: None|float = DEFAULT_TTL,
+) -> dict[str, Any|BaseException]|dict[str, Future]:
+    """
+    Calls `by(uri=...)` once for every dataset URI used by `scripts`, on a
+    pool of `workers` threads.
+
+    Args:
+        - by: The getter the scripts pass to `Datasets.X.get`.
+        - wait: Block until every fetch is done and return
+          `{uri: result}`, with the exception in place of the result for
+          URIs that failed. Otherwise return `{uri: Future}` right away and
+          keep fetching in the background.
+        - client: Where the results are kept for the first `get` of each URI
+          with the same `by`, `Datasets` by default. A `get` whose fetch is
+          still running waits for it; one whose fetch failed fetches again.
+        - ttl: Seconds the results are kept for if no `get` takes them,
+          `DEFAULT_TTL` by default. With `None` they are kept until taken,
+          so the caller must drop the rest with `client.clear_prefetched(by)`.
+    """
+    client = Datasets if client is None else client
+    uris = collect_uris(scripts)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {u: executor.submit(by, uri=u) for u in uris}
+    client.prefetched(by, futures, ttl)
+    executor.shutdown(wait=wait)
+
+    if not wait:
+        return futures
+
+    return {
+        u: future.exception() if future.exception() is not None else future.result()
+        for u, future in futures.items()
+    }
@@ -0,0 +1,337 @@
+"""
+Runs a corpus of ETL scripts in dependency order, in parallel and
+incrementally.
+
+A script depends on the scripts that register the datasets it gets or
+downloads, as found by `batch.analyze_dir`. `run` executes every script in a
+separate Python process, at most `workers` at a time, starting each one as
+soon as the scripts it depends on have finished, so the total time is
+bounded by the critical path of the graph rather than by the number of
+scripts.
+
+After a successful run the checksum of the script, the fingerprints of its
+inputs and the checksums of the files it registered are stored in a JSON
+state file. The next `run` skips every script whose source, inputs and
+outputs are unchanged, so only the changed scripts and those downstream of
+them run again.
+
+The fingerprint of a dataset produced in the corpus is the `Product` of its
+registered file (e.g. `R2C0(out.csv@sha1:...)`). If the filename is not a
+constant, or the file does not exist, it is derived from the fingerprint of
+the run that produced it. Datasets produced elsewhere are identified by
+their URI, or by what `resolve(uri)` returns, e.g. a checksum from the
+static index.
+
+Usage:
+
+>>> from argendata_datasets.dsl.scheduler import run
+>>> results = run('etl/', workers=8)
+>>> [result.path for result in results if result.status == 'failed']
+
+Or from the command line:
+
+    python -m argendata_datasets.dsl.scheduler etl/ --workers 8
+"""
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Iterable, Literal
+from argendata_datasets.checksum import Hash, digest
+from argendata_datasets.checksum import hash as hashing
+from argendata_datasets.utils import Product
+from .analyzer import Constant
+from .batch import ScriptAnalysis, analyze_dir
+import graphlib
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+if TYPE_CHECKING:
+    from argendata_datasets.checksum import DigestCache
+    from .batch import AnalysisCache
+
+PathLike = str | pathlib.Path
+
+STATE_VERSION = 1
+DEFAULT_STATE = '.argendata-schedule.json'
+
+Status = Literal['ran', 'skipped', 'failed', 'blocked']
+
+@dataclass
+class RunResult:
+    """
+    The outcome of a script: it `ran` successfully, was `skipped` because it
+    was up to date, `failed`, or was `blocked` by a failed dependency.
+    """
+    path: str
+    status: Status
+    returncode: None|int = None
+    elapsed: float = 0.0
+    stdout: str = ''
+    stderr: str = ''
+
+def dependencies(
+    analyses: Iterable[ScriptAnalysis],
+    carried: None|dict[str, set[str]] = None,
+) -> dict[str, set[str]]:
+    """
+    Returns the scripts every script depends on: those that register a
+    dataset it uses. Scripts that do not parse use nothing, and produce the
+    datasets given for them in `carried`, if any.
+    """
+    analyses = list(analyses)
+    producers = producer_index(analyses, carried)
+
+    return {
+        analysis.path: {
+            producer
+            for name in analysis.consumes
+            for producer in producers.get(name, ())
+            if producer != analysis.path
+        }
+        for analysis in analyses
+    }
+
+def producer_index(
+    analyses: Iterable[ScriptAnalysis],
+    carried: None|dict[str, set[str]] = None,
+) -> dict[str, set[str]]:
+    """
+    Returns the scripts that register every dataset, with the datasets in
+    `carried` added for scripts that do not parse.
+    """
+    carried = carried or {}
+    producers: dict[str, set[str]] = {}
+    for analysis in analyses:
+        names = analysis.produces
+        if analysis.error is not None:
+            names = names | carried.get(analysis.path, set())
+        for name in names:
+            producers.setdefault(name, set()).add(analysis.path)
+    return producers
+
+def read_state(path: pathlib.Path) -> dict[str, dict]:
+    if not path.exists():
+        return {}
+    state = json.loads(path.read_text())
+    return state['scripts'] if state.get('version') == STATE_VERSION else {}
+
+def write_state(path: pathlib.Path, scripts: dict[str, dict]):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'version': STATE_VERSION, 'scripts': scripts}, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def product_str(product: Product) -> str:
+    return f'{product.codigo}({product.checksum})'
+
+def run(
+    root: PathLike,
+    pattern: str = '**/*.py',
+    workers: None|int = None,
+    state: None|PathLike = None,
+    cwd: None|PathLike = None,
+    python: str = sys.executable,
+    timeout: None|float = None,
+    resolve: None|Callable[[str], None|str|Hash|Product] = None,
+    force: bool = False,
+    cache: 'None|AnalysisCache' = None,
+    digest_cache: 'None|DigestCache' = None,
+    callback: None|Callable[[RunResult], object] = None,
+) -> list[RunResult]:
+    """
+    Runs the scripts under `root` that are out of date, in dependency order.
+    Returns a `RunResult` per script, in the order they finished.
+
+    Args:
+        - workers: Maximum number of scripts running at once, defaults to the
+          number of CPUs.
+        - state: Where fingerprints of successful runs are kept, defaults to
+          `.argendata-schedule.json` under `root`.
+        - cwd: Working directory of the scripts, against which registered
+          filenames are resolved. Defaults to `root`.
+        - python: Interpreter the scripts are run with.
+        - timeout: Seconds after which a script is killed and failed.
+        - resolve: Returns the fingerprint of a dataset URI not produced by
+          any script, or None to use the URI itself.
+        - force: Run every script, even if it is up to date.
+        - cache, digest_cache: Passed to `batch.analyze_dir`, and the latter
+          also used to hash registered files.
+        - callback: Called with every `RunResult` as soon as it is known.
+
+    Raises `graphlib.CycleError` if scripts depend on each other in a cycle.
+    """
+    root = pathlib.Path(root)
+    cwd = root if cwd is None else pathlib.Path(cwd)
+    state_path = root / DEFAULT_STATE if state is None else pathlib.Path(state)
+    workers = workers or os.cpu_count() or 1
+
+    analyses = {analysis.path: analysis for analysis in analyze_dir(root, pattern, cache=cache, digest_cache=digest_cache)}
+    previous = read_state(state_path)
+
+    # A script that stops parsing still produces what it did on its last
+    # successful run, so the scripts using it are blocked instead of run
+    # without it.
+    carried = {
+        path: set(previous[path].get('outputs', {}))
+        for path, analysis in analyses.items()
+        if analysis.error is not None and path in previous
+    }
+    graph = dependencies(analyses.values(), carried)
+    producers = producer_index(analyses.values(), carried)
+
+    current = {path: entry for path, entry in previous.items() if path in analyses}
+    # Fingerprints of the datasets produced by scripts that ran or were skipped.
+    outputs: dict[str, dict[str, str]] = {}
+
+    def inputs(analysis: ScriptAnalysis) -> dict[str, list[str]]:
+        fingerprints = {}
+        for request in analysis.requests:
+            uri = str(request) if request.version else request.name
+            if request.name in producers:
+                values = [
+                    outputs[producer][request.name]
+                    for producer in sorted(producers[request.name])
+                    if producer != analysis.path and request.name in outputs.get(producer, {})
+                ]
+            else:
+                resolved = None if resolve is None else resolve(uri)
+                if isinstance(resolved, Product):
+                    resolved = product_str(resolved)
+                values = [uri if resolved is None else str(resolved)]
+            fingerprints.setdefault(request.name, []).extend(values)
+        return {name: sorted(set(values)) for name, values in sorted(fingerprints.items())}
+
+    def fingerprint(analysis: ScriptAnalysis, inputs: dict[str, list[str]]) -> str:
+        key = json.dumps([str(analysis.checksum.to_str(include_filename=False)), inputs])
+        return hashing.sha1(key.encode('utf-8')).hexdigest
+
+    def hash_outputs(analysis: ScriptAnalysis, key: str) -> dict[str, str]:
+        products = {}
+        for registration in analysis.registrations:
+            path = None
+            if isinstance(registration.filename, Constant) and isinstance(registration.filename.value, str):
+                path = cwd / registration.filename.value
+
+            if path is not None and path.is_file():
+                h = digest.sha1(path, cache=digest_cache)
+                h = Hash(method=h.method, hexdigest=h.hexdigest, filename=registration.filename.value)
+            else:
+                h = Hash(method='sha1', hexdigest=key)
+            products[registration.name] = product_str(Product(codigo=registration.name, checksum=h))
+        return products
+
+    def execute(path: str) -> RunResult:
+        start = time.perf_counter()
+        try:
+            process = subprocess.run(
+                [python, str((root / path).resolve())],
+                cwd=cwd,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired as e:
+            return RunResult(
+                path, 'failed', None, time.perf_counter() - start,
+                e.stdout or '', (e.stderr or '') + f'\nTimed out after {timeout}s',
+            )
+        status = 'ran' if process.returncode == 0 else 'failed'
+        return RunResult(path, status, process.returncode, time.perf_counter() - start, process.stdout, process.stderr)
+
+    sorter = graphlib.TopologicalSorter(graph)
+    sorter.prepare()
+    results: list[RunResult] = []
+    failed: set[str] = set()
+    pending = {}
+    keys = {}
+
+    def finish(result: RunResult):
+        results.append(result)
+        if result.status in ('failed', 'blocked'):
+            failed.add(result.path)
+            current.pop(result.path, None)
+        sorter.done(result.path)
+        if callback is not None:
+            callback(result)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while sorter.is_active():
+                for path in sorted(sorter.get_ready()):
+                    analysis = analyses[path]
+                    if analysis.error is not None:
+                        finish(RunResult(path, 'failed', stderr=analysis.error))
+                        # Kept, so its outputs are carried until it parses again.
+                        if path in previous:
+                            current[path] = previous[path]
+                        continue
+                    if graph[path] & failed:
+                        finish(RunResult(path, 'blocked'))
+                        continue
+
+                    entry = {
+                        'source': analysis.checksum.to_str(include_filename=False),
+                        'inputs': inputs(analysis),
+                    }
+                    keys[path] = fingerprint(analysis, entry['inputs'])
+                    recorded = previous.get(path)
+                    if not force and recorded is not None and all(recorded.get(k) == v for k, v in entry.items()):
+                        if recorded.get('outputs') == hash_outputs(analysis, keys[path]):
+                            outputs[path] = recorded['outputs']
+                            finish(RunResult(path, 'skipped'))
+                            continue
+
+                    current[path] = entry
+                    pending[executor.submit(execute, path)] = path
+
+                if not pending:
+                    continue
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    result = future.result()
+                    if result.status == 'ran':
+                        outputs[path] = hash_outputs(analyses[path], keys[path])
+                        current[path]['outputs'] = outputs[path]
+                    finish(result)
+    finally:
+        # Scripts that did not finish are not recorded as up to date.
+        write_state(state_path, {path: entry for path, entry in current.items() if 'outputs' in entry})
+
+    return results
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('root', help="Directory with the scripts.")
+    parser.add_argument('--pattern', default='**/*.py')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--state', default=None)
+    parser.add_argument('--cwd', default=None)
+    parser.add_argument('--timeout', type=float, default=None)
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args()
+
+    def report(result: RunResult):
+        print(f"{result.status:<8} {result.elapsed:>8.2f}s {result.path}", flush=True)
+        if result.status == 'failed':
+            print(result.stderr, file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    results = run(
+        args.root, args.pattern, args.workers, args.state, args.cwd,
+        timeout=args.timeout, force=args.force, callback=report,
+    )
+    counts = {status: sum(result.status == status for result in results) for status in ('ran', 'skipped', 'failed', 'blocked')}
+    print(f"# {', '.join(f'{n} {status}' for status, n in counts.items())} in {time.perf_counter() - start:.2f}s")
+    return 1 if counts['failed'] or counts['blocked'] else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
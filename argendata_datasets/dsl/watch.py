@@ -0,0 +1,476 @@
+"""
+Watch mode: keeps the dataset dependencies of a scripts tree up to date as
+scripts are edited.
+
+`Watch` analyzes the tree once with `batch.analyze_dir` and then waits for
+file changes, with inotify on Linux and by polling `stat()` elsewhere. Only
+the scripts that changed are analyzed again, and the differences in the
+dependency index (dataset name -> consumer and producer scripts) are passed
+to a callback as soon as they are known. With inotify this is a few
+milliseconds after the editor writes the file.
+
+A script that stops parsing while it is being edited keeps its previous
+dependencies until it parses again; the error is reported in the update.
+
+Usage:
+
+>>> from argendata_datasets.dsl.watch import Watch
+>>> def report(update):
+...     for change in update.changes:
+...         print(change)
+>>> with Watch('etl/', callback=report) as watch:
+...     watch.run()
+
+Or from the command line:
+
+    python -m argendata_datasets.dsl.watch etl/
+"""
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Literal
+from .batch import ScriptAnalysis, analyze_dir, analyze_files, manifest
+import abc
+import ctypes
+import ctypes.util
+import os
+import pathlib
+import select
+import struct
+import sys
+import threading
+import time
+
+if TYPE_CHECKING:
+    from .batch import AnalysisCache
+
+PathLike = str | pathlib.Path
+
+DEFAULT_PATTERN = '**/*.py'
+DEFAULT_INTERVAL = 0.5
+# Events arriving within this many seconds of the first are handled together,
+# so that editors that write a file in several steps cause a single update.
+SETTLE_TIME = 0.005
+
+class Watcher(abc.ABC):
+    """
+    Waits for changes to the files under `root` that match `pattern`.
+    """
+    def __init__(self, root: PathLike, pattern: str = DEFAULT_PATTERN):
+        self.root = pathlib.Path(root)
+        self.pattern = pattern
+
+    def matches(self, path: pathlib.Path) -> bool:
+        return path.relative_to(self.root).full_match(self.pattern)
+
+    @abc.abstractmethod
+    def changes(self, timeout: None|float = None) -> None|set[pathlib.Path]:
+        """
+        Blocks until files change or `timeout` seconds pass, and returns the
+        paths of the files created, modified or removed. Returns None if
+        changes may have been missed and the whole tree must be rescanned.
+        """
+
+    def close(self):
+        pass
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+class PollingWatcher(Watcher):
+    """
+    Compares the `stat()` of every matching file every `interval` seconds.
+    """
+    def __init__(self, root: PathLike, pattern: str = DEFAULT_PATTERN, interval: float = DEFAULT_INTERVAL):
+        super().__init__(root, pattern)
+        self.interval = interval
+        self.snapshot = self.scan()
+        self.last = time.monotonic()
+
+    def scan(self) -> dict[pathlib.Path, tuple[int, int, int]]:
+        snapshot = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = pathlib.Path(directory) / name
+                if not self.matches(path):
+                    continue
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        return snapshot
+
+    def changes(self, timeout: None|float = None) -> None|set[pathlib.Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.last + self.interval - time.monotonic()
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+            if wait > 0:
+                time.sleep(wait)
+
+            if time.monotonic() >= self.last + self.interval:
+                self.last = time.monotonic()
+                snapshot, self.snapshot = self.snapshot, self.scan()
+                changed = {
+                    path
+                    for path in snapshot.keys() | self.snapshot.keys()
+                    if snapshot.get(path) != self.snapshot.get(path)
+                }
+                if changed:
+                    return changed
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+EVENT = struct.Struct('iIII')
+
+def _libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+class InotifyWatcher(Watcher):
+    """
+    Watches every directory under `root` with inotify, through ctypes.
+    Directories created later are watched as they appear. When a directory
+    is moved or events are lost, every watch is set up again from scratch
+    before `changes` asks for a rescan, since the paths of the watched
+    directories may no longer be right.
+    """
+    def __init__(self, root: PathLike, pattern: str = DEFAULT_PATTERN):
+        super().__init__(root, pattern)
+        self.libc = _libc()
+        if self.libc is None:
+            raise OSError("inotify is not available")
+
+        self.fd = -1
+        self.reset()
+
+    def reset(self):
+        """
+        Drops every watch, with the events still pending, and watches the
+        tree under `root` again.
+        """
+        self.close()
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories: dict[int, pathlib.Path] = {}
+        self.add_tree(self.root)
+
+    def add_directory(self, path: pathlib.Path) -> bool:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            # Removed before it could be watched.
+            return False
+        self.directories[wd] = path
+        return True
+
+    def add_tree(self, path: pathlib.Path) -> set[pathlib.Path]:
+        """
+        Watches `path` and its subdirectories, and returns the matching files
+        already in them.
+        """
+        found = set()
+        for directory, _, files in os.walk(path):
+            directory = pathlib.Path(directory)
+            if self.add_directory(directory):
+                found.update(p for p in map(directory.joinpath, files) if self.matches(p))
+        return found
+
+    def read(self) -> None|set[pathlib.Path]:
+        changed = set()
+        while True:
+            try:
+                buffer = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return changed
+
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = EVENT.unpack_from(buffer, offset)
+                name = buffer[offset + EVENT.size:offset + EVENT.size + length].rstrip(b'\0')
+                offset += EVENT.size + length
+
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if mask & IN_IGNORED:
+                    self.directories.pop(wd, None)
+                    continue
+
+                directory = self.directories.get(wd)
+                if directory is None:
+                    continue
+                path = directory / os.fsdecode(name)
+
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        changed.update(self.add_tree(path))
+                    elif mask & IN_MOVED_FROM:
+                        # Files moved out with their directory are gone.
+                        return None
+                elif self.matches(path):
+                    changed.add(path)
+
+    def changes(self, timeout: None|float = None) -> None|set[pathlib.Path]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = self.read()
+        while changed is not None and select.select([self.fd], [], [], SETTLE_TIME)[0]:
+            more = self.read()
+            changed = None if more is None else changed | more
+
+        if changed is None:
+            self.reset()
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+def watcher(
+    root: PathLike,
+    pattern: str = DEFAULT_PATTERN,
+    interval: float = DEFAULT_INTERVAL,
+    inotify: None|bool = None,
+) -> Watcher:
+    """
+    Returns an `InotifyWatcher` if inotify is available, or a
+    `PollingWatcher` otherwise. `inotify` forces one or the other.
+    """
+    if inotify is None:
+        inotify = _libc() is not None
+    if inotify:
+        return InotifyWatcher(root, pattern)
+    return PollingWatcher(root, pattern, interval)
+
+@dataclass(frozen=True)
+class Change:
+    kind: Literal['added', 'removed']
+    relation: Literal['consumer', 'producer']
+    dataset: str
+    script: str
+
+    def __str__(self):
+        sign = '+' if self.kind == 'added' else '-'
+        return f"{sign} {self.dataset} {self.relation} {self.script}"
+
+class DependencyIndex:
+    """
+    The consumers and producers of every dataset, by script path.
+    """
+    def __init__(self):
+        self.scripts: dict[str, ScriptAnalysis] = {}
+        self.consumers: dict[str, set[str]] = {}
+        self.producers: dict[str, set[str]] = {}
+
+    @staticmethod
+    def edges(analysis: None|ScriptAnalysis) -> set[tuple[str, str]]:
+        if analysis is None:
+            return set()
+        return (
+            {('consumer', name) for name in analysis.consumes}
+            | {('producer', name) for name in analysis.produces}
+        )
+
+    def relation(self, relation: str) -> dict[str, set[str]]:
+        return self.consumers if relation == 'consumer' else self.producers
+
+    def _apply(self, path: str, old: None|ScriptAnalysis, new: None|ScriptAnalysis) -> list[Change]:
+        before, after = self.edges(old), self.edges(new)
+        changes = []
+        for relation, name in sorted(before - after):
+            scripts = self.relation(relation)[name]
+            scripts.discard(path)
+            if not scripts:
+                del self.relation(relation)[name]
+            changes.append(Change('removed', relation, name, path))
+        for relation, name in sorted(after - before):
+            self.relation(relation).setdefault(name, set()).add(path)
+            changes.append(Change('added', relation, name, path))
+        return changes
+
+    def update(self, analysis: ScriptAnalysis) -> list[Change]:
+        old = self.scripts.get(analysis.path)
+        self.scripts[analysis.path] = analysis
+        return self._apply(analysis.path, old, analysis)
+
+    def remove(self, path: str) -> list[Change]:
+        return self._apply(path, self.scripts.pop(path, None), None)
+
+    def manifest(self) -> dict:
+        return manifest(self.scripts.values())
+
+@dataclass
+class Update:
+    """
+    What changed after the scripts in `analyzed` were analyzed again and
+    those in `removed` were deleted. `elapsed` is the time in seconds
+    between the change being noticed and the update being ready.
+    """
+    changes: list[Change] = field(default_factory=list)
+    analyzed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    errors: dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+class Watch:
+    """
+    Args:
+        - root: The scripts tree.
+        - pattern: Glob of the scripts, relative to `root`.
+        - callback: Called with every `Update` that has changes or errors.
+        - cache: An `AnalysisCache` for the initial analysis and later ones.
+        - interval: Seconds between scans when polling.
+        - inotify: Force inotify (True) or polling (False).
+    """
+    def __init__(
+        self,
+        root: PathLike,
+        pattern: str = DEFAULT_PATTERN,
+        callback: None|Callable[[Update], object] = None,
+        cache: 'None|AnalysisCache' = None,
+        interval: float = DEFAULT_INTERVAL,
+        inotify: None|bool = None,
+    ):
+        self.root = pathlib.Path(root)
+        self.pattern = pattern
+        self.callback = callback
+        self.cache = cache
+        self.stopped = threading.Event()
+
+        # Watch first, so that changes during the initial analysis are seen.
+        self.watcher = watcher(self.root, pattern, interval, inotify)
+        self.index = DependencyIndex()
+        for analysis in analyze_dir(self.root, pattern, cache=cache):
+            if analysis.error is None:
+                self.index.update(analysis)
+
+    def analyze(self, paths: set[pathlib.Path]) -> Update:
+        start = time.perf_counter()
+        update = Update()
+
+        existing = sorted(path for path in paths if path.is_file())
+        removed = paths.difference(existing)
+
+        # One at a time, so a file removed or unreadable since it was listed
+        # does not stop the others.
+        analyses = []
+        for path in existing:
+            try:
+                analyses += analyze_files([path], self.root, workers=1, cache=self.cache)
+            except OSError as error:
+                if path.exists():
+                    update.errors[path.relative_to(self.root).as_posix()] = f'{type(error).__name__}: {error}'
+                else:
+                    removed.add(path)
+
+        for path in sorted(removed):
+            name = path.relative_to(self.root).as_posix()
+            if name in self.index.scripts:
+                update.removed.append(name)
+                update.changes += self.index.remove(name)
+
+        for analysis in analyses:
+            update.analyzed.append(analysis.path)
+            if analysis.error is not None:
+                update.errors[analysis.path] = analysis.error
+            else:
+                update.changes += self.index.update(analysis)
+
+        update.elapsed = time.perf_counter() - start
+        return update
+
+    def rescan(self) -> set[pathlib.Path]:
+        paths = {path for path in self.root.glob(self.pattern) if path.is_file()}
+        return paths | {self.root / name for name in self.index.scripts}
+
+    def step(self, timeout: None|float = None) -> None|Update:
+        """
+        Waits up to `timeout` seconds for changes and applies them. Returns
+        the update, or None if nothing changed.
+        """
+        paths = self.watcher.changes(timeout)
+        if paths is None:
+            paths = self.rescan()
+        if not paths:
+            return None
+
+        update = self.analyze(paths)
+        if self.callback is not None and (update.changes or update.errors):
+            self.callback(update)
+        return update
+
+    def run(self, poll: float = 0.1):
+        """
+        Applies changes until `stop` is called, checking for it every `poll`
+        seconds.
+        """
+        while not self.stopped.is_set():
+            self.step(poll)
+
+    def start(self) -> threading.Thread:
+        """
+        Runs `run` in a daemon thread.
+        """
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stopped.set()
+
+    def close(self):
+        self.stop()
+        self.watcher.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('root', help="Directory with the scripts.")
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN)
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="Seconds between scans when polling.")
+    parser.add_argument('--poll', action='store_true', help="Poll even if inotify is available.")
+    args = parser.parse_args()
+
+    def report(update: Update):
+        for change in update.changes:
+            print(change, flush=True)
+        for path, error in update.errors.items():
+            print(f"! {path}: {error}", flush=True)
+        print(f"# {len(update.analyzed)} analyzed in {update.elapsed * 1e3:.1f}ms", flush=True)
+
+    with Watch(args.root, args.pattern, report, interval=args.interval, inotify=False if args.poll else None) as watch:
+        kind = type(watch.watcher).__name__
+        print(f"# watching {len(watch.index.scripts)} scripts in {args.root} with {kind}", flush=True)
+        try:
+            watch.run()
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    main()
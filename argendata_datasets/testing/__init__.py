@@ -0,0 +1,6 @@
+"""
+Helpers for the tests and benchmarks of this package. Nothing in the
+library imports them.
+
+- `static_server`: a local stand-in for the static server.
+"""
@@ -0,0 +1,380 @@
+"""
+Local stand-in for the static server, for tests and benchmarks.
+
+Serves the files under a root directory over HTTP/1.1 with keep-alive, so
+`hostname` can be passed to the static datasource functions in place of
+STATIC_HOSTNAME. Files are expected under `root / 'static/etl-fuentes'`.
+
+Responses carry an `ETag` derived from the file size and modification time,
+and conditional requests (`If-None-Match`, `If-Modified-Since`) are answered
+with 304. Single `Range: bytes=` requests are answered with 206, unless the
+server is created with `ranges=False` or an `If-Range` header does not match
+the file's `ETag` or `Last-Modified` date. With `compression=True`, other
+requests that accept gzip or deflate are answered compressed.
+`StaticServer.stats` counts responses by status code and
+`StaticServer.bytes_sent` the bytes of file contents sent.
+
+Requests can be slowed down with a fixed `latency` and a per-connection
+`bandwidth`, and `populate` writes synthetic datasets of given sizes, so the
+server can stand in for the real one in benchmarks (see
+`bench/bench_static.py`).
+
+Usage:
+
+>>> from argendata_datasets.testing.static_server import StaticServer, populate
+>>> populate('fixtures/', raw={'fuente.bin': 1 << 20}, clean={'weo_imf.parquet': 10_000})
+>>> with StaticServer('fixtures/', latency=0.02, bandwidth=10e6) as server:
+...     clean.get_index(server.hostname)
+
+Or from the command line:
+
+    python -m argendata_datasets.testing.static_server --latency-ms 20 --bandwidth-mbps 100
+"""
+
+import collections
+import contextlib
+import functools
+import gzip
+import http.server
+import io
+import os
+import pathlib
+import re
+import sys
+import threading
+import time
+import zlib
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+COPY_CHUNK_SIZE = 1 << 16 # 64KiB
+
+# In order of preference.
+ENCODINGS = {
+    'gzip': lambda data: gzip.compress(data, mtime=0),
+    'deflate': zlib.compress,
+}
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY the body
+    # of a keep-alive response waits for the client's delayed ACK.
+    disable_nagle_algorithm = True
+
+    etag: None|str = None
+    remaining: None|int = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_response(self, code, message=None):
+        self.server.count(code)
+        super().send_response(code, message)
+
+    def end_headers(self):
+        if self.etag is not None:
+            self.send_header('ETag', self.etag)
+            if self.server.ranges:
+                self.send_header('Accept-Ranges', 'bytes')
+        super().end_headers()
+
+    def copyfile(self, source, outputfile):
+        # Copies at most `remaining` bytes for range responses, counting the
+        # bytes sent and throttling them to the server's bandwidth.
+        bandwidth = self.server.bandwidth
+        start, sent = time.perf_counter(), 0
+
+        remaining = self.remaining
+        while remaining is None or remaining > 0:
+            chunk = source.read(COPY_CHUNK_SIZE if remaining is None else min(remaining, COPY_CHUNK_SIZE))
+            if not chunk:
+                break
+            # Counted before writing, so the count is complete by the time
+            # the client has read the whole body.
+            self.server.count_bytes(len(chunk))
+            outputfile.write(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+
+            sent += len(chunk)
+            if bandwidth is not None:
+                delay = sent / bandwidth - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+    def send_range(self, path: str, st: os.stat_result, value: str):
+        """
+        Sends the head of a 206 response for a single `bytes=` range and
+        returns the file positioned at its start, or None if the range is
+        not satisfiable.
+        """
+        match = RANGE_PATTERN.match(value.strip())
+        size = st.st_size
+
+        start = end = None
+        if match is not None and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))
+                end = size - 1
+
+        if start is None or start > end:
+            self.send_response(http.HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+
+        f = open(path, 'rb')
+        f.seek(start)
+        self.remaining = end - start + 1
+
+        self.send_response(http.HTTPStatus.PARTIAL_CONTENT)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_header('Content-Length', str(self.remaining))
+        self.send_header('Last-Modified', self.date_time_string(st.st_mtime))
+        self.end_headers()
+        return f
+
+    def negotiate_encoding(self) -> None|str:
+        """
+        Returns the encoding to compress the response with, if any.
+        """
+        if not self.server.compression or 'Range' in self.headers:
+            return None
+
+        accepted = set()
+        for token in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = token.strip().partition(';')
+            if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                accepted.add(name.strip().lower())
+
+        return next((encoding for encoding in ENCODINGS if encoding in accepted), None)
+
+    def send_encoded(self, path: str, st: os.stat_result, encoding: str):
+        with open(path, 'rb') as f:
+            data = ENCODINGS[encoding](f.read())
+
+        self.send_response(http.HTTPStatus.OK)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Last-Modified', self.date_time_string(st.st_mtime))
+        self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        return io.BytesIO(data)
+
+    def send_head(self):
+        self.etag = None
+        self.remaining = None
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        path = self.translate_path(self.path)
+
+        if os.path.isfile(path):
+            st = os.stat(path)
+            encoding = self.negotiate_encoding()
+            # Each encoding is a different representation, with its own ETag.
+            suffix = '' if encoding is None else f'-{encoding}'
+            self.etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}{suffix}"'
+
+            if_none_match = self.headers.get('If-None-Match')
+            if if_none_match is not None:
+                tags = {tag.strip() for tag in if_none_match.split(',')}
+                if self.etag in tags or '*' in tags:
+                    self.send_response(http.HTTPStatus.NOT_MODIFIED)
+                    self.end_headers()
+                    return None
+
+            range_header = self.headers.get('Range')
+            if range_header is not None and self.server.ranges:
+                if_range = self.headers.get('If-Range')
+                if if_range is None or if_range.strip() in (self.etag, self.date_time_string(st.st_mtime)):
+                    return self.send_range(path, st, range_header)
+
+            if encoding is not None:
+                return self.send_encoded(path, st, encoding)
+
+        return super().send_head()
+
+class Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    ranges = True
+    compression = False
+    latency = 0.0
+    bandwidth: None|float = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = collections.Counter()
+        self.bytes_sent = 0
+        self.stats_lock = threading.Lock()
+
+    def count(self, code: int):
+        with self.stats_lock:
+            self.stats[int(code)] += 1
+
+    def count_bytes(self, n: int):
+        with self.stats_lock:
+            self.bytes_sent += n
+
+    def handle_error(self, request, client_address):
+        # Clients may close a connection mid-response, e.g. after reading
+        # the part of a file they need.
+        if not isinstance(sys.exception(), ConnectionError):
+            super().handle_error(request, client_address)
+
+class StaticServer:
+    """
+    Args:
+        - root: The directory served, with files under `static/etl-fuentes`.
+        - ranges: Whether byte ranges are accepted.
+        - compression: Whether responses are compressed when accepted.
+        - latency: Seconds each request waits before it is answered.
+        - bandwidth: Bytes per second each response is throttled to, so
+          that parallel connections share more bandwidth than one.
+    """
+    def __init__(
+        self,
+        root: str|pathlib.Path,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        ranges: bool = True,
+        compression: bool = False,
+        latency: float = 0.0,
+        bandwidth: None|float = None,
+    ):
+        self.root = pathlib.Path(root)
+        handler = functools.partial(Handler, directory=str(self.root))
+        self.server = Server((host, port), handler)
+        self.server.ranges = ranges
+        self.server.compression = compression
+        self.server.latency = latency
+        self.server.bandwidth = bandwidth
+        self.thread = None
+
+    @property
+    def stats(self) -> collections.Counter:
+        return self.server.stats
+
+    @property
+    def bytes_sent(self) -> int:
+        return self.server.bytes_sent
+
+    @property
+    def hostname(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self): return self.start()
+    def __exit__(self, *exc): self.stop()
+
+def populate(
+    root: str|pathlib.Path,
+    raw: None|dict[str, int] = None,
+    clean: None|dict[str, int] = None,
+    seed: int = 0,
+) -> pathlib.Path:
+    """
+    Writes synthetic files under `root / 'static/etl-fuentes'`, along with
+    the `fuentes_raw.csv` and `fuentes_clean.csv` indexes listing them.
+
+    Args:
+        - raw: Raw files to write, as `{filename: size in bytes}`. Their
+          contents are random, so they do not compress.
+        - clean: Parquet files to write, as `{filename: number of rows}`,
+          with a country, a year and a value column.
+    """
+    import polars as pl
+    import random
+
+    raw = raw or {}
+    clean = clean or {}
+    rng = random.Random(seed)
+    base = pathlib.Path(root) / 'static' / 'etl-fuentes'
+    (base / 'raw').mkdir(parents=True, exist_ok=True)
+    (base / 'clean').mkdir(parents=True, exist_ok=True)
+
+    for filename, size in raw.items():
+        (base / 'raw' / filename).write_bytes(rng.randbytes(size))
+
+    countries = ['ARG', 'BRA', 'CHL', 'URY', 'PRY', 'BOL', 'PER', 'COL']
+    for filename, rows in clean.items():
+        pl.DataFrame({
+            'iso3': [countries[i % len(countries)] for i in range(rows)],
+            'anio': pl.int_range(rows, eager=True) % 60 + 1960,
+            'valor': [rng.random() for _ in range(rows)],
+        }).write_parquet(base / 'clean' / filename)
+
+    pl.DataFrame({
+        'id_fuente': pl.int_range(1, len(raw) + 1, eager=True),
+        'path_raw': list(raw),
+    }).write_csv(base / 'fuentes_raw.csv')
+
+    pl.DataFrame({
+        'id_fuente_clean': pl.int_range(1, len(clean) + 1, eager=True),
+        'path_clean': list(clean),
+    }).write_csv(base / 'fuentes_clean.csv')
+
+    return base
+
+def main():
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('root', nargs='?', help="Directory to serve. Defaults to synthetic files in a temporary directory.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--bandwidth-mbps', type=float, default=None, help="Per connection, in megabits per second.")
+    parser.add_argument('--no-ranges', action='store_true')
+    parser.add_argument('--compression', action='store_true')
+    parser.add_argument('--raw-files', type=int, default=10)
+    parser.add_argument('--raw-size-kb', type=int, default=1024)
+    parser.add_argument('--clean-files', type=int, default=10)
+    parser.add_argument('--clean-rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        root = args.root
+        if root is None:
+            root = stack.enter_context(tempfile.TemporaryDirectory())
+            populate(
+                root,
+                raw={f'fuente_{i}.bin': args.raw_size_kb << 10 for i in range(args.raw_files)},
+                clean={f'dataset_{i}.parquet': args.clean_rows for i in range(args.clean_files)},
+            )
+
+        server = StaticServer(
+            root,
+            host=args.host,
+            port=args.port,
+            ranges=not args.no_ranges,
+            compression=args.compression,
+            latency=args.latency_ms / 1000,
+            bandwidth=None if args.bandwidth_mbps is None else args.bandwidth_mbps * 1e6 / 8,
+        )
+        print(f"Serving {root} on {server.hostname}", flush=True)
+
+        try:
+            server.server.serve_forever(0.05)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server.server_close()
+
+if __name__ == '__main__':
+    main()
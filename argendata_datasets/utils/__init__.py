@@ -1 +1,2 @@
-from .product import Product
\ No newline at end of file
+from .product import Product
+from . import parquet
\ No newline at end of file
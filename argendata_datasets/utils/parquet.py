@@ -0,0 +1,186 @@
+"""
+Minimal reader for the footer of parquet files.
+
+Only the fields needed to locate row groups and column chunks in the file are
+decoded, which is enough to read or verify a byte range of a parquet file
+without a parquet library.
+
+Usage:
+
+>>> from argendata_datasets.utils import parquet
+>>> with open('file.parquet', 'rb') as f:
+...     metadata = parquet.read_metadata(f)
+>>> metadata.row_groups[0].offset, metadata.row_groups[0].length
+"""
+
+from dataclasses import dataclass
+from typing import BinaryIO
+import io
+import os
+import struct
+
+MAGIC = b'PAR1'
+FOOTER_TAIL_SIZE = 8 # 4 bytes of metadata length + magic
+
+@dataclass(frozen=True)
+class ColumnChunk:
+    path: tuple[str, ...]
+    offset: int
+    length: int
+
+@dataclass(frozen=True)
+class RowGroup:
+    index: int
+    num_rows: int
+    columns: tuple[ColumnChunk, ...]
+
+    @property
+    def offset(self) -> int:
+        return min(column.offset for column in self.columns)
+
+    @property
+    def length(self) -> int:
+        return max(column.offset + column.length for column in self.columns) - self.offset
+
+@dataclass(frozen=True)
+class FileMetadata:
+    num_rows: int
+    row_groups: tuple[RowGroup, ...]
+    footer_offset: int
+    footer_length: int
+
+# ==============================================================================
+# Thrift compact protocol
+
+STOP, TRUE, FALSE, BYTE, I16, I32, I64, DOUBLE, BINARY, LIST, SET, MAP, STRUCT = range(13)
+
+class CompactReader:
+    """
+    Decodes thrift compact protocol structs into dicts keyed by field id.
+    """
+    def __init__(self, data: bytes):
+        self.stream = io.BytesIO(data)
+
+    def byte(self) -> int:
+        b = self.stream.read(1)
+        if not b:
+            raise ValueError("Unexpected end of parquet metadata")
+        return b[0]
+
+    def varint(self) -> int:
+        result, shift = 0, 0
+        while True:
+            b = self.byte()
+            result |= (b & 0x7f) << shift
+            if not b & 0x80:
+                return result
+            shift += 7
+
+    def zigzag(self) -> int:
+        n = self.varint()
+        return (n >> 1) ^ -(n & 1)
+
+    def value(self, ttype: int):
+        match ttype:
+            case 1 | 2:
+                # Booleans inside collections are encoded as a byte.
+                return self.byte() == TRUE
+            case 3:
+                return struct.unpack('b', bytes([self.byte()]))[0]
+            case 4 | 5 | 6:
+                return self.zigzag()
+            case 7:
+                return struct.unpack('<d', self.stream.read(8))[0]
+            case 8:
+                return self.stream.read(self.varint())
+            case 9 | 10:
+                return self.list()
+            case 11:
+                return self.map()
+            case 12:
+                return self.struct()
+        raise ValueError(f"Unknown thrift type {ttype}")
+
+    def list(self) -> list:
+        header = self.byte()
+        size, ttype = header >> 4, header & 0x0f
+        if size == 15:
+            size = self.varint()
+        return [self.value(ttype) for _ in range(size)]
+
+    def map(self) -> dict:
+        size = self.varint()
+        if size == 0:
+            return {}
+        types = self.byte()
+        ktype, vtype = types >> 4, types & 0x0f
+        return {self.value(ktype): self.value(vtype) for _ in range(size)}
+
+    def struct(self) -> dict:
+        fields, field_id = {}, 0
+        while True:
+            header = self.byte()
+            if header == STOP:
+                return fields
+
+            delta, ttype = header >> 4, header & 0x0f
+            field_id = field_id + delta if delta else self.zigzag()
+
+            if ttype in (TRUE, FALSE):
+                fields[field_id] = ttype == TRUE
+            else:
+                fields[field_id] = self.value(ttype)
+
+# ==============================================================================
+
+def _column_chunk(fields: dict) -> ColumnChunk:
+    # ColumnChunk.meta_data (3) -> ColumnMetaData
+    metadata = fields[3]
+    path = tuple(part.decode('utf-8') for part in metadata[3])
+    data_page_offset = metadata[9]
+    dictionary_page_offset = metadata.get(11)
+
+    offset = data_page_offset
+    if dictionary_page_offset is not None and 0 < dictionary_page_offset < offset:
+        offset = dictionary_page_offset
+
+    return ColumnChunk(path=path, offset=offset, length=metadata[7])
+
+def parse_metadata(data: bytes, footer_offset: int) -> FileMetadata:
+    fields = CompactReader(data).struct()
+
+    row_groups = tuple(
+        RowGroup(
+            index=i,
+            num_rows=row_group[3],
+            columns=tuple(_column_chunk(column) for column in row_group[1]),
+        )
+        for i, row_group in enumerate(fields.get(4, []))
+    )
+
+    return FileMetadata(
+        num_rows=fields[3],
+        row_groups=row_groups,
+        footer_offset=footer_offset,
+        footer_length=len(data) + FOOTER_TAIL_SIZE,
+    )
+
+def read_metadata(f: BinaryIO) -> FileMetadata:
+    """
+    Reads the footer of the parquet file `f`, which must be seekable. Only
+    the footer is read.
+    """
+    size = f.seek(0, os.SEEK_END)
+    if size < len(MAGIC) + FOOTER_TAIL_SIZE:
+        raise ValueError("File is too small to be a parquet file")
+
+    f.seek(size - FOOTER_TAIL_SIZE)
+    tail = f.read(FOOTER_TAIL_SIZE)
+    if tail[4:] != MAGIC:
+        raise ValueError("Not a parquet file: missing magic bytes")
+
+    (metadata_length,) = struct.unpack('<I', tail[:4])
+    footer_offset = size - FOOTER_TAIL_SIZE - metadata_length
+
+    f.seek(footer_offset)
+    return parse_metadata(f.read(metadata_length), footer_offset)
@@ -0,0 +1,58 @@
+"""
+Time of `dsl.analyzer.analyze` against `get_datasets` plus
+`get_dataset_registrations` on large generated scripts, with as many gets,
+registrations and saves as given, plus unrelated statements. Both start from
+the source text: `separate` parses it in `get_datasets` and again for
+`get_dataset_registrations`, as a caller with only the text must, and
+`analyze` parses it once. `parse` is the time of a single parse.
+
+Usage (from the repository root):
+
+    python bench/bench_analyzer.py --datasets 100 1000 5000 --filler 10000
+"""
+import rootdir
+import argparse
+import ast
+import statistics
+import time
+
+from argendata_datasets.dsl.analyzer import analyze, get_datasets, get_dataset_registrations
+
+def script(datasets: int, filler: int) -> str:
+    lines = []
+    lines += [f"x{i} = Datasets.R{i}C0.get(version='v{i}')" for i in range(datasets)]
+    lines += [f"d{i} = Datasets.R{i}C1.register(filename='d{i}.csv')" for i in range(datasets)]
+    lines += [f"y{i} = x{i % max(datasets, 1)}.filter(pl.col('a') > {i}).select('a', 'b')" for i in range(filler)]
+    lines += [f"d{i}.save(x{i})" for i in range(datasets)]
+    return '\n'.join(lines)
+
+def timed(f, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--datasets', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    parser.add_argument('--filler', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'datasets':>9} {'lines':>8} {'parse':>10} {'separate':>10} {'analyze':>10}")
+    for datasets in args.datasets:
+        text = script(datasets, args.filler)
+
+        parse = timed(lambda: ast.parse(text), args.repeat)
+        separate = timed(lambda: (get_datasets(text), get_dataset_registrations(ast.parse(text))), args.repeat)
+        single = timed(lambda: analyze(text), args.repeat)
+
+        print(
+            f"{datasets:>9} {text.count(chr(10)) + 1:>8}"
+            f" {parse * 1e3:>8.1f}ms {separate * 1e3:>8.1f}ms {single * 1e3:>8.1f}ms"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Throughput and peak RSS of `checksum.digest` for the one-shot, chunked and
+memory-mapped read paths.
+
+Each mode runs in its own interpreter so that `ru_maxrss` is not shared
+between measurements.
+
+Usage (from the repository root):
+
+    python bench/bench_digest.py --size-mb 1024 --method sha1
+"""
+import rootdir
+import argparse
+import os
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = {
+    'oneshot': dict(buffer_size=None),
+    'chunked-64k': dict(buffer_size=64 << 10),
+    'chunked-1m': dict(buffer_size=1 << 20),
+    'chunked-16m': dict(buffer_size=16 << 20),
+    'mmap-1m': dict(buffer_size=1 << 20, mmap=True),
+}
+
+def worker(mode: str, path: str, method: str):
+    from argendata_datasets.checksum import digest
+
+    start = time.perf_counter()
+    result = getattr(digest, method)(path, **MODES[mode])
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is reported in KiB on Linux.
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(elapsed, maxrss, result.hexdigest)
+
+def write_file(path: pathlib.Path, size: int):
+    block = os.urandom(1 << 20)
+    with path.open('wb') as f:
+        for _ in range(size >> 20):
+            f.write(block)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=512)
+    parser.add_argument('--method', default='sha1')
+    parser.add_argument('--worker', nargs=2, metavar=('MODE', 'PATH'))
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(*args.worker, method=args.method)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = pathlib.Path(tmp_dir) / 'bench.bin'
+        write_file(path, args.size_mb << 20)
+        size = path.stat().st_size
+
+        print(f"{'mode':<12} {'MB/s':>10} {'peak RSS (MB)':>14}")
+        digests = set()
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, '--method', args.method, '--worker', mode, str(path)],
+                check=True, capture_output=True, text=True,
+            ).stdout.split()
+
+            elapsed, maxrss, hexdigest = float(output[0]), int(output[1]), output[2]
+            digests.add(hexdigest)
+            print(f"{mode:<12} {size / elapsed / 1e6:>10.1f} {maxrss / 1024:>14.1f}")
+
+        assert len(digests) == 1, "All modes must produce the same digest"
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Throughput of `checksum.digest_many` against the number of worker threads,
+compared with a serial loop over `digest.<method>`.
+
+Usage (from the repository root):
+
+    python bench/bench_digest_many.py --files 256 --size-mb 4 --method sha1
+"""
+import rootdir
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from argendata_datasets import checksum
+from argendata_datasets.checksum import digest
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=256)
+    parser.add_argument('--size-mb', type=int, default=4)
+    parser.add_argument('--method', default='sha1')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = pathlib.Path(tmp_dir)
+        block = os.urandom(args.size_mb << 20)
+        paths = []
+        for i in range(args.files):
+            path = root / f'{i}.bin'
+            path.write_bytes(block)
+            paths.append(path)
+
+        total = args.files * len(block)
+        f = getattr(digest, args.method)
+
+        start = time.perf_counter()
+        for path in paths:
+            f(path)
+        elapsed = time.perf_counter() - start
+        print(f"{'serial':<12} {total / elapsed / 1e6:>10.1f} MB/s")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            for _ in checksum.digest_many(paths, method=args.method, workers=workers):
+                pass
+            elapsed = time.perf_counter() - start
+            print(f"{f'workers={workers}':<12} {total / elapsed / 1e6:>10.1f} MB/s")
+
+if __name__ == '__main__':
+    main()
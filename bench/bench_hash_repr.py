@@ -0,0 +1,65 @@
+"""
+Memory and parse time per million manifest entries for `Hash`, `FrozenHash`
+and the polars column representation of `checksum.manifest`.
+
+Usage (from the repository root):
+
+    python bench/bench_hash_repr.py --entries 1000000
+"""
+import rootdir
+import argparse
+import gc
+import hashlib
+import time
+import tracemalloc
+
+import polars as pl
+
+from argendata_datasets.checksum import Hash, FrozenHash, manifest
+
+def measure(f):
+    # Time and memory are measured in separate runs, since tracing
+    # allocations slows down the code being timed.
+    gc.collect()
+    start = time.perf_counter()
+    result = f()
+    elapsed = time.perf_counter() - start
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = f()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entries', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    methods = ['sha1', 'sha256', 'md5']
+    lines = [
+        f'dir/file_{i}.parquet@{methods[i % 3]}:{hashlib.new(methods[i % 3], str(i).encode()).hexdigest()}'
+        for i in range(args.entries)
+    ]
+    per_million = 1_000_000 / args.entries
+
+    def report(label, elapsed, memory):
+        print(f"{label:<24} {elapsed * per_million:>8.2f} s/M {memory * per_million / 2**20:>10.1f} MiB/M")
+
+    _, elapsed, memory = measure(lambda: [Hash.from_str(line) for line in lines])
+    report('Hash.from_str', elapsed, memory)
+
+    _, elapsed, memory = measure(lambda: [FrozenHash.from_str(line) for line in lines])
+    report('FrozenHash.from_str', elapsed, memory)
+
+    column = pl.Series(lines)
+    df, elapsed, _ = measure(lambda: manifest.parse_column(column))
+    report('manifest.parse_column', elapsed, df.estimated_size())
+
+    _, elapsed, _ = measure(lambda: manifest.serialize_column(df))
+    report('manifest.serialize_column', elapsed, 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Latency of many small static downloads with a fresh connection per request
+(`urllib.request.urlopen`) against a pooled keep-alive `Session`, using the
+local stand-in server.
+
+Usage (from the repository root):
+
+    python bench/bench_session.py --files 200 --size-kb 16
+"""
+import rootdir
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from argendata_datasets.datasource.static import raw, Session
+from argendata_datasets.testing.static_server import StaticServer
+
+def run(filenames, hostname, session, workers):
+    def get(filename):
+        return raw.get_by_filename(filename, hostname, session=session)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as executor:
+        for _ in executor.map(get, filenames):
+            pass
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--size-kb', type=int, default=16)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = pathlib.Path(tmp_dir)
+        base = root / 'static' / 'etl-fuentes' / 'raw'
+        base.mkdir(parents=True)
+
+        filenames = []
+        for i in range(args.files):
+            (base / f'{i}.bin').write_bytes(os.urandom(args.size_kb << 10))
+            filenames.append(f'{i}.bin')
+
+        with StaticServer(root) as server:
+            for workers in args.workers:
+                elapsed = run(filenames, server.hostname, None, workers)
+                print(f"{f'urlopen w={workers}':<20} {elapsed / args.files * 1e3:>8.2f} ms/file")
+
+                with Session(max_connections_per_host=workers) as session:
+                    elapsed = run(filenames, server.hostname, session, workers)
+                print(f"{f'session w={workers}':<20} {elapsed / args.files * 1e3:>8.2f} ms/file")
+
+if __name__ == '__main__':
+    main()
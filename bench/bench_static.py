@@ -0,0 +1,159 @@
+"""
+Latency, throughput, memory and concurrency scaling of `datasource.static`
+against the local stand-in server, with configurable latency and
+per-connection bandwidth.
+
+- index: latency of `get_index` and `load_index` (cached).
+- clean: `get_by_filename` of a parquet dataset, eager and materialized.
+- raw: `get_by_filename`, `open_by_filename` and `download_by_filename`
+  (sequential and segmented) of a large raw file.
+- scaling: `raw.get_many` of many small files with 1..N workers.
+
+Memory is the peak RSS above the baseline while each call runs, sampled
+from /proc (Linux only).
+
+Usage (from the repository root):
+
+    python bench/bench_static.py --latency-ms 20 --bandwidth-mbps 200 --raw-size-mb 64
+"""
+import rootdir
+import argparse
+import os
+import pathlib
+import statistics
+import tempfile
+import threading
+import time
+
+from argendata_datasets.datasource.static import raw, clean, Session
+from argendata_datasets.datasource.static import index as static_index
+from argendata_datasets.testing.static_server import StaticServer, populate
+
+def rss() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def measure(f):
+    """
+    Returns the result of `f()`, its duration and its peak RSS above the
+    RSS before it was called.
+    """
+    baseline, peak = rss(), [0]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.002):
+            peak[0] = max(peak[0], rss())
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        result = f()
+    finally:
+        elapsed = time.perf_counter() - start
+        done.set()
+        sampler.join()
+
+    return result, elapsed, max(0, max(peak[0], rss()) - baseline)
+
+def report(label, elapsed, size=None, memory=None):
+    line = f"{label:<36} {elapsed * 1e3:>9.2f} ms"
+    if size is not None:
+        line += f" {size / elapsed / 2**20:>9.1f} MiB/s"
+    if memory is not None:
+        line += f" {memory / 2**20:>9.1f} MiB peak"
+    print(line)
+
+def bench_index(hostname, session, repeat, tmp):
+    latencies = [measure(lambda: clean.get_index(hostname, session=session))[1] for _ in range(repeat)]
+    report('get_index p50', statistics.median(latencies))
+    report('get_index p95', statistics.quantiles(latencies, n=20)[-1])
+
+    directory = tmp / 'indexes'
+    _, elapsed, _ = measure(lambda: clean.load_index(hostname, directory=directory, session=session))
+    report('load_index cold', elapsed)
+    static_index.clear_memo()
+    _, elapsed, _ = measure(lambda: clean.load_index(hostname, directory=directory, session=session))
+    report('load_index from disk', elapsed)
+    _, elapsed, _ = measure(lambda: clean.load_index(hostname, directory=directory, session=session))
+    report('load_index memoized', elapsed)
+
+def bench_clean(hostname, session, size, tmp):
+    _, elapsed, memory = measure(lambda: clean.get_by_filename('dataset.parquet', hostname, session=session))
+    report('clean.get_by_filename', elapsed, size, memory)
+
+    directory = tmp / 'materialized'
+    _, elapsed, memory = measure(lambda: clean.get_by_filename('dataset.parquet', hostname, session=session, materialize=directory))
+    report('clean materialize (cold)', elapsed, size, memory)
+    _, elapsed, memory = measure(lambda: clean.get_by_filename('dataset.parquet', hostname, session=session, materialize=directory))
+    report('clean materialize (warm)', elapsed, size, memory)
+
+def bench_raw(hostname, session, size, segments, tmp):
+    _, elapsed, memory = measure(lambda: raw.get_by_filename('large.bin', hostname, session=session))
+    report('raw.get_by_filename', elapsed, size, memory)
+
+    def stream():
+        for _ in raw.iter_by_filename('large.bin', hostname, session=session):
+            pass
+
+    _, elapsed, memory = measure(stream)
+    report('raw.iter_by_filename', elapsed, size, memory)
+
+    to = tmp / 'large.bin'
+    _, elapsed, memory = measure(lambda: raw.download_by_filename('large.bin', hostname, to, session=session))
+    report('raw.download_by_filename', elapsed, size, memory)
+
+    for n in segments:
+        _, elapsed, memory = measure(lambda: raw.download_by_filename(
+            'large.bin', hostname, to, session=session, segments=n, min_segment_size=1 << 20,
+        ))
+        report(f'raw.download segments={n}', elapsed, size, memory)
+
+def bench_scaling(hostname, filenames, size, workers):
+    for n in workers:
+        with Session(max_connections_per_host=n) as session:
+            def fetch():
+                for _, result in raw.get_many(filenames, hostname, workers=n, session=session):
+                    if isinstance(result, Exception):
+                        raise result
+
+            _, elapsed, memory = measure(fetch)
+        report(f'raw.get_many workers={n}', elapsed, size * len(filenames), memory)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency-ms', type=float, default=5.0)
+    parser.add_argument('--bandwidth-mbps', type=float, default=None, help="Per connection.")
+    parser.add_argument('--raw-size-mb', type=int, default=32)
+    parser.add_argument('--clean-rows', type=int, default=1_000_000)
+    parser.add_argument('--files', type=int, default=64)
+    parser.add_argument('--file-size-kb', type=int, default=256)
+    parser.add_argument('--segments', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = pathlib.Path(tmp_dir)
+        small = {f'small_{i}.bin': args.file_size_kb << 10 for i in range(args.files)}
+        base = populate(
+            tmp / 'root',
+            raw={'large.bin': args.raw_size_mb << 20, **small},
+            clean={'dataset.parquet': args.clean_rows},
+        )
+        clean_size = (base / 'clean' / 'dataset.parquet').stat().st_size
+
+        server = StaticServer(
+            tmp / 'root',
+            latency=args.latency_ms / 1000,
+            bandwidth=None if args.bandwidth_mbps is None else args.bandwidth_mbps * 1e6 / 8,
+        )
+        with server, Session() as session:
+            bench_index(server.hostname, session, args.repeat, tmp)
+            bench_clean(server.hostname, session, clean_size, tmp)
+            bench_raw(server.hostname, session, args.raw_size_mb << 20, args.segments, tmp)
+            bench_scaling(server.hostname, list(small), args.file_size_kb << 10, args.workers)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Throughput of `checksum.tree.digest` against the number of worker threads,
+compared with a streaming sha1 and blake2b over the same file.
+
+Usage (from the repository root):
+
+    python bench/bench_tree.py --size-mb 2048 --leaf-mb 16
+"""
+import rootdir
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from argendata_datasets.checksum import digest, tree
+
+def measure(f, size: int) -> float:
+    start = time.perf_counter()
+    f()
+    return size / (time.perf_counter() - start) / 1e9
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=1024)
+    parser.add_argument('--leaf-mb', type=int, default=16)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = pathlib.Path(tmp_dir) / 'bench.bin'
+        block = os.urandom(1 << 20)
+        with path.open('wb') as f:
+            for _ in range(args.size_mb):
+                f.write(block)
+
+        size = path.stat().st_size
+        leaf_size = args.leaf_mb << 20
+
+        # Warm the page cache so that every run measures hashing, not the disk.
+        digest.sha1(path)
+
+        print(f"cores: {os.cpu_count()}")
+        print(f"{'sha1':<16} {measure(lambda: digest.sha1(path), size):>8.2f} GB/s")
+        print(f"{'blake2b':<16} {measure(lambda: digest.blake2b(path), size):>8.2f} GB/s")
+
+        for workers in args.workers:
+            for mmap in (False, True):
+                label = f"tree w={workers}" + (' mmap' if mmap else '')
+                gbps = measure(lambda: tree.digest(path, leaf_size, workers=workers, mmap=mmap), size)
+                print(f"{label:<16} {gbps:>8.2f} GB/s")
+
+if __name__ == '__main__':
+    main()
@@ -32,4 +32,378 @@ def test_roundtrip_hash():
 
     hashobj = Hash(method='sha1', hexdigest='aaf4c61ddcc5e8a2dabede0f3b482cd9aea9434d', filename='test.txt')
     assert hashobj.to_str() == str(hashobj)
-    assert Hash.from_str(str(hashobj)) == hashobj
\ No newline at end of file
+    assert Hash.from_str(str(hashobj)) == hashobj
+
+
+def test_digest_streaming():
+    import tempfile, pathlib, io, os
+
+    data = os.urandom(3 * 1024 + 17)
+    expected = hash.sha256(data).hexdigest
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = pathlib.Path(tmp_dir) / 'test.bin'
+        tmp_path.write_bytes(data)
+
+        for buffer_size in (1, 1000, 1024, len(data), 1 << 20, None):
+            assert digest.sha256(tmp_path, buffer_size=buffer_size).hexdigest == expected
+            assert digest.sha256(io.BytesIO(data), buffer_size=buffer_size).hexdigest == expected
+
+        for buffer_size in (1000, 1 << 20):
+            assert digest.sha256(tmp_path, mmap=True, buffer_size=buffer_size).hexdigest == expected
+
+        empty_path = pathlib.Path(tmp_dir) / 'empty.bin'
+        empty_path.write_bytes(b'')
+        assert digest.sha1(empty_path).hexdigest == hash.sha1(b'').hexdigest
+        assert digest.sha1(empty_path, mmap=True).hexdigest == hash.sha1(b'').hexdigest
+
+
+def test_digest_many():
+    import tempfile, pathlib
+    from argendata_datasets import checksum
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = pathlib.Path(tmp_dir)
+        (root / 'sub').mkdir()
+        paths = [root / f'{i}.txt' for i in range(20)] + [root / 'sub' / 'x.txt']
+        for i, path in enumerate(paths):
+            path.write_text(f'file {i}')
+
+        results = list(checksum.digest_many(paths, method='sha1', workers=4))
+        assert len(results) == len(paths)
+        assert {r.filename for r in results} == {str(p) for p in paths}
+        assert all(r == digest.sha1(r.filename) for r in results)
+
+        results = {r.filename: r for r in checksum.digest_dir(root, workers=4)}
+        assert set(results) == {p.relative_to(root).as_posix() for p in paths}
+        assert results['sub/x.txt'].hexdigest == hash.sha1(b'file 20').hexdigest
+
+        # A missing file is reported, and the others are still hashed.
+        errors = []
+        results = list(checksum.digest_many(paths + [root / 'gone.txt'], workers=4, on_error=lambda p, e: errors.append((p, e))))
+        assert len(results) == len(paths)
+        assert [(p, type(e)) for p, e in errors] == [(root / 'gone.txt', FileNotFoundError)]
+
+
+def test_manifest_roundtrip():
+    import tempfile, pathlib
+    from argendata_datasets import checksum
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = pathlib.Path(tmp_dir)
+        for i in range(5):
+            (root / f'{i}.txt').write_text(f'file {i}')
+
+        manifest_path = checksum.manifest.write(checksum.digest_dir(root, pattern='*.txt'), root / 'SHA1SUMS')
+        lines = manifest_path.read_text().splitlines()
+        assert lines[0] == str(hash.sha1(b'file 0')).replace('sha1:', '0.txt@sha1:')
+        assert [Hash.from_str(line) for line in lines] == list(checksum.manifest.read(manifest_path))
+
+        result = checksum.manifest.verify(manifest_path)
+        assert result.passed
+        assert len(result.ok) == 5
+
+        (root / '1.txt').write_text('changed')
+        (root / '2.txt').unlink()
+
+        result = checksum.manifest.verify(manifest_path)
+        assert not result.passed
+        assert [expected.filename for expected, _ in result.mismatched] == ['1.txt']
+        assert result.mismatched[0][1].hexdigest == hash.sha1(b'changed').hexdigest
+        assert [expected.filename for expected in result.missing] == ['2.txt']
+
+        # Entries without a filename are errors, not crashes.
+        manifest_path.write_text(manifest_path.read_text() + hash.sha1(b'x').to_str() + '\n')
+        result = checksum.manifest.verify(manifest_path)
+        assert [expected.filename for expected, _ in result.errors] == [None]
+        assert isinstance(result.errors[0][1], ValueError)
+
+
+def test_digest_cache():
+    import tempfile, pathlib, os
+    from argendata_datasets.checksum import DigestCache
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = pathlib.Path(tmp_dir)
+        path = root / 'test.txt'
+        path.write_text('hello')
+
+        with DigestCache(root / 'cache.sqlite3') as cache:
+            first = digest.sha1(path, cache=cache)
+            second = digest.sha1(path, cache=cache)
+            assert first == second == digest.sha1(path)
+            assert (cache.hits, cache.misses) == (1, 1)
+
+            # The cache is persistent and shared between instances.
+            with DigestCache(root / 'cache.sqlite3') as other:
+                assert digest.sha1(path, cache=other) == first
+                assert other.hits == 1
+
+            path.write_text('changed')
+            assert digest.sha1(path, cache=cache).hexdigest == hash.sha1(b'changed').hexdigest
+            assert cache.misses == 2
+
+            digest.sha256(path, cache=cache)
+            assert len(cache) == 2
+            assert cache.invalidate(path, method='sha256') == 1
+            assert cache.invalidate(path) == 1
+            assert len(cache) == 0
+
+            # Digests with constructor arguments bypass the cache.
+            import hashlib
+            short = digest.blake2b(path, cache=cache, digest_size=16)
+            assert short.hexdigest == hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+            assert digest.blake2b(path, cache=cache).hexdigest == hashlib.blake2b(path.read_bytes()).hexdigest()
+            assert len(cache) == 1
+
+
+def test_digest_cache_eviction():
+    import tempfile, pathlib
+    from argendata_datasets.checksum import DigestCache
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = pathlib.Path(tmp_dir)
+        paths = [root / f'{i}.txt' for i in range(10)]
+        for path in paths:
+            path.write_text(path.name)
+
+        with DigestCache(root / 'cache.sqlite3', max_entries=4, evict_every=1) as cache:
+            for path in paths:
+                digest.sha1(path, cache=cache)
+            assert len(cache) == 4
+
+            # The most recently used entries are kept.
+            for path in paths[-4:]:
+                digest.sha1(path, cache=cache)
+            assert cache.hits == 4
+
+
+def test_multi():
+    import tempfile, pathlib, io
+    from argendata_datasets.checksum import DigestCache
+
+    methods = ['sha1', 'sha256', 'md5']
+    expected = {method: getattr(hash, method)(b'hello') for method in methods}
+
+    assert hash.multi(b'hello', methods) == expected
+    assert digest.multi(io.BytesIO(b'hello'), methods, buffer_size=2) == expected
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = pathlib.Path(tmp_dir) / 'test.txt'
+        path.write_text('hello')
+
+        results = digest.multi(path, methods + ['sha1'])
+        assert list(results) == methods
+        assert all(results[m] == getattr(digest, m)(path) for m in methods)
+
+        with DigestCache(pathlib.Path(tmp_dir) / 'cache.sqlite3') as cache:
+            digest.sha1(path, cache=cache)
+            assert digest.multi(path, methods, cache=cache) == results
+            assert digest.multi(path, methods, cache=cache) == results
+            assert (cache.hits, cache.misses) == (4, 3)
+
+
+def test_tree():
+    import tempfile, pathlib, io, os
+    from argendata_datasets import checksum
+    from argendata_datasets.checksum import tree
+
+    data = os.urandom(10 * 1024 + 3)
+    expected = tree.hash(data, leaf_size=1024, workers=1)
+    assert expected.method == 'blake2b_tree_1024'
+    assert tree.hash(data, leaf_size=1024, workers=4) == expected
+    assert tree.hash(data, leaf_size=2048) != expected
+    assert hash.blake2b_tree_1024(data) == expected
+
+    # A single leaf is not the same as a plain blake2b.
+    assert tree.hash(b'hello').hexdigest != hash.blake2b(b'hello').hexdigest
+    assert tree.hash(b'').hexdigest == tree.digest(io.BytesIO(b'')).hexdigest
+
+    assert tree.digest(io.BytesIO(data), leaf_size=1024, workers=2) == expected
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = pathlib.Path(tmp_dir) / 'test.bin'
+        path.write_bytes(data)
+
+        for mmap in (False, True):
+            result = tree.digest(path, leaf_size=1024, mmap=mmap)
+            assert result.filename == str(path)
+            assert result.equals(expected, filename_eq=False)
+
+        result = digest.blake2b_tree_1024(path)
+        assert result.equals(expected, filename_eq=False)
+        assert Hash.from_str(str(result)) == result
+
+        checksum.manifest.write(checksum.digest_dir(tmp_dir, method='blake2b_tree_1024'), path.with_name('SUMS'))
+        assert checksum.manifest.verify(path.with_name('SUMS')).passed
+
+
+def test_merkle():
+    import tempfile, pathlib, os, io
+    from argendata_datasets.checksum import merkle
+
+    data = os.urandom(10 * 1000 + 7)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = pathlib.Path(tmp_dir) / 'test.bin'
+        path.write_bytes(data)
+
+        index = merkle.build(path, method='sha256', chunk_size=1000)
+        root = index.root
+        assert root.method == 'merkle_sha256_1000'
+        assert hash.merkle_sha256_1000(data) == root
+        assert hash.merkle_sha256_1000(b'') == merkle.build(io.BytesIO(b''), 'sha256', 1000).root
+        assert len(index.leaves) == 11
+        assert merkle.parse_method(root.method) == ('sha256', 1000)
+        assert merkle.parse_method('merkle_sha3_256_1000') == ('sha3_256', 1000)
+        assert digest.merkle_sha256_1000(path).equals(root, filename_eq=False)
+        assert Hash.from_str(str(root)) == root
+
+        loaded = merkle.MerkleIndex.load(index.save(merkle.sidecar_path(path)))
+        assert loaded == index
+        assert loaded.verify_range(path, 1500, 4200, expected=root)
+
+        # Corrupt a single byte: only the ranges covering it fail.
+        corrupted = bytearray(data)
+        corrupted[5500] ^= 0xff
+        path.write_bytes(corrupted)
+        assert index.verify_range(path, 0, 5000)
+        assert not index.verify_range(path, 5000, 6000)
+
+        # Incremental re-hash after a partial rewrite and an append.
+        appended = bytes(corrupted) + os.urandom(2500)
+        path.write_bytes(appended)
+        updated, rehashed = index.update(path, dirty=[(5500, 5501)])
+        assert rehashed == [5, 10, 11, 12]
+        assert updated == merkle.build(path, method='sha256', chunk_size=1000)
+
+        # Truncation.
+        path.write_bytes(appended[:3500])
+        updated, rehashed = updated.update(path)
+        assert rehashed == [3]
+        assert updated == merkle.build(path, method='sha256', chunk_size=1000)
+
+
+def test_merkle_row_group():
+    import tempfile, pathlib
+    import polars as pl
+    from argendata_datasets.checksum import merkle
+    from argendata_datasets.utils import parquet
+
+    df = pl.DataFrame({'a': range(5000), 'b': [str(i % 7) for i in range(5000)]})
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = pathlib.Path(tmp_dir) / 'test.parquet'
+        df.write_parquet(path, row_group_size=1000)
+
+        with path.open('rb') as f:
+            metadata = parquet.read_metadata(f)
+        assert metadata.num_rows == 5000
+        assert [group.num_rows for group in metadata.row_groups] == [1000] * 5
+
+        index = merkle.build(path, chunk_size=512)
+        assert all(index.verify_row_group(path, i, expected=index.root) for i in range(5))
+
+        # Corrupt the middle of the last row group.
+        group = metadata.row_groups[-1]
+        data = bytearray(path.read_bytes())
+        data[group.offset + group.length // 2] ^= 0xff
+        path.write_bytes(data)
+
+        assert index.verify_row_group(path, 0)
+        assert not index.verify_row_group(path, 4)
+
+
+def test_frozen_hash():
+    from argendata_datasets.checksum import FrozenHash
+
+    s = 'test.txt@sha1:aaf4c61ddcc5e8a2dabede0f3b482cd9aea9434d'
+    frozen = FrozenHash.from_str(s)
+
+    assert frozen.digest == bytes.fromhex('aaf4c61ddcc5e8a2dabede0f3b482cd9aea9434d')
+    assert frozen.to_str() == str(frozen) == s
+    assert frozen.to_hash() == Hash.from_str(s)
+    assert FrozenHash.from_hash(Hash.from_str(s)) == frozen
+    assert Hash.from_str(s).equals(frozen)
+    assert frozen.equals(s)
+
+    assert len({frozen, FrozenHash.from_str(s), FrozenHash.from_str('sha1:aaf4c61ddcc5e8a2dabede0f3b482cd9aea9434d')}) == 2
+    assert FrozenHash.from_str('a@sha1:00').method is FrozenHash.from_str('b@sha1:01').method
+
+    import dataclasses, pytest
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        frozen.method = 'md5'
+
+    for invalid in ['sha1', 'a.txt@sha1', 'sha1:', ':00', 'sha1:abc']:
+        with pytest.raises(ValueError):
+            FrozenHash.from_str(invalid)
+
+
+def test_manifest_frame():
+    import tempfile, pathlib
+    import polars as pl
+    import pytest
+    from argendata_datasets import checksum
+    from argendata_datasets.checksum import FrozenHash
+
+    entries = [
+        'b.txt@sha1:aaf4c61ddcc5e8a2dabede0f3b482cd9aea9434d',
+        'a.txt@md5:5d41402abc4b2a76b9719d911017c592',
+        'sha1:aaf4c61ddcc5e8a2dabede0f3b482cd9aea9434d',
+    ]
+
+    df = checksum.manifest.parse_column(pl.Series(entries))
+    assert df.columns == ['filename', 'method', 'digest']
+    assert df['filename'].to_list() == ['b.txt', 'a.txt', None]
+    assert df['digest'].to_list() == [FrozenHash.from_str(e).digest for e in entries]
+    assert checksum.manifest.serialize_column(df).to_list() == entries
+
+    with pytest.raises(ValueError):
+        checksum.manifest.parse_column(pl.Series(['not a hash']))
+    with pytest.raises(ValueError):
+        checksum.manifest.parse_column(pl.Series(['a.txt@sha1:abc']))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = pathlib.Path(tmp_dir) / 'SUMS'
+        checksum.manifest.write_frame(df.head(2), path)
+        assert list(checksum.manifest.read(path)) == [Hash.from_str(entries[1]), Hash.from_str(entries[0])]
+        assert list(checksum.manifest.read_frozen(path)) == [FrozenHash.from_str(entries[1]), FrozenHash.from_str(entries[0])]
+        assert checksum.manifest.read_frame(path).equals(df.head(2).reverse())
+
+
+def test_frame_digest():
+    import tempfile, pathlib
+    import polars as pl
+    from argendata_datasets.checksum import frame
+
+    df = pl.DataFrame({
+        'id': range(1000),
+        'pais': [['ARG', 'BRA', None][i % 3] for i in range(1000)],
+        'valor': [i / 7 for i in range(1000)],
+    })
+
+    expected = frame.digest(df)
+    assert expected.method == 'frame_ordered'
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        a = pathlib.Path(tmp_dir) / 'a.parquet'
+        b = pathlib.Path(tmp_dir) / 'b.parquet'
+        df.write_parquet(a, row_group_size=100, compression='zstd')
+        df.write_parquet(b, row_group_size=1000, compression='uncompressed')
+
+        assert digest.sha1(a).hexdigest != digest.sha1(b).hexdigest
+        assert frame.digest(pl.read_parquet(a)) == expected
+        assert frame.digest(pl.scan_parquet(b), batch_size=64) == expected
+
+    assert frame.digest(df, batch_size=7) == expected
+    assert frame.digest(df.reverse()) != expected
+    assert frame.digest(df.reverse(), ordered=False) == frame.digest(df, ordered=False)
+    assert frame.digest(df, ordered=False) != expected
+
+    modified = df.with_columns(pl.when(pl.col('id') == 500).then(0.0).otherwise(pl.col('valor')).alias('valor'))
+    assert frame.digest(modified) != expected
+    assert frame.digest(modified, ordered=False) != frame.digest(df, ordered=False)
+
+    assert frame.digest(df.cast({'id': pl.Int32})) != expected
+    assert frame.digest(df.rename({'pais': 'country'})) != expected
+    assert frame.digest(df.head(0)) != frame.digest(df.head(0).drop('valor'))
@@ -30,4 +30,40 @@ def test_get_dataset_registrations(program_ast):
     assert isinstance(registrations[0]['registration'].filename, Name)
     assert registrations[0]['registration'].filename.id == 'FILENAME'
     assert registrations[0]['registration'].stmt_index == 3
-    
\ No newline at end of file
+    
+def test_analyze(program_ast):
+    from argendata_datasets.dsl.analyzer import analyze, get_datasets, Request
+
+    analysis = analyze(PROGRAM)
+    assert analysis.requests == get_datasets(PROGRAM) == {Request(name='R1C0', method='get', version='latest')}
+    assert analysis.consumes == {'R1C0'}
+    assert analysis.produces == {'R1C1'}
+
+    [symbol] = analysis.symbols()
+    [expected] = get_dataset_registrations(program_ast)
+    assert symbol['symbol'] == expected['symbol']
+    assert symbol['registration'] == expected['registration']
+    assert symbol['save'].node is not None
+
+def test_analyze_many():
+    from argendata_datasets.dsl.analyzer import analyze
+
+    program = '\n'.join(
+        [f"x{i} = Datasets.R{i}C0.get(version='v{i}')" for i in range(50)]
+        + [f"d{i} = Datasets.R{i}C1.register(filename='d{i}.csv')" for i in range(50)]
+        + ["def helper():\n    return Datasets.R99C0.download(to='.')"]
+        + [f"d{i}.save(x{i})" for i in reversed(range(50))]
+    )
+    analysis = analyze(program)
+    assert len(analysis.requests) == 51
+    assert len(analysis.registrations) == 50
+    assert [save.symbol for save in analysis.saves] == [f'd{i}' for i in reversed(range(50))]
+    assert analysis.registrations['d3'].stmt_index == 53
+    assert analyze(ast.parse(program)).registrations == analysis.registrations
+
+def test_analyze_without_registrations():
+    from argendata_datasets.dsl.analyzer import analyze
+
+    analysis = analyze("x = Datasets.R1C0.get()\nx.head()")
+    assert analysis.registrations == {} and analysis.saves == ()
+    assert analysis.symbols() == []
@@ -3,7 +3,9 @@ import rootdir
 from dataclasses import dataclass
 import argendata_datasets
 import dotenv
+import pathlib
 import pytest
+import tempfile
 
 @dataclass
 class Fixture:
@@ -31,4 +33,646 @@ def test_static(fixture):
         hostname=static_hostname,
     )
 
-    assert isinstance(clean_by_filename, pl.DataFrame)
\ No newline at end of file
+    assert isinstance(clean_by_filename, pl.DataFrame)
+
+
+@dataclass
+class LocalFixture:
+    hostname: str
+    root: pathlib.Path
+    df: 'pl.DataFrame'
+    raw: bytes
+    server: 'StaticServer'
+
+
+@pytest.fixture
+def local():
+    import os
+    import polars as pl
+    from argendata_datasets.testing.static_server import StaticServer
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = pathlib.Path(tmp_dir)
+        base = root / 'static' / 'etl-fuentes'
+        (base / 'clean').mkdir(parents=True)
+        (base / 'raw').mkdir(parents=True)
+
+        df = pl.DataFrame({'iso3': ['ARG', 'BRA', 'URY'] * 100, 'valor': range(300)})
+        df.write_parquet(base / 'clean' / 'weo_imf.parquet')
+
+        raw = os.urandom(100_000)
+        (base / 'raw' / 'fuente.xlsx').write_bytes(raw)
+
+        pl.DataFrame({'id_fuente_clean': [1], 'path_clean': ['weo_imf.parquet']}).write_csv(base / 'fuentes_clean.csv')
+        pl.DataFrame({'id_fuente': [1], 'path_raw': ['fuente.xlsx']}).write_csv(base / 'fuentes_raw.csv')
+
+        with StaticServer(root) as server:
+            yield LocalFixture(hostname=server.hostname, root=root, df=df, raw=raw, server=server)
+
+
+def test_static_local(local):
+    import polars as pl
+    from argendata_datasets.datasource.static import raw, clean
+
+    assert raw.get_index(local.hostname)['path_raw'].to_list() == ['fuente.xlsx']
+    assert clean.get_index(local.hostname)['path_clean'].to_list() == ['weo_imf.parquet']
+    assert clean.get_by_filename('weo_imf.parquet', local.hostname).equals(local.df)
+    assert raw.get_by_filename('fuente.xlsx', local.hostname).getvalue() == local.raw
+
+    to = local.root / 'fuente.xlsx'
+    assert raw.download_by_filename('fuente.xlsx', local.hostname, to, chunk_size=4096) == to
+    assert to.read_bytes() == local.raw
+
+
+def test_static_hashing(local):
+    from argendata_datasets import checksum
+    from argendata_datasets.datasource.static import raw, clean
+
+    expected = checksum.hash.sha256(local.raw)
+    methods = ['sha1', 'sha256']
+
+    data, hashes = raw.get_by_filename('fuente.xlsx', local.hostname, hashes=methods)
+    assert data.getvalue() == local.raw
+    assert list(hashes) == methods
+    assert hashes['sha256'].equals(expected, filename_eq=False)
+    assert hashes['sha256'].filename == 'fuente.xlsx'
+
+    to = local.root / 'fuente.xlsx'
+    path, hashes = raw.download_by_filename('fuente.xlsx', local.hostname, to, chunk_size=4096, hashes='sha256')
+    assert hashes['sha256'].equals(expected, filename_eq=False)
+    assert hashes['sha256'].equals(checksum.digest.sha256(path), filename_eq=False)
+
+    # A matching expected checksum returns the plain result.
+    product = f'R1C0({expected})'
+    assert raw.download_by_filename('fuente.xlsx', local.hostname, to, expected=product) == to
+
+    wrong = checksum.hash.sha256(b'other')
+    with pytest.raises(checksum.ChecksumMismatch):
+        raw.download_by_filename('fuente.xlsx', local.hostname, to, expected=wrong)
+    assert not to.exists()
+
+    with pytest.raises(checksum.ChecksumMismatch):
+        raw.get_by_filename('fuente.xlsx', local.hostname, expected=wrong)
+
+    # Only hashlib methods can be computed on the stream.
+    for method in ['blake2b_tree_1048576', 'merkle_sha256_1000', 'frame_ordered']:
+        with pytest.raises(ValueError, match=method):
+            raw.get_by_filename('fuente.xlsx', local.hostname, expected=f'{method}:00')
+
+    parquet_path = local.root / 'static' / 'etl-fuentes' / 'clean' / 'weo_imf.parquet'
+    df, hashes = clean.get_by_filename('weo_imf.parquet', local.hostname, hashes='sha1')
+    assert df.equals(local.df)
+    assert hashes['sha1'].equals(checksum.digest.sha1(parquet_path), filename_eq=False)
+
+    df = clean.get_by_filename('weo_imf.parquet', local.hostname, expected=checksum.digest.md5(parquet_path))
+    assert df.equals(local.df)
+
+
+def test_static_session(local):
+    from argendata_datasets.datasource.static import raw, clean, Session
+
+    with Session(max_connections_per_host=2) as session:
+        for _ in range(3):
+            assert clean.get_index(local.hostname, session=session).height == 1
+            assert clean.get_by_filename('weo_imf.parquet', local.hostname, session=session).equals(local.df)
+            assert raw.get_by_filename('fuente.xlsx', local.hostname, session=session).getvalue() == local.raw
+
+        # Every request reused the same keep-alive connection.
+        pool = session._pools[('http', local.hostname)]
+        assert len(pool.idle) == 1
+
+        import urllib.error
+        with pytest.raises(urllib.error.HTTPError) as error:
+            raw.get_by_filename('missing.xlsx', local.hostname, session=session)
+        assert error.value.code == 404
+
+
+def test_static_session_threads(local):
+    from concurrent.futures import ThreadPoolExecutor
+    from argendata_datasets.datasource.static import raw, Session
+
+    with Session(max_connections_per_host=3) as session:
+        def get(_):
+            return raw.get_by_filename('fuente.xlsx', local.hostname, session=session).getvalue()
+
+        with ThreadPoolExecutor(8) as executor:
+            assert all(data == local.raw for data in executor.map(get, range(32)))
+
+        assert len(session._pools[('http', local.hostname)].idle) <= 3
+
+
+def test_static_session_abandoned(local):
+    import gc
+    from argendata_datasets.datasource.static import Session
+    from argendata_datasets.datasource.static.utils import make_request
+
+    with Session(max_connections_per_host=1) as session:
+        request = make_request(local.hostname, 'http', '/static/etl-fuentes/raw/fuente.xlsx', '', '', '')
+        response = session.urlopen(request)
+        response.read(10)
+        pool = session._pools[('http', local.hostname)]
+        assert not pool.slots.acquire(blocking=False)
+
+        # Dropping an unread response gives its slot back to the pool.
+        del response
+        gc.collect()
+        assert pool.slots.acquire(timeout=5)
+        pool.slots.release()
+        assert session.urlopen(request).read() == local.raw
+
+
+def test_static_cache(local):
+    from argendata_datasets.datasource.static import raw, clean, DownloadCache, Session
+    from argendata_datasets.datasource.static.cache import NotCached
+
+    cache = DownloadCache(local.root / 'cache')
+
+    assert raw.get_by_filename('fuente.xlsx', local.hostname, cache=cache).getvalue() == local.raw
+    assert (cache.misses, cache.revalidated) == (1, 0)
+
+    # The second request is revalidated with a 304 instead of a download.
+    with Session() as session:
+        for _ in range(2):
+            assert raw.get_by_filename('fuente.xlsx', local.hostname, cache=cache, session=session).getvalue() == local.raw
+    assert (cache.hits, cache.misses, cache.revalidated) == (2, 1, 2)
+    assert local.server.stats[304] == 2
+
+    assert clean.get_by_filename('weo_imf.parquet', local.hostname, cache=cache).equals(local.df)
+    assert len(cache) == 2
+
+    # A changed file is downloaded again.
+    changed = local.raw[::-1]
+    (local.root / 'static' / 'etl-fuentes' / 'raw' / 'fuente.xlsx').write_bytes(changed)
+    assert raw.get_by_filename('fuente.xlsx', local.hostname, cache=cache).getvalue() == changed
+    assert cache.misses == 3
+
+    offline = DownloadCache(local.root / 'cache', offline=True)
+    to = local.root / 'fuente.xlsx'
+    assert raw.download_by_filename('fuente.xlsx', local.hostname, to, cache=offline) == to
+    assert to.read_bytes() == changed
+    assert offline.hits == 1
+
+    with pytest.raises(NotCached):
+        raw.get_by_filename('missing.xlsx', local.hostname, cache=offline)
+
+
+def test_static_cache_eviction(local):
+    from argendata_datasets.datasource.static import raw, clean, DownloadCache
+    from argendata_datasets.datasource.static.cache import file_lock
+
+    cache = DownloadCache(local.root / 'cache', max_bytes=len(local.raw))
+
+    clean.get_by_filename('weo_imf.parquet', local.hostname, cache=cache)
+    (url,) = [row[0] for row in cache._connect().execute('SELECT url FROM entries')]
+
+    # Files locked by a fetch elsewhere are not evicted.
+    with file_lock(cache._lock_path(url)):
+        raw.get_by_filename('fuente.xlsx', local.hostname, cache=cache)
+        assert len(cache) == 2
+
+    assert cache.evict() == 1
+
+    # The parquet file was the least recently used and went over the budget.
+    assert len(cache) == 1
+    assert cache.size == len(local.raw)
+    assert len(list((local.root / 'cache' / 'data').iterdir())) == 1
+
+    assert cache.invalidate() == 1
+    assert len(cache) == 0
+
+
+def test_static_bulk(local):
+    import asyncio
+    import polars as pl
+    from argendata_datasets.datasource.static import raw, clean, Progress
+
+    base = local.root / 'static' / 'etl-fuentes' / 'raw'
+    files = {f'fuente_{i}.xlsx': bytes([i]) * (1000 * (i + 1)) for i in range(10)}
+    for filename, data in files.items():
+        (base / filename).write_bytes(data)
+
+    filenames = [*files, 'missing.xlsx']
+    updates = []
+    progress = Progress(callback=lambda p: updates.append(p.files))
+
+    results = dict(raw.get_many(filenames, local.hostname, workers=4, progress=progress))
+    assert set(results) == set(filenames)
+    assert all(results[filename].getvalue() == data for filename, data in files.items())
+    assert results['missing.xlsx'].code == 404
+
+    assert (progress.total, progress.files, progress.failed) == (11, 11, 1)
+    assert progress.bytes == sum(map(len, files.values()))
+    assert progress.bytes_per_second > 0
+    assert updates == list(range(1, 12))
+
+    to = local.root / 'downloads'
+    downloaded = dict(raw.download_many(list(files), local.hostname, to, workers=4, hashes='sha1'))
+    for filename, (path, hashes) in downloaded.items():
+        assert path == to / filename
+        assert path.read_bytes() == files[filename]
+
+    async def collect():
+        return [x async for x in clean.aget_many(['weo_imf.parquet'] * 3, local.hostname, workers=2)]
+
+    results = asyncio.run(collect())
+    assert len(results) == 3
+    assert all(df.equals(local.df) for _, df in results)
+
+    async def download():
+        return [x async for x in clean.adownload_many(['weo_imf.parquet'], local.hostname, to)]
+
+    [(_, path)] = asyncio.run(download())
+    assert pl.read_parquet(path).equals(local.df)
+
+    # Files keep their folders, so equal names do not collide.
+    (base / 'sub').mkdir()
+    (base / 'sub' / 'fuente_0.xlsx').write_bytes(b'sub')
+    downloaded = list(raw.download_many(['fuente_0.xlsx', 'sub/fuente_0.xlsx', 'sub/fuente_0.xlsx'], local.hostname, to / 'nested'))
+    assert (to / 'nested' / 'fuente_0.xlsx').read_bytes() == files['fuente_0.xlsx']
+    assert (to / 'nested' / 'sub' / 'fuente_0.xlsx').read_bytes() == b'sub'
+    # A file downloaded twice is an error instead of a concurrent overwrite.
+    assert sum(isinstance(result, ValueError) for _, result in downloaded) == 1
+
+
+def test_static_bulk_async_close():
+    import asyncio
+    import time
+    from argendata_datasets.datasource.static.bulk import afetch_many
+
+    running = []
+
+    def fetch(filename, session, progress):
+        running.append(filename)
+        time.sleep(0.1)
+        running.remove(filename)
+        if filename == 'interrupted':
+            raise KeyboardInterrupt
+        return filename
+
+    async def first(filenames):
+        async for result in afetch_many(fetch, filenames, workers=2):
+            return result
+
+    # The first result comes back before the other request finishes, which
+    # is waited for when the generator closes.
+    assert asyncio.run(first(['a', 'b', 'c', 'd'])) in (('a', 'a'), ('b', 'b'))
+    assert running == []
+
+    # Like `fetch_many`, any exception of a request is yielded.
+    filename, error = asyncio.run(first(['interrupted']))
+    assert isinstance(error, KeyboardInterrupt)
+
+
+def test_static_ranges(local, monkeypatch):
+    from argendata_datasets import checksum
+    from argendata_datasets.datasource.static import raw, ranges, Session
+    from argendata_datasets.testing.static_server import StaticServer
+
+    expected = checksum.hash.sha256(local.raw)
+    to = local.root / 'fuente.xlsx'
+
+    # A partial file is completed with a single range request.
+    to.write_bytes(local.raw[:30_000])
+    path, hashes = raw.download_by_filename('fuente.xlsx', local.hostname, to, resume=True, hashes='sha256')
+    assert to.read_bytes() == local.raw
+    assert hashes['sha256'].equals(expected, filename_eq=False)
+    assert local.server.stats[206] == 1
+
+    # A complete file is not downloaded again.
+    assert raw.download_by_filename('fuente.xlsx', local.hostname, to, resume=True, expected=expected) == to
+    assert local.server.stats[416] == 1
+
+    # A partial file from another version fails the check and is removed.
+    to.write_bytes(b'x' * 1000)
+    with pytest.raises(checksum.ChecksumMismatch):
+        raw.download_by_filename('fuente.xlsx', local.hostname, to, resume=True, expected=expected)
+    assert not to.exists()
+
+    with Session() as session:
+        path, hashes = raw.download_by_filename(
+            'fuente.xlsx', local.hostname, to, session=session,
+            segments=4, min_segment_size=10_000, hashes='sha256',
+        )
+    assert to.read_bytes() == local.raw
+    assert hashes['sha256'].equals(expected, filename_eq=False)
+    assert local.server.stats[206] == 6
+
+    # A file that changed since the partial download is downloaded whole.
+    validator = local.root / '.fuente.xlsx.validator'
+    to.write_bytes(b'x' * 1000)
+    validator.write_text('"stale"')
+    assert raw.download_by_filename('fuente.xlsx', local.hostname, to, resume=True, expected=expected) == to
+    assert to.read_bytes() == local.raw
+    assert not validator.exists()
+
+    # Segments of a file that changed fail, without leaving a partial file.
+    to.unlink()
+    monkeypatch.setattr(ranges, 'probe', lambda request, session: (len(local.raw), True, '"stale"'))
+    with pytest.raises(ValueError):
+        raw.download_by_filename('fuente.xlsx', local.hostname, to, segments=4, min_segment_size=10_000)
+    monkeypatch.undo()
+    assert not to.exists()
+    assert not list(local.root.glob('.fuente.xlsx.*'))
+
+    with pytest.raises(ValueError):
+        raw.download_by_filename('fuente.xlsx', local.hostname, to, segments=4, resume=True)
+
+    # Without Accept-Ranges the file is downloaded as a single stream.
+    with StaticServer(local.root, ranges=False) as server:
+        to.write_bytes(local.raw[:30_000])
+        raw.download_by_filename('fuente.xlsx', server.hostname, to, resume=True)
+        raw.download_by_filename('fuente.xlsx', server.hostname, to, segments=4, min_segment_size=10_000)
+        assert to.read_bytes() == local.raw
+        assert server.stats[206] == 0
+        # The resumed GET, and the HEAD and GET of the segmented download.
+        assert server.stats[200] == 3
+
+
+def test_static_scan(local):
+    import polars as pl
+    from argendata_datasets.datasource.static import clean
+    from argendata_datasets.testing.static_server import StaticServer
+
+    n = 1_000_000
+    df = pl.DataFrame({
+        'iso3': ['ARG', 'BRA', 'URY', 'CHL'] * (n // 4),
+        'anio': pl.int_range(n, eager=True),
+        'valor': pl.int_range(n, eager=True).cast(pl.Float64) / 7,
+    })
+    path = local.root / 'static' / 'etl-fuentes' / 'clean' / 'big.parquet'
+    df.write_parquet(path, row_group_size=100_000, statistics=True)
+
+    lf = clean.scan_by_filename('big.parquet', local.hostname)
+    assert isinstance(lf, pl.LazyFrame)
+
+    result = lf.filter(pl.col('anio') < 100).select('anio').collect()
+    assert result.equals(df.filter(pl.col('anio') < 100).select('anio'))
+
+    # Only the footer (polars reads the last 256KiB) and one column chunk of
+    # one row group were read.
+    assert 0 < local.server.bytes_sent < path.stat().st_size / 4
+
+    # The server was probed once, for the first scan.
+    heads = local.server.stats[200]
+    clean.scan_by_filename('big.parquet', local.hostname).select('anio').head(1).collect()
+    assert local.server.stats[200] == heads
+
+    with StaticServer(local.root, ranges=False) as server:
+        lf = clean.scan_by_filename('big.parquet', server.hostname, n_rows=10)
+        assert lf.select(pl.len()).collect().item() == 10
+
+
+def test_static_open(local):
+    import zipfile
+    import polars as pl
+    from argendata_datasets import checksum
+    from argendata_datasets.datasource.static import raw, Session
+    from argendata_datasets.testing.static_server import StaticServer
+
+    base = local.root / 'static' / 'etl-fuentes' / 'raw'
+    with zipfile.ZipFile(base / 'fuente.zip', 'w') as z:
+        z.writestr('a.bin', local.raw)
+        z.writestr('b.csv', 'x,y\n1,2\n3,4\n')
+
+    with Session() as session, raw.open_by_filename('fuente.zip', local.hostname, buffer_size=4096, session=session) as f:
+        assert f.seekable()
+        with zipfile.ZipFile(f) as z:
+            assert z.namelist() == ['a.bin', 'b.csv']
+            assert z.read('a.bin') == local.raw
+            assert pl.read_csv(z.open('b.csv'))['y'].to_list() == [2, 4]
+
+    with raw.open_by_filename('fuente.xlsx', local.hostname) as f:
+        assert checksum.digest.sha1(f).equals(checksum.hash.sha1(local.raw), filename_eq=False)
+
+    # A file that changes while open fails the next range request.
+    with raw.open_by_filename('fuente.xlsx', local.hostname, buffer_size=1024) as f:
+        assert f.read(5000) == local.raw[:5000]
+        changed = base / 'fuente.xlsx'
+        changed.write_bytes(local.raw[::-1])
+        f.seek(0)
+        with pytest.raises(OSError, match='changed'):
+            f.read()
+    changed.write_bytes(local.raw)
+
+    chunks = list(raw.iter_by_filename('fuente.xlsx', local.hostname, chunk_size=8192))
+    assert max(map(len, chunks)) <= 8192
+    assert b''.join(chunks) == local.raw
+
+    with StaticServer(local.root, ranges=False) as server:
+        with raw.open_by_filename('fuente.xlsx', server.hostname, buffer_size=1024) as f:
+            assert not f.seekable()
+            assert f.read(50_000) == local.raw[:50_000]
+            with pytest.raises(OSError):
+                f.seek(0)
+            assert f.read() == local.raw[50_000:]
+
+
+def test_static_index(local):
+    import polars as pl
+    from argendata_datasets.datasource.static import raw, clean, Index
+    from argendata_datasets.datasource.static import index as static_index
+
+    directory = local.root / 'indexes'
+    index = raw.load_index(local.hostname, directory=directory)
+    assert isinstance(index, Index)
+    assert index.by_filename('fuente.xlsx')['id_fuente'] == 1
+    assert index.by_id(1)['path_raw'] == 'fuente.xlsx'
+    assert 'fuente.xlsx' in index and 'missing.xlsx' not in index
+    assert list(directory.glob('*.arrow'))
+
+    # Memoized in-process, then read from disk without contacting the server.
+    requests = sum(local.server.stats.values())
+    assert raw.load_index(local.hostname, directory=directory) is index
+    static_index.clear_memo()
+    assert raw.load_index(local.hostname, directory=directory).df.equals(index.df)
+    assert sum(local.server.stats.values()) == requests
+
+    # The memo does not keep an index from being stored in another directory.
+    other = local.root / 'other-indexes'
+    assert raw.load_index(local.hostname, directory=other).df.equals(index.df)
+    assert list(other.glob('*.arrow'))
+
+    # Metadata without a fetch time is a cache miss.
+    static_index.clear_memo()
+    (meta_path,) = other.glob('*.json')
+    meta_path.write_text('{"etag": null}')
+    assert raw.load_index(local.hostname, directory=other).df.equals(index.df)
+    assert sum(local.server.stats.values()) == requests + 2
+
+    # Past the TTL, an unchanged index is revalidated with a 304.
+    assert raw.load_index(local.hostname, ttl=0, directory=directory).by_id(1)['path_raw'] == 'fuente.xlsx'
+    assert local.server.stats[304] == 1
+
+    base = local.root / 'static' / 'etl-fuentes'
+    pl.DataFrame({'id_fuente': [1, 2], 'path_raw': ['fuente.xlsx', 'otra.csv']}).write_csv(base / 'fuentes_raw.csv')
+    assert raw.load_index(local.hostname, ttl=0, directory=directory).by_id(2)['path_raw'] == 'otra.csv'
+
+    index = clean.load_index(local.hostname, directory=directory)
+    assert index.by_filename('weo_imf.parquet')['id_fuente_clean'] == 1
+
+    with pytest.raises(KeyError):
+        clean.load_index(local.hostname, directory=directory, id_column='missing')
+
+    static_index.clear_memo()
+
+
+@pytest.mark.filterwarnings('ignore:pyarrow is not installed')
+def test_static_materialize(local):
+    import polars as pl
+    from argendata_datasets.datasource.static import clean, materialize
+
+    directory = local.root / 'materialized'
+    df = clean.get_by_filename('weo_imf.parquet', local.hostname, materialize=directory)
+    assert df.equals(local.df)
+
+    [ipc] = directory.glob('*.arrow')
+    assert pl.read_ipc(ipc).equals(local.df)
+
+    # Unchanged datasets are revalidated and read from the IPC file.
+    mtime = ipc.stat().st_mtime_ns
+    assert clean.get_by_filename('weo_imf.parquet', local.hostname, materialize=directory).equals(local.df)
+    assert local.server.stats[304] == 1
+    assert ipc.stat().st_mtime_ns == mtime
+
+    changed = local.df.with_columns(pl.col('valor') * 2)
+    changed.write_parquet(local.root / 'static' / 'etl-fuentes' / 'clean' / 'weo_imf.parquet')
+    assert clean.get_by_filename('weo_imf.parquet', local.hostname, materialize=directory).equals(changed)
+
+    # Readers of the previous version keep reading it after it is replaced.
+    assert df.equals(local.df)
+    assert materialize.read_mapped(ipc).equals(changed)
+
+    with pytest.raises(ValueError):
+        clean.get_by_filename('weo_imf.parquet', local.hostname, materialize=directory, hashes='sha1')
+
+
+def test_static_read_mapped():
+    import polars as pl
+    pa = pytest.importorskip('pyarrow')
+    from argendata_datasets.datasource.static.materialize import read_mapped
+
+    df = pl.DataFrame({'a': pl.int_range(1 << 20, eager=True), 'b': pl.int_range(1 << 20, eager=True) / 3})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = pathlib.Path(tmp_dir) / 'df.arrow'
+        df.write_ipc(path, compression='uncompressed')
+
+        before = pa.total_allocated_bytes()
+        mapped = read_mapped(path)
+        assert mapped.equals(df)
+
+        # The buffers point into the mapping instead of memory allocated by arrow.
+        assert pa.total_allocated_bytes() - before < path.stat().st_size // 10
+        maps = pathlib.Path('/proc/self/maps')
+        if maps.exists():
+            assert str(path) in maps.read_text()
+
+
+def test_static_read_mapped_without_pyarrow(monkeypatch):
+    import sys
+    import polars as pl
+    from argendata_datasets.datasource.static.materialize import read_mapped
+
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    df = pl.DataFrame({'a': [1, 2, 3]})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = pathlib.Path(tmp_dir) / 'df.arrow'
+        df.write_ipc(path, compression='uncompressed')
+
+        with pytest.warns(UserWarning, match='pyarrow'):
+            assert read_mapped(path).equals(df)
+
+
+def test_static_compression(local):
+    import io
+    import zlib
+    from argendata_datasets import checksum
+    from argendata_datasets.datasource.static import raw, clean, Session, DownloadCache, Progress
+    from argendata_datasets.datasource.static import encoding
+    from argendata_datasets.testing.static_server import StaticServer, ENCODINGS
+
+    base = local.root / 'static' / 'etl-fuentes' / 'raw'
+    text = b''.join(b'%d,ARG,%d.5\n' % (i, i % 97) for i in range(50_000))
+    (base / 'fuente.csv').write_bytes(text)
+
+    with StaticServer(local.root, compression=True) as server, Session() as session:
+        progress = Progress()
+        data, hashes = raw.get_by_filename('fuente.csv', server.hostname, session=session, progress=progress, hashes='sha1')
+        assert data.getvalue() == text
+        assert hashes['sha1'].equals(checksum.hash.sha1(text), filename_eq=False)
+        assert progress.bytes == len(text)
+        assert progress.compression_ratio < 0.5
+        assert server.bytes_sent == progress.wire_bytes
+
+        assert raw.get_index(server.hostname, session=session)['path_raw'].to_list() == ['fuente.xlsx']
+        assert b''.join(raw.iter_by_filename('fuente.csv', server.hostname)) == text
+
+        to = local.root / 'fuente.csv'
+        raw.download_by_filename('fuente.csv', server.hostname, to, session=session, segments=4, min_segment_size=10_000)
+        assert to.read_bytes() == text
+
+        to.write_bytes(text[:1000])
+        raw.download_by_filename('fuente.csv', server.hostname, to, resume=True)
+        assert to.read_bytes() == text
+
+        # An interrupted resumable download continues with a 206, since it
+        # asked for the uncompressed file from the start.
+        class Interrupted(Exception): ...
+        class Interrupting(Progress):
+            def add_bytes(self, n, wire_bytes=None):
+                super().add_bytes(n, wire_bytes)
+                if self.bytes >= 100_000:
+                    raise Interrupted
+
+        to.unlink()
+        with pytest.raises(Interrupted):
+            raw.download_by_filename('fuente.csv', server.hostname, to, chunk_size=4096, progress=Interrupting(), resume=True)
+        assert 0 < to.stat().st_size < len(text)
+        partial = server.stats[206]
+        raw.download_by_filename('fuente.csv', server.hostname, to, resume=True)
+        assert server.stats[206] == partial + 1
+        assert to.read_bytes() == text
+
+        cache = DownloadCache(local.root / 'cache')
+        for _ in range(2):
+            assert raw.get_by_filename('fuente.csv', server.hostname, cache=cache).getvalue() == text
+        assert (cache.misses, cache.revalidated) == (1, 1)
+
+        assert clean.get_by_filename('weo_imf.parquet', server.hostname).equals(local.df)
+
+    for name in ('gzip', 'deflate'):
+        compressed = ENCODINGS[name](text)
+        reader = encoding.DecodingReader(io.BytesIO(compressed), name)
+        assert reader.read() == text
+        assert reader.ratio == len(compressed) / len(text)
+
+    # Raw deflate streams, as sent by some servers.
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    compressed = compressor.compress(text) + compressor.flush()
+    assert encoding.DecodingReader(io.BytesIO(compressed), 'deflate').read() == text
+
+
+def test_static_server_throttling():
+    import time
+    from argendata_datasets.datasource.static import raw, clean, Session
+    from argendata_datasets.testing.static_server import StaticServer, populate
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        populate(tmp_dir, raw={'a.bin': 200_000, 'b.bin': 10}, clean={'c.parquet': 1000})
+
+        with StaticServer(tmp_dir, latency=0.05, bandwidth=1_000_000) as server, Session() as session:
+            assert raw.get_index(server.hostname, session=session)['path_raw'].to_list() == ['a.bin', 'b.bin']
+            assert clean.get_by_filename('c.parquet', server.hostname, session=session).height == 1000
+
+            start = time.perf_counter()
+            assert len(raw.get_by_filename('b.bin', server.hostname, session=session).getvalue()) == 10
+            assert time.perf_counter() - start >= 0.05
+
+            # 200KB at 1MB/s per connection, in one or four segments.
+            start = time.perf_counter()
+            raw.download_by_filename('a.bin', server.hostname, pathlib.Path(tmp_dir) / 'a', session=session)
+            sequential = time.perf_counter() - start
+            assert sequential >= 0.2
+
+            start = time.perf_counter()
+            raw.download_by_filename('a.bin', server.hostname, pathlib.Path(tmp_dir) / 'a', session=session, segments=4, min_segment_size=10_000)
+            assert time.perf_counter() - start < sequential
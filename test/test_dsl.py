@@ -2,6 +2,7 @@ import rootdir
 from argendata_datasets.dsl.analyzer import get_datasets, parse_node, Request
 from argendata_datasets.dsl.datasets import Datasets
 import ast, pathlib
+import pytest
 
 def test_get_datasets_valid():
     testcase = "Datasets.R1C0.method(version='latest')"
@@ -67,3 +68,349 @@ def test_client():
     client = Client()
 
     assert client is Datasets
+
+def test_prefetch(tmp_path):
+    import threading
+    from argendata_datasets.dsl.prefetch import prefetch, collect_uris
+
+    (tmp_path / 'a.py').write_text(
+        "x = Datasets.R1C0.get(version='v1')\n"
+        "y = Datasets.R2C0.download(to='.', version='v2')\n"
+        "z = Datasets.R3C0.register(filename='out.csv')\n"
+    )
+    (tmp_path / 'b.py').write_text(
+        "x = Datasets.R1C0.get(version='v1')\n"
+        "w = Datasets.R9C9.get(version='broken')\n"
+    )
+    scripts = [tmp_path / 'a.py', tmp_path / 'b.py']
+    assert collect_uris(scripts) == ['R1C0@v1', 'R9C9@broken']
+
+    calls = []
+    lock = threading.Lock()
+    def getter(uri: str):
+        with lock:
+            calls.append(uri)
+        if uri == 'R9C9@broken':
+            raise ConnectionError(uri)
+        return f'data of {uri}'
+
+    results = prefetch(scripts, by=getter, workers=4)
+    assert sorted(calls) == ['R1C0@v1', 'R9C9@broken']
+    assert results['R1C0@v1'] == 'data of R1C0@v1'
+    assert isinstance(results['R9C9@broken'], ConnectionError)
+
+    # The first get is served from the prefetch, later ones fetch again.
+    assert Datasets.R1C0.get(version='v1', by=getter) == 'data of R1C0@v1'
+    assert len(calls) == 2
+    assert Datasets.R1C0.get(version='v1', by=getter) == 'data of R1C0@v1'
+    assert len(calls) == 3
+
+    # Failed prefetches are fetched again.
+    with pytest.raises(ConnectionError):
+        Datasets.R9C9.get(version='broken', by=getter)
+    assert len(calls) == 4
+
+    futures = prefetch(scripts[:1], by=getter, wait=False)
+    assert set(futures) == {'R1C0@v1'}
+    assert Datasets.R1C0.get(version='v1', by=getter) == 'data of R1C0@v1'
+
+    # Results not taken are dropped after the TTL or when cleared.
+    prefetch(scripts[:1], by=getter, ttl=0)
+    calls.clear()
+    Datasets.R1C0.get(version='v1', by=getter)
+    assert calls == ['R1C0@v1']
+
+    prefetch(scripts, by=getter)
+    assert Datasets.clear_prefetched(getter) == 2
+    assert Datasets.clear_prefetched() == 0
+
+    # Scripts that only download prefetch nothing, so nothing is left behind.
+    (tmp_path / 'c.py').write_text("y = Datasets.R2C0.download(to='.', version='v2')\n")
+    calls.clear()
+    assert prefetch([tmp_path / 'c.py'], by=getter) == {}
+    Datasets.R2C0.download(to='.', version='v2', by=lambda uri, to: to / uri)
+    assert calls == []
+    assert Datasets._prefetched == {}
+
+def test_analyze_dir(tmp_path):
+    import json
+    from argendata_datasets.dsl.batch import analyze_dir, manifest, write_manifest, AnalysisCache
+
+    scripts = tmp_path / 'etl'
+    (scripts / 'sub').mkdir(parents=True)
+    (scripts / 'a.py').write_text(
+        "x = Datasets.R1C0.get(version='v1')\n"
+        "ds = Datasets.R2C0.register(filename='out.csv')\n"
+        "ds.save(x)\n"
+    )
+    (scripts / 'sub' / 'b.py').write_text(
+        "y = Datasets.R2C0.get(version='latest')\n"
+        "ds = Datasets.R3C0.register(filename=FILENAME)\n"
+        "ds.save(y)\n"
+    )
+    (scripts / 'broken.py').write_text("x = (\n")
+
+    with AnalysisCache(tmp_path / 'cache.sqlite3') as cache:
+        analyses = analyze_dir(scripts, cache=cache)
+        assert [a.path for a in analyses] == ['a.py', 'broken.py', 'sub/b.py']
+        assert (cache.hits, cache.misses, len(cache)) == (0, 3, 3)
+
+        a, broken, b = analyses
+        assert a.consumes == {'R1C0'} and a.produces == {'R2C0'}
+        assert a.saves == ['ds']
+        assert broken.error.startswith('SyntaxError')
+        assert b.registrations[0].filename.id == 'FILENAME'
+
+        # Unchanged scripts come from the cache, the pool only parses changes.
+        (scripts / 'broken.py').write_text("z = Datasets.R3C0.get()\n")
+        again = analyze_dir(scripts, cache=cache, workers=2)
+        assert (cache.hits, cache.misses) == (2, 4)
+        assert [x.checksum for x in again if x.path != 'broken.py'] == [a.checksum, b.checksum]
+        assert again[1].error is None and again[1].consumes == {'R3C0'}
+
+    result = manifest(again)
+    assert result['datasets'] == {
+        'R1C0': {'consumers': ['a.py'], 'producers': []},
+        'R2C0': {'consumers': ['sub/b.py'], 'producers': ['a.py']},
+        'R3C0': {'consumers': ['broken.py'], 'producers': ['sub/b.py']},
+    }
+    assert result['scripts']['a.py']['uses'] == [{'name': 'R1C0', 'method': 'get', 'version': 'v1'}]
+    assert result['scripts']['sub/b.py']['produces'] == [{'name': 'R3C0', 'symbol': 'ds', 'filename': {'name': 'FILENAME'}}]
+    assert json.loads(write_manifest(again, tmp_path / 'manifest.json').read_text()) == result
+
+def test_analyze_dir_pool(tmp_path):
+    from argendata_datasets.dsl.batch import analyze_dir
+
+    for i in range(20):
+        (tmp_path / f's{i}.py').write_text(f"x = Datasets.R{i}C0.get(version='v1')\n")
+
+    analyses = analyze_dir(tmp_path, workers=2)
+    assert sorted(a.path for a in analyses) == [a.path for a in analyses]
+    assert {name for a in analyses for name in a.consumes} == {f'R{i}C0' for i in range(20)}
+
+def test_analyze_files_vanished(tmp_path):
+    from argendata_datasets.dsl.batch import analyze_files, _analyze_file, AnalysisCache
+
+    (tmp_path / 'a.py').write_text("x = Datasets.R1C0.get(version='v1')\n")
+    gone = tmp_path / 'gone.py'
+
+    # A script removed after the scan is reported, not raised, and not cached.
+    with AnalysisCache(tmp_path / 'cache.sqlite3') as cache:
+        a, vanished = analyze_files([tmp_path / 'a.py', gone], tmp_path, cache=cache)
+        assert a.error is None and a.consumes == {'R1C0'}
+        assert vanished.path == 'gone.py' and vanished.error.startswith('FileNotFoundError')
+        assert vanished.checksum.hexdigest == '' and vanished.requests == []
+        assert len(cache) == 1
+
+    # Also when it is removed after hashing, before the pool reads it.
+    assert _analyze_file(str(gone), 'sha1')[0] == ''
+
+@pytest.mark.parametrize('inotify', [False, True])
+def test_watch(tmp_path, inotify):
+    from argendata_datasets.dsl.watch import Watch, Change, _libc
+
+    if inotify and _libc() is None:
+        pytest.skip("inotify is not available")
+
+    (tmp_path / 'a.py').write_text(
+        "x = Datasets.R1C0.get(version='v1')\n"
+        "ds = Datasets.R2C0.register(filename='out.csv')\n"
+        "ds.save(x)\n"
+    )
+    updates = []
+    with Watch(tmp_path, callback=updates.append, interval=0.01, inotify=inotify) as watch:
+        assert watch.index.consumers == {'R1C0': {'a.py'}}
+        assert watch.index.producers == {'R2C0': {'a.py'}}
+
+        (tmp_path / 'sub').mkdir()
+        (tmp_path / 'sub' / 'b.py').write_text("y = Datasets.R2C0.get(version='v1')\n")
+        update = watch.step(timeout=5)
+        assert update.changes == [Change('added', 'consumer', 'R2C0', 'sub/b.py')]
+        assert watch.index.consumers['R2C0'] == {'sub/b.py'}
+
+        # A script that does not parse keeps its dependencies.
+        (tmp_path / 'a.py').write_text("x = (\n")
+        update = watch.step(timeout=5)
+        assert update.changes == [] and 'a.py' in update.errors
+        assert watch.index.producers == {'R2C0': {'a.py'}}
+
+        (tmp_path / 'a.py').write_text("x = Datasets.R3C0.get()\n")
+        update = watch.step(timeout=5)
+        assert update.changes == [
+            Change('removed', 'consumer', 'R1C0', 'a.py'),
+            Change('removed', 'producer', 'R2C0', 'a.py'),
+            Change('added', 'consumer', 'R3C0', 'a.py'),
+        ]
+
+        (tmp_path / 'sub' / 'b.py').unlink()
+        update = watch.step(timeout=5)
+        assert update.removed == ['sub/b.py']
+        assert watch.index.consumers == {'R3C0': {'a.py'}}
+        assert watch.index.producers == {}
+
+        (tmp_path / 'notes.txt').write_text("Datasets.R9C9.get()")
+        assert watch.step(timeout=0.05) is None
+
+        (tmp_path / 'sub' / 'a.py').write_text("z = Datasets.R1C0.get()\n")
+        watch.step(timeout=5)
+        assert watch.index.consumers['R1C0'] == {'sub/a.py'}
+
+        # Scripts in a moved directory are followed to their new path.
+        (tmp_path / 'sub').rename(tmp_path / 'moved')
+        update = watch.step(timeout=5)
+        assert update.removed == ['sub/a.py']
+        assert watch.index.consumers['R1C0'] == {'moved/a.py'}
+
+        (tmp_path / 'moved' / 'a.py').write_text("z = Datasets.R2C0.get()\n")
+        update = watch.step(timeout=5)
+        assert update.changes == [
+            Change('removed', 'consumer', 'R1C0', 'moved/a.py'),
+            Change('added', 'consumer', 'R2C0', 'moved/a.py'),
+        ]
+
+    assert len(updates) == 7
+    assert set(watch.index.manifest()['datasets']) == {'R2C0', 'R3C0'}
+
+def test_watch_vanished(tmp_path, monkeypatch):
+    from argendata_datasets.dsl import watch as watch_module
+
+    (tmp_path / 'a.py').write_text("x = Datasets.R1C0.get()\n")
+    (tmp_path / 'b.py').write_text("y = Datasets.R2C0.get()\n")
+
+    analyze_files = watch_module.analyze_files
+    def vanishing(paths, *args, **kwargs):
+        # a.py is deleted between being listed and being read.
+        if paths[0].name == 'a.py':
+            paths[0].unlink()
+            raise FileNotFoundError(paths[0])
+        return analyze_files(paths, *args, **kwargs)
+
+    with watch_module.Watch(tmp_path, inotify=False) as watch:
+        monkeypatch.setattr(watch_module, 'analyze_files', vanishing)
+        (tmp_path / 'b.py').write_text("y = Datasets.R3C0.get()\n")
+        update = watch.analyze({tmp_path / 'a.py', tmp_path / 'b.py'})
+
+    assert update.removed == ['a.py'] and update.analyzed == ['b.py']
+    assert watch.index.consumers == {'R3C0': {'b.py'}}
+
+def test_scheduler(tmp_path, monkeypatch):
+    import graphlib
+    from argendata_datasets.dsl.scheduler import run, dependencies
+    from argendata_datasets.dsl.batch import analyze_dir
+
+    # The scripts import the package like ETL scripts do.
+    monkeypatch.setenv('PYTHONPATH', str(pathlib.Path(__file__).parent.parent))
+    scripts, out = tmp_path / 'etl', tmp_path / 'out'
+    scripts.mkdir(), out.mkdir()
+
+    def script(name, body):
+        (scripts / name).write_text(
+            "import pathlib\n"
+            "from argendata_datasets.dsl import Datasets\n"
+            f"with open('runs.log', 'a') as f: f.write('{name}\\n')\n"
+            + body
+        )
+
+    script('a.py', "ds = Datasets.R1C0.register(filename='a.csv')\npathlib.Path('a.csv').write_text('1')\nds.save(None)\n")
+    script('b.py', "x = Datasets.R1C0.get(version='latest')\nds = Datasets.R2C0.register(filename='b.csv')\n"
+                   "pathlib.Path('b.csv').write_text(pathlib.Path('a.csv').read_text() + '!')\nds.save(x)\n")
+    script('c.py', "x = Datasets.R2C0.get(version='latest')\nassert pathlib.Path('b.csv').exists()\n")
+    script('d.py', "x = Datasets.R9C9.get(version='v1')\n")
+
+    assert dependencies(analyze_dir(scripts)) == {'a.py': set(), 'b.py': {'a.py'}, 'c.py': {'b.py'}, 'd.py': set()}
+
+    def statuses(**kwargs):
+        (out / 'runs.log').unlink(missing_ok=True)
+        results = run(scripts, workers=2, cwd=out, **kwargs)
+        return {result.path: result.status for result in results}
+
+    assert statuses() == {'a.py': 'ran', 'b.py': 'ran', 'c.py': 'ran', 'd.py': 'ran'}
+    assert statuses() == {'a.py': 'skipped', 'b.py': 'skipped', 'c.py': 'skipped', 'd.py': 'skipped'}
+    assert not (out / 'runs.log').exists()
+
+    # Same output: downstream scripts are not run again.
+    (scripts / 'a.py').write_text((scripts / 'a.py').read_text() + "# comment\n")
+    assert statuses() == {'a.py': 'ran', 'b.py': 'skipped', 'c.py': 'skipped', 'd.py': 'skipped'}
+
+    (scripts / 'a.py').write_text((scripts / 'a.py').read_text().replace("write_text('1')", "write_text('2')"))
+    assert statuses() == {'a.py': 'ran', 'b.py': 'ran', 'c.py': 'ran', 'd.py': 'skipped'}
+    assert (out / 'runs.log').read_text().split() == ['a.py', 'b.py', 'c.py']
+    assert (out / 'b.csv').read_text() == '2!'
+
+    (out / 'b.csv').unlink()
+    assert statuses() == {'a.py': 'skipped', 'b.py': 'ran', 'c.py': 'skipped', 'd.py': 'skipped'}
+
+    assert statuses(resolve=lambda uri: 'sha1:0') == {'a.py': 'skipped', 'b.py': 'skipped', 'c.py': 'skipped', 'd.py': 'ran'}
+
+    # A producer that stops parsing keeps its edges from the last run, on
+    # every run until it parses again.
+    source = (scripts / 'a.py').read_text()
+    (scripts / 'a.py').write_text(source + "x = (\n")
+    resolve = lambda uri: 'sha1:0'
+    for _ in range(2):
+        assert statuses(resolve=resolve) == {'a.py': 'failed', 'b.py': 'blocked', 'c.py': 'blocked', 'd.py': 'skipped'}
+    (scripts / 'a.py').write_text(source)
+    assert statuses(resolve=resolve) == {'a.py': 'skipped', 'b.py': 'ran', 'c.py': 'ran', 'd.py': 'skipped'}
+
+    (scripts / 'a.py').write_text((scripts / 'a.py').read_text() + "raise RuntimeError('boom')\n")
+    assert statuses() == {'a.py': 'failed', 'b.py': 'blocked', 'c.py': 'blocked', 'd.py': 'ran'}
+    assert statuses(force=True)['a.py'] == 'failed'
+
+    (scripts / 'a.py').write_text("x = Datasets.R2C0.get()\nds = Datasets.R1C0.register(filename='a.csv')\nds.save(x)\n")
+    with pytest.raises(graphlib.CycleError):
+        run(scripts, cwd=out)
+
+def test_client_sessions(tmp_path):
+    import asyncio
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from argendata_datasets.dsl.datasets import Client
+
+    assert Client() is Datasets
+    before = Datasets.used
+
+    # Scripts run concurrently in threads record only their own datasets.
+    barrier = threading.Barrier(4)
+    for i in range(4):
+        (tmp_path / f's{i}.py').write_text(
+            "from argendata_datasets.dsl import Datasets\n"
+            f"Datasets.R{i}C0.get(version='v1')\n"
+            "barrier.wait()\n"
+            f"Datasets.R{i}C1.get(version='v1')\n"
+            f"Datasets.R{i}C2.register(filename='out{i}.csv')\n"
+        )
+    with ThreadPoolExecutor(4) as executor:
+        sessions = list(executor.map(lambda i: Datasets.run(tmp_path / f's{i}.py', barrier=barrier), range(4)))
+
+    for i, session in enumerate(sessions):
+        assert session.used == {f'R{i}C0@v1', f'R{i}C1@v1'}
+        assert [r['name'] for r in session.produced] == [f'R{i}C2']
+
+    async def task(i):
+        with Datasets.session() as session:
+            Datasets.R1C0.get(version=str(i))
+            await asyncio.sleep(0)
+            Datasets.R1C1.get(version=str(i))
+            return session
+
+    async def main():
+        return await asyncio.gather(*(task(i) for i in range(3)))
+
+    for i, session in enumerate(asyncio.run(main())):
+        assert session.used == {f'R1C0@{i}', f'R1C1@{i}'}
+
+    # Sessions nest, and nothing leaks into the default session.
+    with Datasets.session() as outer:
+        Datasets.R5C0.get()
+        with Datasets.session() as inner:
+            Datasets.R6C0.get()
+        assert Datasets.used == {'R5C0'}
+    assert inner.used == {'R6C0'} and outer.used == {'R5C0'}
+    assert Datasets.used == before
+
+    # `produced` is the session's own list, so clearing it resets the session.
+    with Datasets.session() as session:
+        ds = Datasets.R7C0.register(filename='out.csv')
+        assert ds._get_registrations_metadata_stack() is session.produced
+        Datasets.produced.clear()
+        assert session.produced == []